@@ -1,129 +1,41 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from tkinter import ttk
-import openpyxl
-import re
 from datetime import datetime
 import os
 
+from futian_core import HEADERS_FUTIAN, create_blank_workbook, read_header_map, load_workbook, warm_up_in_background
+from history_store import HistoryPanel
+from parse_cache import parse_cache
+from validation import ValidationError, validate_batch
+
 # ================= 1. 配置区 =================
 
-# 按照你要求的顺序定义列名
-DEFAULT_HEADERS = [
-    "团队", 
-    "福田数量", 
-    "序号", 
-    "真实姓名", 
-    "推荐人", 
-    "居住地", 
-    "职业", 
-    "出身年月日", 
-    "电话号码", 
-    "现在生活事业家庭情况", 
-    "想收获什么梦想", 
-    "有无宗教信仰"
-]
+# 列名顺序、列宽统一定义在 modes.json 的 "福田统计" 模式
+DEFAULT_HEADERS = HEADERS_FUTIAN
 
 # ================= 2. 核心逻辑区 =================
 
-def normalize_birth_date(value):
-    """将各种格式的出生日期统一为：YYYY-MM-DD"""
-    if not value:
-        return ""
-    nums = re.findall(r"\d+", value)
-    if len(nums) >= 3:
-        year, month, day = nums[:3]
-        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    return value
-
 def extract_person_info(text):
-    """解析文本提取信息"""
-    text = text.replace("\r\n", "\n")
-
-    field_alias = {
-        "真实姓名": ["真实姓名", "姓名"],
-        "推荐人": ["推荐人", "分享人"],
-        "居住地": ["居住地", "地址"],
-        "职业": ["职业"],
-        "出身年月日": ["出身年月日", "出生年月日", "生日"],
-        "电话号码": ["电话号码", "手机号码", "电话", "手机"],
-        "现在生活事业家庭情况": ["现在生活事业家庭情况"],
-        "想收获什么梦想": ["想收获什么梦想"],
-        "有无宗教信仰": ["有无宗教信仰"]
-    }
-
-    reverse_map = {}
-    for k, v in field_alias.items():
-        for name in v:
-            reverse_map[name] = k
-
-    result = {k: "" for k in field_alias}
-    current_field = None
-
-    for raw_line in text.split("\n"):
-        line = raw_line.strip()
-        if not line:
-            continue
-        line = line.lstrip("0123456789. ")
-
-        if "：" in line or ":" in line:
-            key, val = line.replace(":", "：").split("：", 1)
-            key = key.split("（")[0].split("(")[0].strip()
-            key = key.replace(" ", "").replace("　", "")
-            
-            if key in reverse_map:
-                current_field = reverse_map[key]
-                if val.strip():
-                    result[current_field] = val.strip()
-                continue
-
-        if current_field:
-            if result[current_field]:
-                result[current_field] += "\n" + line
-            else:
-                result[current_field] = line
-
-    result["出身年月日"] = normalize_birth_date(result["出身年月日"])
-    return result
+    """解析文本提取信息（多行内容保留换行；重复的文本直接取缓存）"""
+    return parse_cache.parse(text, "福田统计", joiner="\n")
 
 def create_new_excel_file(file_path):
     """创建新的 Excel 文件并写入标准表头"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Sheet1"
-    
-    # 写入表头
-    ws.append(DEFAULT_HEADERS)
-    
-    # 设置一下列宽（美化）
-    # A列(团队)到L列
-    widths = {
-        "A": 10, # 团队
-        "B": 10, # 福田数量
-        "C": 6,  # 序号
-        "D": 12, # 姓名
-        "E": 12, # 推荐人
-        "H": 15, # 生日
-        "I": 15, # 电话
-    }
-    
-    for col_letter, width in widths.items():
-         ws.column_dimensions[col_letter].width = width
-    
-    # 其他列默认宽一点
-    for col in range(1, len(DEFAULT_HEADERS) + 1):
-        letter = openpyxl.utils.get_column_letter(col)
-        if letter not in widths:
-            ws.column_dimensions[letter].width = 20
-        
-    wb.save(file_path)
+    create_blank_workbook("福田统计", layout="FuTianFilling").save(file_path)
 
-def append_to_excel_safe(excel_path, text):
-    """使用 openpyxl 追加数据，保留原有格式"""
+def append_to_excel_safe(excel_path, text, force=False):
+    """使用 openpyxl 追加数据，保留原有格式
+
+    写入前先校验；有错误且 force 为 False 时抛出 ValidationError，不打开文件。
+    """
     info = extract_person_info(text)
+    report = validate_batch([info], "福田统计")
+    if not force and not report.ok:
+        raise ValidationError(report)
 
     try:
-        wb = openpyxl.load_workbook(excel_path)
+        wb = load_workbook(excel_path)
         sheet = wb.active
     except FileNotFoundError:
         raise Exception("找不到文件，请先创建或选择文件！")
@@ -131,10 +43,7 @@ def append_to_excel_safe(excel_path, text):
         raise Exception(f"打开 Excel 失败: {str(e)}")
 
     # 动态获取表头映射 {列名: 列索引}
-    header_map = {}
-    for col_idx, cell in enumerate(sheet[1], 1):
-        if cell.value:
-            header_map[str(cell.value).strip()] = col_idx
+    header_map = read_header_map(sheet)
 
     if not header_map:
         raise Exception("Excel 文件似乎是空的（没有表头），请先检查或新建文件。")
@@ -162,7 +71,8 @@ def append_to_excel_safe(excel_path, text):
         wb.save(excel_path)
     except PermissionError:
         raise Exception("无法保存！请先关闭该 Excel 文件后再试。")
-    
+
+    parse_cache.mark_written(text, "福田统计", os.path.abspath(excel_path), next_row, joiner="\n")
     return info
 
 # ================= 3. GUI 界面区 =================
@@ -227,9 +137,10 @@ class AutoFillerApp:
 
         ttk.Label(right_frame, text="本次操作历史:", style="Header.TLabel").pack(anchor="w", pady=(0, 5), padx=5)
         
-        # 表格 (Treeview)
+        # 表格 (Treeview)：只渲染可见的 20 行，当天历史从本地日志恢复
         cols = ("name", "phone", "job", "time")
-        self.tree = ttk.Treeview(right_frame, columns=cols, show="headings", height=20)
+        self.history = HistoryPanel(right_frame, "FuTianFilling", cols, visible_rows=20)
+        self.tree = self.history.tree
         
         self.tree.heading("name", text="姓名")
         self.tree.heading("phone", text="电话")
@@ -241,13 +152,7 @@ class AutoFillerApp:
         self.tree.column("job", width=70)
         self.tree.column("time", width=70)
 
-        scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        tree_frame = ttk.Frame(right_frame)
-        tree_frame.pack(fill="both", expand=True, padx=5)
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.history.pack(padx=5)
 
         # 右侧底部：清空历史按钮
         ttk.Button(right_frame, text="🗑️ 清空历史记录", command=self.clear_history).pack(fill="x", padx=5, pady=10)
@@ -289,8 +194,18 @@ class AutoFillerApp:
              messagebox.showerror("错误", "指定的文件不存在，请重新选择或新建！")
              return
 
+        # 同一段文字刚写入过这个文件时，不打开 Excel 先提示
+        row = parse_cache.written_at(text, "福田统计", os.path.abspath(excel_path), joiner="\n")
+        if row and not messagebox.askyesno("重复记录", f"这条记录已经写入过（第 {row} 行）。\n\n仍然再写一次吗？"):
+            return
+
         try:
-            extracted_info = append_to_excel_safe(excel_path, text)
+            try:
+                extracted_info = append_to_excel_safe(excel_path, text)
+            except ValidationError as e:
+                if not messagebox.askyesno("数据可能有误", f"{e}\n\n仍然写入吗？"):
+                    return
+                extracted_info = append_to_excel_safe(excel_path, text, force=True)
             self.add_to_history(extracted_info)
             messagebox.showinfo("成功", f"已添加：{extracted_info.get('真实姓名', '未知')}")
             self.text_input.delete("1.0", tk.END)
@@ -304,18 +219,15 @@ class AutoFillerApp:
         phone = info.get("电话号码", "-")
         job = info.get("职业", "-")
         current_time = datetime.now().strftime("%H:%M:%S")
-        self.tree.insert("", 0, values=(name, phone, job, current_time))
+        self.history.add((name, phone, job, current_time))
 
     def clear_history(self):
-        """清空右侧 Treeview 列表"""
-        if not self.tree.get_children():
-            return
-        
-        items = self.tree.get_children()
-        for item in items:
-            self.tree.delete(item)
+        """清空右侧历史列表和当天的历史日志"""
+        self.history.clear()
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = AutoFillerApp(root)
+    # 窗口先显示，openpyxl 在后台预热
+    root.after_idle(warm_up_in_background)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""冷启动基准：模块导入耗时 + 桌面窗口首次绘制耗时
+
+用法:
+    python bench_startup.py            # 每项跑 5 次取中位数
+    python bench_startup.py -n 10
+
+每次测量都在全新的子进程里进行，避免模块缓存影响结果。
+没有图形界面（例如服务器 / CI）时跳过首次绘制测量。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_TARGETS = ["futian_core", "my_TianFilling", "FuTianFilling", "openpyxl", "pandas"]
+
+# 子进程里执行：导入模块 -> 打印耗时（毫秒）
+IMPORT_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - t0) * 1000}}))
+"""
+
+# 子进程里执行：导入 -> 建窗口 -> 等到窗口真正映射到屏幕
+PAINT_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import tkinter as tk
+import {module} as app_module
+t_import = time.perf_counter()
+root = tk.Tk()
+app = app_module.AutoFillerApp(root)
+painted = {{}}
+def on_map(event):
+    if event.widget is root and "t" not in painted:
+        painted["t"] = time.perf_counter()
+        root.after(0, root.destroy)
+root.bind("<Map>", on_map)
+root.after(10000, root.destroy)
+root.mainloop()
+print(json.dumps({{"import_ms": (t_import - t0) * 1000,
+                  "paint_ms": (painted.get("t", time.perf_counter()) - t0) * 1000}}))
+"""
+
+
+def run_snippet(code):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, timeout=60
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "失败"
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    return result, None
+
+
+def bench_imports(repeat):
+    rows = []
+    for module in IMPORT_TARGETS:
+        samples, error = [], None
+        for _ in range(repeat):
+            result, error = run_snippet(IMPORT_SNIPPET.format(module=module))
+            if result is None:
+                break
+            samples.append(result["ms"])
+        rows.append((module, statistics.median(samples) if samples else None, error))
+    return rows
+
+
+def bench_first_paint(repeat):
+    rows = []
+    for module in ["my_TianFilling", "FuTianFilling"]:
+        imports, paints, error = [], [], None
+        for _ in range(repeat):
+            result, error = run_snippet(PAINT_SNIPPET.format(module=module))
+            if result is None:
+                break
+            imports.append(result["import_ms"])
+            paints.append(result["paint_ms"])
+        if paints:
+            rows.append((module, statistics.median(imports), statistics.median(paints), None))
+        else:
+            rows.append((module, None, None, error))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="每项重复次数（取中位数）")
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}，每项 {args.repeat} 次取中位数\n")
+    print("== 模块导入 ==")
+    for module, ms, error in bench_imports(args.repeat):
+        print(f"  {module:<16} {ms:8.1f} ms" if ms is not None else f"  {module:<16} 跳过: {error}")
+
+    print("\n== 桌面窗口首次绘制（从进程内开始导入算起）==")
+    for module, import_ms, paint_ms, error in bench_first_paint(args.repeat):
+        if paint_ms is None:
+            print(f"  {module:<16} 跳过: {error}")
+        else:
+            print(f"  {module:<16} 导入 {import_ms:7.1f} ms   首次绘制 {paint_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
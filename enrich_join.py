@@ -0,0 +1,235 @@
+"""用福田统计表补全爱心流动表：给每个被流动人填上 团队 / 推荐人 / 电话号码（哈希连接）
+
+用法:
+    python enrich_join.py 爱心流动表.xlsx 福田统计表.xlsx 补全结果.xlsx
+
+代替在 Excel 里对几万行做 VLOOKUP：
+- 两个表都以只读模式逐行读取，列按表头名称对齐（见 merge_workbooks.iter_aligned_rows）；
+- 行数较少的一侧建哈希索引，另一侧边读边查，内存只和较小的一侧成正比；
+- 连接键：被流动人里带手机号时先按手机号匹配，否则按规范化后的姓名
+  （全半角、空白、大小写统一，见 mode_specs.normalize_text）；
+- 同一个键对应多条信息不同的福田记录时不猜，标记为"多条匹配"；
+- 结果一次性流式写出：爱心流动表的标准列 + 原表里的其他列（原样保留，
+  与补全列重名时加"(原表)"）+ 团队 / 推荐人 / 电话号码 / 匹配情况，
+  另附"匹配问题"工作表列出未匹配和多条匹配的姓名；仍然放不下的列（如重复列名）在报告里列出。
+"""
+import argparse
+import os
+import re
+
+from futian_core import load_workbook
+from merge_workbooks import iter_aligned_rows
+from mode_specs import get_mode, normalize_phone, normalize_text
+
+LOVE_MODE, FUTIAN_MODE = "爱心流动", "福田统计"
+NAME_FIELD = "被流动人"
+ENRICH_FIELDS = ("团队", "推荐人", "电话号码")
+MATCHED, UNMATCHED, AMBIGUOUS = "已匹配", "未匹配", "多条匹配"
+STATUS_FIELD = "匹配情况"
+
+_MOBILE = re.compile(r"1[3-9]\d{9}")
+
+
+def love_keys(name_cell):
+    """被流动人单元格 -> 按优先级排列的连接键 [("phone", ...), ("name", ...)]"""
+    text = str(name_cell or "")
+    keys = []
+    phone = _MOBILE.search(re.sub(r"[\s-]", "", text))
+    if phone:
+        keys.append(("phone", phone.group()))
+        text = _MOBILE.sub("", re.sub(r"[\s-]", "", text))
+    name = normalize_text(text)
+    if name:
+        keys.append(("name", name))
+    return keys
+
+
+def futian_keys(name, phone):
+    keys = []
+    phone = normalize_phone(phone)
+    if _MOBILE.fullmatch(phone):
+        keys.append(("phone", phone))
+    name = normalize_text(name)
+    if name:
+        keys.append(("name", name))
+    return keys
+
+
+def estimate_rows(path):
+    """不读数据估计行数：优先用表的 dimension，没有时用文件大小"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = wb.active.max_row
+    finally:
+        wb.close()
+    return rows if rows else os.path.getsize(path) // 100
+
+
+class _Candidates:
+    """一个键收到的福田信息：只记第一条和是否出现过不同的信息"""
+    __slots__ = ("value", "ambiguous")
+
+    def __init__(self, value):
+        self.value = value
+        self.ambiguous = False
+
+    def add(self, value):
+        if value != self.value:
+            self.ambiguous = True
+
+
+class JoinReport:
+    def __init__(self):
+        self.build_side = None
+        self.extra_columns = []     # 原表里标准列以外、原样带到结果里的列
+        self.dropped_columns = []   # 没能带到结果里的列（重复列名等）
+        self.counts = {MATCHED: 0, UNMATCHED: 0, AMBIGUOUS: 0}
+        self.problems = {}     # 被流动人 -> [状态, 出现次数]
+
+    def record(self, name, status):
+        self.counts[status] += 1
+        if status != MATCHED:
+            entry = self.problems.setdefault(str(name or "").strip(), [status, 0])
+            entry[1] += 1
+
+    def summary(self):
+        c = self.counts
+        total = sum(c.values())
+        lines = [f"共 {total} 行（以{self.build_side}建索引）：已匹配 {c[MATCHED]}，"
+                 f"未匹配 {c[UNMATCHED]}，多条匹配 {c[AMBIGUOUS]}"]
+        if self.extra_columns:
+            lines.append(f"  保留原表的其他列: {'、'.join(self.extra_columns)}")
+        if self.dropped_columns:
+            lines.append(f"  未能保留的列: {'、'.join(self.dropped_columns)}")
+        for status in (UNMATCHED, AMBIGUOUS):
+            names = [n or "(空)" for n, (s, _) in self.problems.items() if s == status]
+            if names:
+                shown = "、".join(names[:20]) + (f" 等 {len(names)} 人" if len(names) > 20 else "")
+                lines.append(f"  {status}: {shown}")
+        return "\n".join(lines)
+
+
+def _iter_futian(path, headers):
+    rows = iter_aligned_rows(path, headers)
+    next(rows)
+    i_name, i_phone = headers.index("真实姓名"), headers.index("电话号码")
+    picks = [headers.index(f) for f in ENRICH_FIELDS]
+    for row in rows:
+        value = tuple("" if row[i] is None else str(row[i]).strip() for i in picks)
+        yield futian_keys(row[i_name], row[i_phone]), value
+
+
+def love_layout(love_path):
+    """(对齐用的列名, 结果里的列名)：标准列之外的原表列原样追加在后面"""
+    headers = list(get_mode(LOVE_MODE).headers)
+    rows = iter_aligned_rows(love_path, headers)
+    try:
+        unmapped = next(rows)
+    finally:
+        rows.close()
+    taken = set(ENRICH_FIELDS) | {STATUS_FIELD}
+    extras = []
+    for name in unmapped:
+        if name not in headers and name not in extras:   # 重复列名只保留第一列
+            extras.append(name)
+    out_names = [f"{name}(原表)" if name in taken else name for name in extras]
+    return headers + extras, headers + out_names
+
+
+def _resolve(found):
+    """按键的优先级取第一个命中的候选 -> (状态, 福田信息)"""
+    for candidates in found:
+        if candidates is None:
+            continue
+        if candidates.ambiguous:
+            return AMBIGUOUS, None
+        return MATCHED, candidates.value
+    return UNMATCHED, None
+
+
+def enrich_love_workbook(love_path, futian_path, output_path):
+    """补全并返回 JoinReport"""
+    import openpyxl
+
+    love_headers, kept_headers = love_layout(love_path)
+    futian_headers = get_mode(FUTIAN_MODE).headers
+    name_idx = love_headers.index(NAME_FIELD)
+    out_headers = kept_headers + list(ENRICH_FIELDS) + [STATUS_FIELD]
+
+    out_wb = openpyxl.Workbook(write_only=True)
+    out_ws = out_wb.create_sheet("补全结果")
+    for col, header in enumerate(out_headers, 1):
+        out_ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
+    out_ws.append(out_headers)
+
+    report = JoinReport()
+    report.extra_columns = kept_headers[len(get_mode(LOVE_MODE).headers):]
+
+    def emit(row, status, value):
+        report.record(row[name_idx], status)
+        out_ws.append(list(row) + list(value or ("",) * len(ENRICH_FIELDS)) + [status])
+
+    love_rows = iter_aligned_rows(love_path, love_headers)
+    # 按扩展后的列名对齐时，放不下的只剩重复列名之类
+    report.dropped_columns = next(love_rows)
+
+    if estimate_rows(futian_path) <= estimate_rows(love_path):
+        # 福田表较小：福田建索引，爱心流动边读边查边写
+        report.build_side = "福田统计表"
+        index = {}
+        for keys, value in _iter_futian(futian_path, futian_headers):
+            for key in keys:
+                if key in index:
+                    index[key].add(value)
+                else:
+                    index[key] = _Candidates(value)
+        for row in love_rows:
+            status, value = _resolve(index.get(k) for k in love_keys(row[name_idx]))
+            emit(row, status, value)
+    else:
+        # 爱心流动表较小：先把它读进来按键建索引，再流式扫描福田表收集候选
+        report.build_side = "爱心流动表"
+        rows, row_keys, index = [], [], {}
+        for row in love_rows:
+            keys = love_keys(row[name_idx])
+            for key in keys:
+                index.setdefault(key, []).append(len(rows))
+            rows.append(row)
+            row_keys.append(keys)
+        found = {}   # 键 -> _Candidates，只保存爱心流动表里出现过的键
+        for keys, value in _iter_futian(futian_path, futian_headers):
+            for key in keys:
+                if key not in index:
+                    continue
+                if key in found:
+                    found[key].add(value)
+                else:
+                    found[key] = _Candidates(value)
+        for row, keys in zip(rows, row_keys):
+            status, value = _resolve(found.get(k) for k in keys)
+            emit(row, status, value)
+
+    problem_ws = out_wb.create_sheet("匹配问题")
+    problem_ws.append(["被流动人", "情况", "行数"])
+    for name, (status, count) in report.problems.items():
+        problem_ws.append([name, status, count])
+
+    tmp = output_path + ".tmp.xlsx"
+    out_wb.save(tmp)
+    os.replace(tmp, output_path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用福田统计表补全爱心流动表的 团队 / 推荐人 / 电话号码")
+    parser.add_argument("love", help="爱心流动表 .xlsx")
+    parser.add_argument("futian", help="福田统计表 .xlsx")
+    parser.add_argument("output", help="输出文件 .xlsx")
+    args = parser.parse_args()
+
+    report = enrich_love_workbook(args.love, args.futian, args.output)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
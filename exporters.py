@@ -0,0 +1,175 @@
+"""轻量导出：CSV（带 BOM，Excel 直接打开不乱码）/ JSONL / Parquet
+
+下游报表只需要数据本身，不必每次都生成整本 .xlsx。
+所有导出都按行流式写出，可只导出第 start 行之后新增的数据（增量导出）。
+空行不算数据行（与预览的计数一致），start 按非空行计。
+Parquet 需要 pyarrow（可选依赖，未安装时界面不显示该选项），按块写入。
+
+用法:
+    python exporters.py 福田统计表.xlsx 导出.csv
+    python exporters.py 爱心流动表.xlsx 导出.parquet --since 100
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from importlib.util import find_spec
+from itertools import islice
+
+from memprofile import stage
+
+PARQUET_CHUNK_ROWS = 10_000
+
+EXPORT_FORMATS = {
+    # 格式: (扩展名, MIME)
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+    "jsonl": (".jsonl", "application/x-ndjson"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def parquet_available():
+    return find_spec("pyarrow") is not None
+
+
+def available_formats():
+    return [f for f in EXPORT_FORMATS if f != "parquet" or parquet_available()]
+
+
+def is_blank_row(row):
+    return all(v is None for v in row)
+
+
+def sheet_rows(wb, start=0):
+    """(表头, 非空数据行迭代器)；start 为跳过的数据行数（增量导出用）"""
+    ws = wb.active
+    it = ws.iter_rows(values_only=True)
+    headers = [str(h) if h is not None else "" for h in next(it, ())]
+    rows = (row for row in it if not is_blank_row(row))
+    return headers, islice(rows, start, None)
+
+
+def count_data_rows(wb):
+    return sum(1 for row in wb.active.iter_rows(min_row=2, values_only=True) if not is_blank_row(row))
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def write_csv(headers, rows, out):
+    """写入二进制流 out，返回行数"""
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow(["" if v is None else _plain(v) for v in row])
+        count += 1
+    text.flush()
+    text.detach()
+    return count
+
+
+def write_jsonl(headers, rows, out):
+    count = 0
+    for row in rows:
+        record = {h: _plain(v) for h, v in zip(headers, row) if h}
+        out.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+        out.write(b"\n")
+        count += 1
+    return count
+
+
+def write_parquet(headers, rows, out, chunk_rows=PARQUET_CHUNK_ROWS):
+    """按块写 Parquet；表格里的混合类型统一按字符串存"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = [h or f"列{i + 1}" for i, h in enumerate(headers)]
+    schema = pa.schema([(n, pa.string()) for n in names])
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                writer.write_table(_parquet_chunk(chunk, names, schema))
+                count += len(chunk)
+                chunk = []
+        if chunk or count == 0:
+            writer.write_table(_parquet_chunk(chunk, names, schema))
+            count += len(chunk)
+    return count
+
+
+def _parquet_chunk(chunk, names, schema):
+    import pyarrow as pa
+    columns = []
+    for i in range(len(names)):
+        columns.append([None if i >= len(r) or r[i] is None else str(_plain(r[i])) for r in chunk])
+    return pa.Table.from_arrays([pa.array(c, type=pa.string()) for c in columns], schema=schema)
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_bytes(wb, fmt, start=0):
+    """把 Workbook 导出为指定格式，返回 (BytesIO, 导出行数)"""
+    if fmt == "xlsx" and start == 0:
+        from futian_core import to_excel_bytes
+        return to_excel_bytes(wb), count_data_rows(wb)
+    headers, rows = sheet_rows(wb, start)
+    return export_rows_bytes(headers, rows, fmt)
+
+
+def export_rows_bytes(headers, rows, fmt):
+    """把 (表头, 行迭代器) 导出为指定格式；xlsx 用只写模式流式生成"""
+    with stage(f"export_{fmt}"):
+        return _export_rows_bytes(headers, rows, fmt)
+
+
+def _export_rows_bytes(headers, rows, fmt):
+    output = io.BytesIO()
+    if fmt == "xlsx":
+        import openpyxl
+        out_wb = openpyxl.Workbook(write_only=True)
+        ws = out_wb.create_sheet("Sheet1")
+        ws.append(headers)
+        count = 0
+        for row in rows:
+            ws.append(row)
+            count += 1
+        out_wb.save(output)
+    else:
+        count = WRITERS[fmt](headers, rows, output)
+    output.seek(0)
+    return output, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出为 CSV / JSONL / Parquet")
+    parser.add_argument("source", help="Excel 文件（分片表给出表名，如 爱心流动表.xlsx）")
+    parser.add_argument("output", help="输出文件，格式按扩展名判断")
+    parser.add_argument("--since", type=int, default=0, help="跳过前 N 行数据，只导出之后新增的行")
+    args = parser.parse_args()
+
+    fmt = os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        parser.error(f"不支持的格式: {fmt}（可选 {', '.join(WRITERS)}）")
+
+    from sharding import ShardReadView
+    view = ShardReadView(args.source)
+    rows = (row for i, row in enumerate(view.iter_rows()) if i >= args.since)
+    with open(args.output, "wb") as out:
+        count = WRITERS[fmt](view.headers, rows, out)
+    print(f"已导出 {count} 行 -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
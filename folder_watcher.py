@@ -0,0 +1,227 @@
+"""共享文件夹监听：增量导入新放入 / 追加内容的 .txt 记录文件
+
+用法:
+    python folder_watcher.py 收件夹 福田统计表.xlsx --mode 福田统计 --interval 5
+
+每个文件在状态文件里记录 (大小, 修改时间, 已导入字节偏移, 开头内容哈希)：
+  - 新文件从头解析；
+  - 变大的文件只从上次的偏移继续读；
+  - 变小或开头内容被改写的文件视为新文件重新导入。
+文件大小需在两次轮询之间保持不变才会读取，避免读到写了一半的记录
+（--once 时先记下大小，等 --settle 秒后再扫描一轮）。
+最后一条记录后面随时可能再追加续行，所以先留着不导入（偏移停在它的开头），
+等后面出现新记录的首字段、或文件超过 --idle 秒没有改动时再导入；--once 时全部导入。
+每轮轮询的所有新记录合并为一次 append_batch_to_file，写盘成功后才提交偏移。
+校验有错误的记录不写入表格，写盘成功后原文连同问题追加到文件夹里的 rejected.log；
+不属于任何记录的文字（第一个首字段之前的开场白、末尾没有首字段的段落）也记到这里。
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import time
+
+from futian_core import MODE_OPTIONS, split_records, extract_info_by_mode, append_batch_to_file
+from sharding import SHARD_BY_OPTIONS, ShardedWorkbook, is_sharded
+from mode_specs import get_mode
+from validation import validate_batch
+
+STATE_FILE_NAME = ".folder_watcher_state.json"
+REJECTED_FILE_NAME = "rejected.log"
+PREFIX_HASH_BYTES = 4096
+DEFAULT_IDLE_SECONDS = 60.0
+
+
+def decode_text(data):
+    """优先 UTF-8（含 BOM），失败时按 GBK 读（Windows 记事本常见编码）"""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("gbk", errors="replace")
+
+
+def line_offset(data, line):
+    """data 中第 line 行（从 0 起）开头的字节偏移；UTF-8 / GBK 的多字节字符里都不会出现换行字节"""
+    pos = 0
+    for _ in range(line):
+        pos = data.index(b"\n", pos) + 1
+    return pos
+
+
+def prefix_hash(path, length):
+    """文件开头 length 字节的哈希，用来识别被整体改写的文件"""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(min(length, PREFIX_HASH_BYTES))).hexdigest()
+
+
+class FolderWatcher:
+    def __init__(self, folder, excel_path, mode="福田统计", pattern="*.txt", state_path=None,
+                 shard_by=None, shard_rows=None, idle=DEFAULT_IDLE_SECONDS):
+        if mode not in MODE_OPTIONS:
+            raise ValueError(f"未知模式: {mode}")
+        self.folder = os.path.abspath(folder)
+        self.excel_path = excel_path
+        self.mode = mode
+        self.pattern = pattern
+        self.sharded = (ShardedWorkbook(excel_path, mode, shard_by, shard_rows)
+                        if shard_by or is_sharded(excel_path) else None)
+        self.state_path = state_path or os.path.join(folder, STATE_FILE_NAME)
+        # 文件多久没改动就认为最后一条记录已经写完
+        self.idle = idle
+        self.state = self._load_state()
+        # 上一轮看到的文件大小，用于判断文件是否已写完
+        self._last_seen = {}
+        starts = "、".join(sorted(get_mode(mode).record_start_keys))
+        self.stray_issue = f"不属于任何记录（前面没有「{starts}」等首字段），未导入"
+
+
+    # ---------- 状态文件 ----------
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise Exception(f"状态文件损坏，请检查 {self.state_path}: {e}")
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_path)
+
+    # ---------- 扫描 ----------
+
+    def _candidates(self):
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and fnmatch.fnmatch(entry.name, self.pattern):
+                yield entry.path, entry.stat()
+
+    def _start_offset(self, path, st):
+        """返回应开始读取的偏移；None 表示没有新内容"""
+        rec = self.state.get(path)
+        if rec is None:
+            return 0
+        if st.st_size == rec["size"] and st.st_mtime == rec["mtime"] and rec["offset"] == st.st_size:
+            return None
+        if st.st_size < rec["offset"] or prefix_hash(path, rec["offset"]) != rec["prefix"]:
+            return 0  # 文件被截断或改写，按新文件处理
+        if st.st_size == rec["offset"]:
+            return None
+        return rec["offset"]
+
+    def _sizes(self):
+        return {path: st.st_size for path, st in self._candidates()}
+
+    def poll_once(self, settle=None, flush=False):
+        """扫描一轮，返回本轮导入的记录数
+
+        settle 给定时先记下各文件大小、等 settle 秒再扫描，单独一轮就能确认文件已写完。
+        flush 为 True 时最后一条记录也一起导入，不等文件空闲（--once 用）。
+        """
+        if settle is not None:
+            self._last_seen = self._sizes()
+            time.sleep(settle)
+        infos, texts, pending, stray = [], [], {}, []
+        seen = {}
+        for path, st in self._candidates():
+            seen[path] = st.st_size
+            if self._last_seen.get(path) != st.st_size:
+                continue  # 还在写入，下一轮再看
+            offset = self._start_offset(path, st)
+            if offset is None:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+            tail = []
+            split_records(decode_text(data), self.mode, tail=tail)
+            if tail and not flush and time.time() - st.st_mtime < self.idle:
+                # 最后一段可能还会有续行：只处理它前面的部分，偏移停在它的开头
+                data = data[:line_offset(data, tail[0])]
+                if not data:
+                    continue
+            leftover = []
+            for text in split_records(decode_text(data), self.mode, leftover):
+                infos.append(extract_info_by_mode(text, self.mode))
+                texts.append((os.path.basename(path), text))
+            stray.extend(((os.path.basename(path), text), self.stray_issue) for text in leftover)
+            end = offset + len(data)
+            pending[path] = {
+                "size": st.st_size, "mtime": st.st_mtime, "offset": end,
+                "prefix": prefix_hash(path, end),
+            }
+        self._last_seen = seen
+
+        if not pending:
+            return 0
+        report = validate_batch(infos, self.mode)
+        rejected = stray + [(texts[i], report.issues(i)) for i in report.error_rows]
+        if not report.ok:
+            bad = set(report.error_rows)
+            infos = [info for i, info in enumerate(infos) if i not in bad]
+        if infos and self.sharded:
+            self.sharded.append_batch(infos)
+        elif infos:
+            append_batch_to_file(self.excel_path, infos, self.mode)
+        # 写盘失败时偏移不提交，下一轮会重读同样的内容，这时才记日志以免重复记录
+        if rejected:
+            self._log_rejected(rejected)
+        self.state.update(pending)
+        self._save_state()
+        return len(infos)
+
+    def _log_rejected(self, rejected):
+        path = os.path.join(self.folder, REJECTED_FILE_NAME)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(path, "a", encoding="utf-8") as f:
+            for (name, text), issues in rejected:
+                f.write(f"==== {stamp} {name}: {issues}\n{text}\n\n")
+        print(f"[{time.strftime('%H:%M:%S')}] {len(rejected)} 段文字未导入（校验未通过或不属于任何记录），已记入 {path}")
+
+    def run(self, interval=5.0):
+        print(f"开始监听: {self.folder} ({self.pattern}) -> {self.excel_path} ({self.mode})")
+        while True:
+            try:
+                count = self.poll_once()
+                if count:
+                    print(f"[{time.strftime('%H:%M:%S')}] 已导入 {count} 条记录")
+            except Exception as e:
+                print(f"[{time.strftime('%H:%M:%S')}] 导入失败: {e}")
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享文件夹增量导入")
+    parser.add_argument("folder", help="要监听的文件夹")
+    parser.add_argument("excel", help="目标 Excel 文件")
+    parser.add_argument("--mode", default="福田统计", choices=MODE_OPTIONS)
+    parser.add_argument("--pattern", default="*.txt")
+    parser.add_argument("--interval", type=float, default=5.0, help="轮询间隔（秒）")
+    parser.add_argument("--state", help=f"状态文件路径（默认: 文件夹/{STATE_FILE_NAME}）")
+    parser.add_argument("--shard-by", choices=SHARD_BY_OPTIONS, help="按月份 / 行数滚动写入分片文件")
+    parser.add_argument("--shard-rows", type=int,
+                        help="按行数分片时每个分片的行数上限（新建时默认 5000；已分片的表须与清单一致）")
+    parser.add_argument("--once", action="store_true",
+                        help="只导入一轮：先记下文件大小，等 --settle 秒后大小没变的文件才导入")
+    parser.add_argument("--settle", type=float, default=1.0, help="--once 时确认文件已写完的等待时间（秒）")
+    parser.add_argument("--idle", type=float, default=DEFAULT_IDLE_SECONDS,
+                        help="文件超过这么多秒没有改动，才导入最后一条记录（之前可能还会追加续行）")
+    args = parser.parse_args()
+
+    watcher = FolderWatcher(args.folder, args.excel, args.mode, args.pattern, args.state,
+                            args.shard_by, args.shard_rows, args.idle)
+    if args.once:
+        print(f"已导入 {watcher.poll_once(settle=args.settle, flush=True)} 条记录")
+        return
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
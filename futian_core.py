@@ -0,0 +1,265 @@
+"""填表助手公共内核：解析逻辑 + Workbook 操作（不依赖任何界面库）
+
+openpyxl 导入较慢（办公电脑上常占冷启动一大半），这里只在第一次真正用到时才导入；
+界面程序可以在窗口显示后调用 warm_up_in_background() 提前在后台线程里预热。
+"""
+import importlib
+import re
+import io
+import os
+import threading
+
+from mode_specs import get_mode, mode_names
+from header_index import FUZZY_KINDS, build_header_index
+from memprofile import stage
+from parse_cache import parse_cache
+
+# ================= 1. 配置区 =================
+
+# 表头 / 别名 / 后处理都定义在 modes.json，这里只保留常用名字方便引用
+HEADERS_FUTIAN = get_mode("福田统计").headers
+HEADERS_LOVE = get_mode("爱心流动").headers
+
+MODE_OPTIONS = mode_names()
+
+# ================= 2. 解析逻辑区 =================
+
+def extract_info_by_mode(text, mode):
+    """根据模式分发解析逻辑（解析器在 mode_specs 中预编译，重复的文本直接取缓存）"""
+    return parse_cache.parse(text, mode)
+
+def split_records(text, mode, leftover=None, tail=None):
+    """把包含多条记录的文本拆成单条记录
+
+    有首字段的模式（福田的姓名、爱心的被流动人）以首字段或 【...】 标题行作为新记录的开始；
+    自定义模式没有固定首字段，按空行分段。
+    第一个首字段之前的文字（紧挨着记录的 【...】 标题及其后内容除外）和最后一段没有首字段的文字
+    不属于任何记录：leftover 传入列表时追加到里面，否则丢弃。
+    tail 传入列表时追加最后一段（最后一条记录，或末尾不属于任何记录的文字）起始的行号（从 0 起），
+    文本还在追加时调用方可以先不处理这一段；没有非空内容时不追加。
+    """
+    text = text.replace("\r\n", "\n")
+    spec = get_mode(mode)
+    if not spec.record_start_keys:
+        if tail is not None:
+            lines = text.split("\n")
+            last = max((i for i, l in enumerate(lines) if l.strip()), default=None)
+            if last is not None:
+                while last > 0 and lines[last - 1].strip():
+                    last -= 1
+                tail.append(last)
+        return [b.strip() for b in re.split(r"\n\s*\n", text) if b.strip()]
+
+    def drop(lines):
+        if leftover is not None and "".join(lines).strip():
+            leftover.append("\n".join(lines).strip())
+
+    # current_start: current 第一行的行号
+    records, current, current_start, seen_start = [], [], 0, False
+    for index, raw_line in enumerate(text.split("\n")):
+        line = raw_line.strip()
+        if line.startswith("【") and line.endswith("】"):
+            if seen_start:
+                records.append("\n".join(current))
+                current, current_start, seen_start = [], index, False
+            current.append(raw_line)
+            continue
+        if spec.is_record_start(line):
+            if seen_start:
+                records.append("\n".join(current))
+                current, current_start = [], index
+            else:
+                # 记录之前的文字：从最后一个标题行起算作这条记录，更前面的不属于任何记录
+                titles = [i for i, l in enumerate(current) if l.strip().startswith("【") and l.strip().endswith("】")]
+                cut = titles[-1] if titles else len(current)
+                drop(current[:cut])
+                current, current_start = current[cut:], current_start + cut
+            seen_start = True
+        current.append(raw_line)
+    if tail is not None and "".join(current).strip():
+        tail.append(current_start)
+    if seen_start:
+        records.append("\n".join(current))
+    else:
+        drop(current)
+    return [r.strip() for r in records if r.strip()]
+
+# ================= 3. Excel 核心操作 =================
+
+def warm_up():
+    """导入 openpyxl 及写入时用到的子模块"""
+    # 只为提前导入、把模块放进 sys.modules，名字本身不会用到
+    for name in ("openpyxl", "openpyxl.styles", "openpyxl.utils"):
+        importlib.import_module(name)
+
+def warm_up_in_background():
+    """后台线程预热 openpyxl，不阻塞界面首次绘制"""
+    thread = threading.Thread(target=warm_up, name="openpyxl-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def load_workbook(source, **kwargs):
+    """openpyxl.load_workbook 的延迟导入版本"""
+    import openpyxl
+    with stage("load_workbook"):
+        return openpyxl.load_workbook(source, **kwargs)
+
+def parse_custom_headers(raw):
+    """'姓名 电话，备注' -> ['姓名', '电话', '备注']"""
+    return [h for h in re.split(r'[，, \s]+', raw) if h]
+
+def create_blank_workbook(mode, custom_headers_str="", layout=None):
+    """创建空白 Workbook 并设置表头；layout 为 modes.json 里该模式的列宽布局名"""
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+
+    spec = get_mode(mode)
+    if spec.custom_headers:
+        headers = parse_custom_headers(custom_headers_str)
+        if not headers: headers = ["列名1", "列名2", "列名3"] # 默认保底
+    else:
+        headers = spec.headers
+
+    ws.append(headers)
+
+    # 设置列宽（模式里没单独指定的列用默认宽度）
+    for col, header in enumerate(headers, 1):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = spec.column_width(header, layout)
+
+    return wb
+
+def read_header_map(sheet):
+    """读取第一行表头 -> {列名: 列索引}"""
+    header_map = {}
+    for col_idx, cell in enumerate(sheet[1], 1):
+        if cell.value: header_map[str(cell.value).strip()] = col_idx
+    return header_map
+
+def record_key_name(info_dict, mode):
+    """成功消息里展示的关键字段"""
+    return get_mode(mode).key_name(info_dict)
+
+def write_record_row(sheet, header_map, next_row, info_dict, mode, seq=None, fuzzy=None):
+    """写入一行，返回没能放进任何列的 [(键, 原因)]（仅自定义模式统计）
+
+    seq 为该行的序号；不传时按 "行号 - 1" 计算。
+    fuzzy 传入列表时，追加按包含 / 近似列名写入的 (键, 列名, 匹配方式)，供界面提示核对。
+    """
+    from openpyxl.styles import Alignment
+    custom = get_mode(mode).custom_headers
+    taken = set()
+    pending = []
+    for field, value in info_dict.items():
+        # 1. 精确匹配
+        if field in header_map:
+            cell = sheet.cell(row=next_row, column=header_map[field])
+            cell.value = value
+            cell.alignment = Alignment(wrap_text=True) # 自动换行
+            taken.add(header_map[field])
+        elif custom:
+            pending.append((field, value))
+
+    # 2. 模糊匹配 (仅自定义模式)：查预编译的表头索引，不占用已被精确匹配的列
+    unplaced = []
+    if pending:
+        index = build_header_index(header_map)
+        for field, value in pending:
+            col, how = index.resolve(field)
+            if col is None:
+                if value: unplaced.append((field, how))
+            elif col in taken:
+                if value: unplaced.append((field, "列已占用"))
+            else:
+                cell = sheet.cell(row=next_row, column=col)
+                cell.value = value
+                cell.alignment = Alignment(wrap_text=True)
+                taken.add(col)
+                if fuzzy is not None and how in FUZZY_KINDS and value:
+                    header = next(name for name, c in header_map.items() if c == col)
+                    fuzzy.append((field, header, how))
+
+    # 序号自动生成
+    if "序号" in header_map:
+        sheet.cell(row=next_row, column=header_map["序号"]).value = next_row - 1 if seq is None else seq
+    return unplaced
+
+def format_unplaced(unplaced):
+    """'未匹配字段: 微信(未找到)、电话(列已占用)'，没有时返回空串"""
+    if not unplaced: return ""
+    return "未匹配字段: " + "、".join(f"{k}({why})" for k, why in unplaced)
+
+def format_fuzzy(fuzzy):
+    """'请核对: 联系手机→手机号码(包含)'，没有时返回空串"""
+    if not fuzzy: return ""
+    return "请核对: " + "、".join(f"{k}→{header}({how})" for k, header, how in fuzzy)
+
+def append_data_to_workbook(wb, info_dict, mode):
+    """将字典数据追加到 Workbook"""
+    sheet = wb.active
+    header_map = read_header_map(sheet)
+
+    if not header_map: return False, "表格没有表头，无法识别列名"
+
+    next_row = sheet.max_row + 1
+    fuzzy = []
+    with stage("append_data_to_workbook"):
+        unplaced = write_record_row(sheet, header_map, next_row, info_dict, mode, fuzzy=fuzzy)
+
+    msg = f"成功添加：{record_key_name(info_dict, mode)}"
+    notes = [n for n in (format_unplaced(unplaced), format_fuzzy(fuzzy)) if n]
+    if notes: msg += f"（{'；'.join(notes)}）"
+    return True, msg
+
+def append_batch_to_file(excel_path, info_list, mode, start_seq=None, headers=None, unplaced=None, fuzzy=None):
+    """一次打开 / 一次保存，批量追加多条记录；返回每条记录所在的行号
+
+    文件不存在时按模式自动新建；自定义模式需通过 headers 给出表头。
+    start_seq 给定时序号从它开始连续编号（分片文件用），否则按行号计算。
+    unplaced 传入列表时，按记录顺序追加每条记录未能放入任何列的字段；
+    fuzzy 同理，追加每条记录按包含 / 近似列名写入的字段（见 write_record_row）。
+    """
+    if os.path.exists(excel_path):
+        try:
+            wb = load_workbook(excel_path)
+        except Exception as e:
+            raise Exception(f"打开 Excel 失败: {str(e)}")
+    elif not get_mode(mode).custom_headers:
+        wb = create_blank_workbook(mode)
+    elif headers:
+        wb = create_blank_workbook(mode, " ".join(headers))
+    else:
+        raise Exception("找不到文件，请先创建或选择文件！")
+
+    sheet = wb.active
+    header_map = read_header_map(sheet)
+    if not header_map:
+        raise Exception("Excel 文件没有表头，无法匹配数据。")
+
+    rows = []
+    next_row = sheet.max_row + 1
+    for i, info in enumerate(info_list):
+        seq = None if start_seq is None else start_seq + i
+        guessed = []
+        missed = write_record_row(sheet, header_map, next_row, info, mode, seq, guessed)
+        if unplaced is not None:
+            unplaced.append(missed)
+        if fuzzy is not None:
+            fuzzy.append(guessed)
+        rows.append(next_row)
+        next_row += 1
+
+    try:
+        wb.save(excel_path)
+    except PermissionError:
+        raise Exception("无法保存！请先关闭该 Excel 文件后再试。")
+    return rows
+
+def to_excel_bytes(wb):
+    """将 Workbook 转换为二进制流供下载"""
+    with stage("to_excel_bytes"):
+        output = io.BytesIO()
+        wb.save(output)
+        output.seek(0)
+    return output
@@ -0,0 +1,134 @@
+"""自定义模式的表头模糊匹配
+
+把表头行预处理成若干张哈希表（每个工作簿只做一次），
+解析出的每个键按以下顺序查找，每一步都是常数次字典查询：
+  1. 规范化后完全相同（全半角、标点、空格、大小写统一）
+  2. 同义词（modes.json 里各字段的别名 + header_synonyms）
+  3. 包含关系（键是表头的一段，或表头是键的一段）
+  4. 编辑距离 1（删除邻域：两边各删一个字后相同）
+第 3、4 步只对规范化后至少 3 个字的键和表头做：两个字的词只要有一个字相同就会"命中"
+（如 电邮 -> 电话、来源 -> 源头），误配比漏配更难发现。
+查不到或多个列同时命中的键不会被写入，而是放进"未放置"列表返回给界面；
+按第 3、4 步写入的键也会报告给界面，方便核对（见 futian_core.write_record_row）。
+"""
+import unicodedata
+from functools import lru_cache
+
+from mode_specs import header_synonym_groups
+
+MIN_FUZZY_LEN = 3   # 规范化后少于 3 个字的键 / 表头只做精确、规范化、同义词匹配
+FUZZY_KINDS = ("包含", "近似")   # 需要提示用户核对的匹配方式
+AMBIGUOUS = -1      # 多个列同时命中时的占位
+
+
+def normalize_header(text):
+    """全角转半角、去掉标点和空白、英文转小写：'手机 号码（必填）：' -> '手机号码必填'"""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] in ("L", "N"))
+
+
+def _strip_note(text):
+    """去掉括号里的注释：'电话（手机）' -> '电话'"""
+    return str(text).split("（")[0].split("(")[0]
+
+
+def _deletions(norm):
+    return {norm[:i] + norm[i + 1:] for i in range(len(norm))}
+
+
+def _put(table, key, col):
+    """登记 key -> col；同一个 key 指向不同列时标记为有歧义"""
+    old = table.get(key)
+    if old is None:
+        table[key] = col
+    elif old != col:
+        table[key] = AMBIGUOUS
+
+
+class HeaderIndex:
+    """一行表头编译后的查找表"""
+
+    def __init__(self, header_items):
+        self.exact = {}      # 原始列名 -> 列
+        self.norm = {}       # 规范化列名 -> 列
+        self.synonym = {}    # 同义词规范形 -> 列
+        self.substring = {}  # 列名的每个连续片段 -> 列
+        self.deletion = {}   # 列名删一个字后的形式 -> 列
+
+        for name, col in header_items:
+            self.exact[name] = col
+            for form in {normalize_header(name), normalize_header(_strip_note(name))}:
+                if not form:
+                    continue
+                _put(self.norm, form, col)
+                if len(form) >= MIN_FUZZY_LEN:
+                    for i in range(len(form)):
+                        for j in range(i + MIN_FUZZY_LEN, len(form) + 1):
+                            _put(self.substring, form[i:j], col)
+                    for d in _deletions(form):
+                        _put(self.deletion, d, col)
+
+        for group in header_synonym_groups():
+            forms = {normalize_header(s) for s in group}
+            cols = {self.norm[f] for f in forms if self.norm.get(f, AMBIGUOUS) != AMBIGUOUS}
+            if len(cols) == 1:
+                col = cols.pop()
+                for f in forms:
+                    _put(self.synonym, f, col)
+
+    def resolve(self, key):
+        """返回 (列, 匹配方式)；找不到或有歧义返回 (None, 原因)"""
+        if key in self.exact:
+            return self.exact[key], "精确"
+        form = normalize_header(_strip_note(key)) or normalize_header(key)
+        if not form:
+            return None, "空键"
+
+        ambiguous = False
+        for how, table in (("规范化", self.norm), ("同义词", self.synonym)):
+            col = table.get(form)
+            if col == AMBIGUOUS:
+                ambiguous = True
+            elif col is not None:
+                return col, how
+        if len(form) < MIN_FUZZY_LEN:
+            return None, "歧义" if ambiguous else "未找到"
+
+        # 键是某个表头的一段：'手机' -> '手机号码'
+        col = self.substring.get(form)
+        if col is not None and col != AMBIGUOUS:
+            return col, "包含"
+        ambiguous = ambiguous or col == AMBIGUOUS
+
+        # 表头是键的一段：'联系电话号码' -> '电话号码'（取最长的那段）
+        for length in range(len(form) - 1, MIN_FUZZY_LEN - 1, -1):
+            hits = {self.norm[form[i:i + length]] for i in range(len(form) - length + 1)
+                    if form[i:i + length] in self.norm}
+            if len(hits) == 1 and AMBIGUOUS not in hits:
+                return hits.pop(), "包含"
+            if hits:
+                ambiguous = True
+                break
+
+        # 编辑距离 1
+        candidates = {self.deletion.get(form), self.norm.get(form)}
+        for d in _deletions(form):
+            if len(d) >= MIN_FUZZY_LEN:   # 表头本身也要够长，'电话号' 不会落到 '电话'
+                candidates.add(self.norm.get(d))
+            candidates.add(self.deletion.get(d))
+        candidates.discard(None)
+        if len(candidates) == 1 and AMBIGUOUS not in candidates:
+            return candidates.pop(), "近似"
+        if candidates:
+            ambiguous = True
+        return None, "歧义" if ambiguous else "未找到"
+
+
+@lru_cache(maxsize=32)
+def _cached_index(header_items):
+    return HeaderIndex(header_items)
+
+
+def build_header_index(header_map):
+    """按表头内容缓存：同一个工作簿反复追加只编译一次"""
+    return _cached_index(tuple(header_map.items()))
@@ -0,0 +1,183 @@
+"""桌面版操作历史：固定容量环形缓冲 + 按天追加写入的日志 + 只渲染可见行的 Treeview
+
+全天录入时历史会有几千条；Treeview 每条一个 item 会越来越卡。
+这里 Treeview 只保留一屏（visible_rows）个 item，滚动时改写它们的内容；
+历史本身放在环形缓冲里，超过容量丢掉最旧的。
+每条记录追加一行 JSON 到当天的日志文件，重启后直接读回当天的记录；
+日志文件名在每次读写时按当前日期计算，程序跨过午夜后自动写到新一天的文件。
+"""
+import json
+import os
+from datetime import datetime
+from tkinter import ttk
+
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".futian_filling", "history")
+DEFAULT_CAPACITY = 5000
+
+
+class HistoryRecord:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = tuple("" if v is None else str(v) for v in values)
+
+
+class HistoryRing:
+    """固定容量的环形缓冲；索引 0 为最新一条"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._head = 0   # 下一条写入的位置
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, record):
+        self._items[self._head] = record
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._items[(self._head - 1 - i) % self.capacity]
+
+    def window(self, start, count):
+        """从最新往旧数，第 start 条起的 count 条"""
+        end = min(self._size, start + count)
+        return [self[i] for i in range(max(0, start), end)]
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._head = 0
+        self._size = 0
+
+
+class HistoryLog:
+    """当天的历史日志（JSON Lines），每条记录追加一行"""
+
+    def __init__(self, app_name, directory=HISTORY_DIR):
+        self.app_name = app_name
+        self.directory = directory
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.app_name}-{datetime.now():%Y-%m-%d}.jsonl")
+
+    def load(self, ring):
+        """把当天日志读进 ring（只保留最后 capacity 条）"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines[-ring.capacity:]:
+            try:
+                ring.append(HistoryRecord(json.loads(line)))
+            except ValueError:
+                continue  # 写到一半的行（如程序被强制关闭）直接跳过
+
+    def append(self, record):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record.values, ensure_ascii=False) + "\n")
+
+    def clear(self):
+        """删除当天（清空时所在这一天）的日志"""
+        path = self.path
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class VirtualHistoryView:
+    """只渲染可见窗口的历史表格（自带纵向滚动条）"""
+
+    def __init__(self, parent, columns, ring, visible_rows=20):
+        self.ring = ring
+        self.columns = columns
+        self.visible_rows = visible_rows
+        self.offset = 0
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", height=visible_rows)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self._on_wheel)          # Windows / macOS
+            widget.bind("<Button-4>", lambda e: self.scroll(-3))   # Linux
+            widget.bind("<Button-5>", lambda e: self.scroll(3))
+        self._item_ids = []
+
+    def pack(self, **kwargs):
+        self.tree.pack(side="left", fill="both", expand=True, **kwargs)
+        self.scrollbar.pack(side="right", fill="y")
+
+    def refresh(self):
+        """按当前 offset 重新填充可见的几行"""
+        max_offset = max(0, len(self.ring) - self.visible_rows)
+        self.offset = min(max(0, self.offset), max_offset)
+        records = self.ring.window(self.offset, self.visible_rows)
+
+        # 复用已有 item，只改内容；数量不够时补，多余的删掉
+        while len(self._item_ids) < len(records):
+            self._item_ids.append(self.tree.insert("", "end"))
+        while len(self._item_ids) > len(records):
+            self.tree.delete(self._item_ids.pop())
+        for iid, record in zip(self._item_ids, records):
+            self.tree.item(iid, values=record.values)
+
+        total = len(self.ring)
+        if total <= self.visible_rows:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + len(records)) / total)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.refresh()
+
+    def _on_wheel(self, event):
+        self.scroll(-1 * (event.delta // 120 or (1 if event.delta > 0 else -1)) * 3)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.ring))
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self.refresh()
+
+
+class HistoryPanel:
+    """环形缓冲 + 日志 + 虚拟表格 的组合，桌面程序直接使用"""
+
+    def __init__(self, parent, app_name, columns, visible_rows=20, capacity=DEFAULT_CAPACITY):
+        self.ring = HistoryRing(capacity)
+        self.log = HistoryLog(app_name)
+        self.log.load(self.ring)
+        self.view = VirtualHistoryView(parent, columns, self.ring, visible_rows)
+        self.tree = self.view.tree
+
+    def pack(self, **kwargs):
+        self.view.pack(**kwargs)
+        self.view.refresh()
+
+    def add(self, values):
+        record = HistoryRecord(values)
+        self.ring.append(record)
+        try:
+            self.log.append(record)
+        except OSError:
+            pass  # 日志写不了不影响录入
+        self.view.offset = 0  # 新记录在最上面，回到顶部
+        self.view.refresh()
+
+    def clear(self):
+        self.ring.clear()
+        try:
+            self.log.clear()
+        except OSError:
+            pass  # 日志删不掉（如被占用）也照样清空列表，和 add 一样不影响使用
+        self.view.offset = 0
+        self.view.refresh()
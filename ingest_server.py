@@ -0,0 +1,264 @@
+"""本地 HTTP 录入服务：群聊机器人直接推送记录，合并为批量写入
+
+用法:
+    python ingest_server.py 福田统计表.xlsx --mode 福田统计 --port 8765
+
+接口:
+    POST /ingest    正文为原始文本（一条记录），或 JSON：
+                    {"text": "..."} / {"texts": ["...", "..."]} / ["...", "..."]
+                    写入前整批校验，有错误时返回 422 和逐条状态，整批都不写入；
+                    加 ?force=1 跳过校验强制写入；
+                    一次提交的记录数超过写入队列上限时返回 413（请拆成几次提交）；
+                    成功时逐条返回 {"file": 文件名, "row": 行号, ...}（分片表的文件名是所在分片）
+    GET  /health    返回队列长度等状态
+
+同一时间窗口内到达的所有提交合并成一次 "打开-追加-保存"；
+写入队列满时直接返回 503 + Retry-After，让客户端稍后重试。
+"""
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import urlsplit, parse_qs
+
+from futian_core import MODE_OPTIONS, extract_info_by_mode, append_batch_to_file, record_key_name
+from sharding import SHARD_BY_OPTIONS, ShardedWorkbook, is_sharded
+from validation import validate_batch
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class IngestServer:
+    """解析在请求协程里完成，写盘由单个后台任务按时间窗口合并执行"""
+
+    def __init__(self, excel_path, mode="福田统计", window=0.5, max_queue=1000, max_batch=500,
+                 shard_by=None, shard_rows=None):
+        if mode not in MODE_OPTIONS:
+            raise ValueError(f"未知模式: {mode}")
+        self.excel_path = excel_path
+        self.mode = mode
+        # 开启分片（或表已经分片）时写入滚动到 <表名>_<月份/part>.xlsx
+        self.sharded = (ShardedWorkbook(excel_path, mode, shard_by, shard_rows)
+                        if shard_by or is_sharded(excel_path) else None)
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batches_written = 0
+        self.records_written = 0
+        self._writer_task = None
+        self._server = None
+
+    # ---------- 生命周期 ----------
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        # 先把队列里剩余的记录写完再退出
+        await self.queue.join()
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+
+    # ---------- 写入端：按窗口合并 ----------
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            infos = [info for info, _ in batch]
+            try:
+                rows = await loop.run_in_executor(None, self._write, infos)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done(): fut.set_exception(e)
+            else:
+                self.batches_written += 1
+                self.records_written += len(batch)
+                for (_, fut), placed in zip(batch, rows):
+                    if not fut.done(): fut.set_result(placed)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, infos):
+        """在线程池里执行的实际写盘；返回每条记录的 (文件名, 行号)，分片与否格式相同"""
+        if self.sharded:
+            return self.sharded.append_batch(infos)
+        rows = append_batch_to_file(self.excel_path, infos, self.mode)
+        return [(os.path.basename(self.excel_path), row) for row in rows]
+
+    async def submit(self, infos):
+        """排队写入已解析（且已校验）的记录；队列放不下整批时返回 None（背压）
+
+        整批超过队列上限的情况由调用方先拦下（返回 413），这里只处理暂时放不下
+        """
+        if self.queue.maxsize and self.queue.maxsize - self.queue.qsize() < len(infos):
+            return None
+        loop = asyncio.get_running_loop()
+        futures = []
+        for info in infos:
+            fut = loop.create_future()
+            self.queue.put_nowait((info, fut))
+            futures.append(fut)
+        placed = await asyncio.gather(*futures)
+        return [
+            {"file": file, "row": row, "name": record_key_name(info, self.mode), "info": info}
+            for info, (file, row) in zip(infos, placed)
+        ]
+
+    # ---------- HTTP 处理 ----------
+
+    async def _handle_client(self, reader, writer):
+        try:
+            status, payload, extra = await self._dispatch(reader)
+        except Exception as e:
+            status, payload, extra = 500, {"ok": False, "error": str(e)}, {}
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        head += [f"{k}: {v}" for k, v in extra.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            return 400, {"ok": False, "error": "请求行格式错误"}, {}
+        method, target, _ = parts
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {
+                "ok": True, "mode": self.mode, "queued": self.queue.qsize(),
+                "batches_written": self.batches_written, "records_written": self.records_written,
+            }, {}
+        if url.path != "/ingest":
+            return 404, {"ok": False, "error": "未知路径"}, {}
+        if method != "POST":
+            return 405, {"ok": False, "error": "只支持 POST"}, {"Allow": "POST"}
+
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            return 413, {"ok": False, "error": "内容过大"}, {}
+        raw = (await reader.readexactly(length)).decode("utf-8") if length else ""
+
+        query = parse_qs(url.query)
+        try:
+            texts = parse_texts(raw, headers.get("content-type", ""), query)
+        except ValueError as e:
+            return 400, {"ok": False, "error": str(e)}, {}
+
+        infos = [extract_info_by_mode(text, self.mode) for text in texts]
+        report = validate_batch(infos, self.mode)
+        if not report.ok and query.get("force", ["0"])[0] != "1":
+            return 422, {"ok": False, "error": report.summary(), "validation": report.table(infos, self.mode)}, {}
+
+        if self.queue.maxsize and len(infos) > self.queue.maxsize:
+            # 整批永远放不进队列，返回 503 只会让客户端无限重试
+            return 413, {"ok": False, "error": f"一次最多提交 {self.queue.maxsize} 条记录，本次 {len(infos)} 条，请拆分后提交"}, {}
+
+        results = await self.submit(infos)
+        if results is None:
+            retry = max(1, round(self.window))
+            return 503, {"ok": False, "error": "写入队列已满，请稍后重试"}, {"Retry-After": str(retry)}
+        return 200, {"ok": True, "records": results}, {}
+
+
+def parse_texts(raw, content_type, query=None):
+    """把请求正文拆成待解析的文本列表"""
+    if "json" in content_type or raw.lstrip().startswith(("{", "[")):
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON 格式错误: {e}")
+        if isinstance(data, dict):
+            data = data.get("texts", [data.get("text", "")])
+        if not isinstance(data, list) or not all(isinstance(t, str) for t in data):
+            raise ValueError("JSON 必须是字符串列表，或含 text / texts 字段的对象")
+        texts = data
+    else:
+        texts = [raw]
+    texts = [t for t in texts if t.strip()]
+    if not texts:
+        raise ValueError("内容不能为空")
+    return texts
+
+
+async def _serve(args):
+    server = IngestServer(args.excel, args.mode, args.window, args.queue_size, args.max_batch,
+                          args.shard_by, args.shard_rows)
+    srv = await server.start(args.host, args.port)
+    print(f"录入服务已启动: http://{args.host}:{server.port}/ingest  ->  {args.excel} ({args.mode})")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 HTTP 录入服务")
+    parser.add_argument("excel", help="目标 Excel 文件")
+    parser.add_argument("--mode", default="福田统计", choices=MODE_OPTIONS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window", type=float, default=0.5, help="合并写入的时间窗口（秒）")
+    parser.add_argument("--queue-size", type=int, default=1000, help="写入队列上限，满了返回 503")
+    parser.add_argument("--max-batch", type=int, default=500, help="单次写入的最大记录数")
+    parser.add_argument("--shard-by", choices=SHARD_BY_OPTIONS, help="按月份 / 行数滚动写入分片文件")
+    parser.add_argument("--shard-rows", type=int,
+                        help="按行数分片时每个分片的行数上限（新建时默认 5000；已分片的表须与清单一致）")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
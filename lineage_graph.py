@@ -0,0 +1,192 @@
+"""爱心流动的流向图：源头 → 流动人 → 被流动人 → 回流人
+
+每一行记录产生最多三条有向边：
+    源头 → 流动人      （源头）
+    流动人 → 被流动人  （流动）
+    被流动人 → 回流人  （回流）
+节点是规范化后的姓名（全半角、空白、大小写统一），映射为整数 id；
+边存为并列数组，出边 / 入边各有一份邻接表，按边类型累计入边份数，
+因此"某人往下所有人""回流到某人的总份数"之类的查询不需要扫表。
+
+载入表格时一次扫描建图，之后每追加一条记录调用 add_record 增量更新。
+"""
+from collections import deque
+
+from mode_specs import normalize_text
+
+LOVE_MODE = "爱心流动"
+
+EDGE_SOURCE, EDGE_FLOW, EDGE_RETURN = "源头", "流动", "回流"
+# (边类型, 起点字段, 终点字段)
+EDGE_FIELDS = (
+    (EDGE_SOURCE, "源头", "流动人"),
+    (EDGE_FLOW, "流动人", "被流动人"),
+    (EDGE_RETURN, "被流动人", "回流人"),
+)
+RECORD_FIELDS = ("被流动人", "类型", "份数", "日期", "流动人", "回流人", "源头")
+
+
+def _amount(value):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LineageGraph:
+    def __init__(self):
+        self._ids = {}        # 规范化姓名 -> 节点 id
+        self.names = []       # 节点 id -> 第一次出现时的原始姓名
+        self._out = []        # 节点 id -> [边 id]
+        self._in = []
+        # 边：并列数组
+        self._src, self._dst, self._kind, self._rec = [], [], [], []
+        # 记录：(行号, 被流动人, 类型, 份数, 日期, 流动人, 回流人, 源头)
+        self.records = []
+        # 边类型 -> 节点 id -> 入边份数合计
+        self._in_amount = {kind: {} for kind, _, _ in EDGE_FIELDS}
+
+    # ---------- 建图 ----------
+
+    @classmethod
+    def from_rows(cls, headers, rows):
+        """从表头和 (行号, 数据行) 序列一次扫描建图
+
+        行号随行一起传入而不是按顺序推算：表中间有空行时，跳过空行后的记录仍是真实行号。
+        """
+        graph = cls()
+        positions = {str(h).strip(): i for i, h in enumerate(headers) if h is not None}
+        columns = [(field, positions[field]) for field in RECORD_FIELDS if field in positions]
+        for row_number, row in rows:
+            info = {field: row[i] if i < len(row) else None for field, i in columns}
+            graph.add_record(info, row_number)
+        return graph
+
+    @classmethod
+    def from_file(cls, excel_path):
+        """以只读流式方式读取 Excel 建图；分片表读全部分片（行号为各分片连起来的顺序号）"""
+        from futian_core import load_workbook
+        from sharding import ShardReadView, is_sharded
+        if is_sharded(excel_path):
+            view = ShardReadView(excel_path)
+            return cls.from_rows(view.headers, enumerate(view.iter_rows(), 2))
+        wb = load_workbook(excel_path, read_only=True)
+        try:
+            it = wb.active.iter_rows(values_only=True)
+            headers = next(it, ())
+            return cls.from_rows(headers, ((i, r) for i, r in enumerate(it, 2) if any(v is not None for v in r)))
+        finally:
+            wb.close()
+
+    def _node(self, name):
+        key = normalize_text(name)
+        if not key:
+            return None
+        node = self._ids.get(key)
+        if node is None:
+            node = self._ids[key] = len(self.names)
+            self.names.append(str(name).strip())
+            self._out.append([])
+            self._in.append([])
+        return node
+
+    def add_record(self, info, row=None):
+        """追加一条记录（字段 -> 值）；row 缺省时接在最后一条之后"""
+        if row is None:
+            row = self.records[-1][0] + 1 if self.records else 2
+        rec = len(self.records)
+        amount = _amount(info.get("份数"))
+        self.records.append((row,) + tuple(
+            amount if f == "份数" else (info.get(f) or "") for f in RECORD_FIELDS))
+
+        for kind, src_field, dst_field in EDGE_FIELDS:
+            src, dst = self._node(info.get(src_field)), self._node(info.get(dst_field))
+            if src is None or dst is None or src == dst:
+                continue
+            edge = len(self._src)
+            self._src.append(src)
+            self._dst.append(dst)
+            self._kind.append(kind)
+            self._rec.append(rec)
+            self._out[src].append(edge)
+            self._in[dst].append(edge)
+            totals = self._in_amount[kind]
+            totals[dst] = totals.get(dst, 0.0) + amount
+
+    # ---------- 查询 ----------
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, name):
+        return normalize_text(name) in self._ids
+
+    def _walk(self, name, adjacency, ends, max_depth=None):
+        """广度优先遍历，返回 (按距离排序的 [(姓名, 距离)], 经过的记录下标集合)"""
+        start = self._ids.get(normalize_text(name))
+        if start is None:
+            return [], set()
+        seen = {start: 0}
+        order, recs = [], set()
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            depth = seen[node]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for edge in adjacency[node]:
+                recs.add(self._rec[edge])
+                nxt = ends[edge]
+                if nxt not in seen:
+                    seen[nxt] = depth + 1
+                    order.append((self.names[nxt], depth + 1))
+                    queue.append(nxt)
+        return order, recs
+
+    def downstream(self, name, max_depth=None):
+        """name 往下能到达的所有人及相关记录"""
+        return self._walk(name, self._out, self._dst, max_depth)
+
+    def upstream(self, name, max_depth=None):
+        """name 往上追溯到的所有人及相关记录"""
+        return self._walk(name, self._in, self._src, max_depth)
+
+    def inbound_amount(self, name, kind):
+        node = self._ids.get(normalize_text(name))
+        if node is None:
+            return 0.0
+        return self._in_amount[kind].get(node, 0.0)
+
+    def returned_to(self, name):
+        """回流到 name 的总份数"""
+        return self.inbound_amount(name, EDGE_RETURN)
+
+    def node_stats(self, name):
+        """某人在各角色下的记录数和份数"""
+        node = self._ids.get(normalize_text(name))
+        if node is None:
+            return None
+        given = [e for e in self._out[node] if self._kind[e] == EDGE_FLOW]
+        return {
+            "姓名": self.names[node],
+            "作为源头的记录": sum(1 for e in self._out[node] if self._kind[e] == EDGE_SOURCE),
+            "流出份数": sum(self.records[self._rec[e]][3] for e in given),
+            "收到份数": self.inbound_amount(name, EDGE_FLOW),
+            "回流到此人份数": self.returned_to(name),
+        }
+
+    def summary(self, name, direction="down"):
+        """下游 / 上游汇总：人数、记录数、总份数，以及相关记录（按行号排序）"""
+        walk = self.downstream if direction == "down" else self.upstream
+        people, recs = walk(name)
+        records = sorted((self.records[i] for i in recs), key=lambda r: r[0])
+        return {
+            "people": people,
+            "records": records,
+            "record_count": len(records),
+            "total_amount": sum(r[3] for r in records),
+        }
+
+
+def format_amount(value):
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
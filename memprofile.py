@@ -0,0 +1,185 @@
+"""可选的内存诊断：记录各阶段（载入、追加、预览 DataFrame、导出）的峰值和留存内存
+
+默认关闭，不产生任何开销。开启方式：
+  - 环境变量 FUTIAN_MEMPROFILE=1（进程启动即开启）
+  - 或在代码 / 诊断页面里调用 enable()
+
+开启后每个 stage() 记录：
+  peak      本阶段 tracemalloc 峰值 - 开始时的已分配量（临时占用）
+  retained  结束时已分配量 - 开始时已分配量（阶段结束后仍留在内存里的）
+  rss       进程常驻内存（Linux 读 /proc，装了 psutil 时用 psutil）
+结果保存在进程内，可在诊断页面查看或 dump() 到 JSON 文件离线对比。
+
+tracemalloc 的峰值是整个进程共用的，每个阶段开始时都要 reset_peak()。
+为了不让并发会话互相重置、把别人的分配算进自己的峰值，开启后各阶段在进程内串行执行
+（同一线程里的嵌套阶段可以重入）；所以只在排查时开启。
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+MAX_RECORDS = 1000
+
+_enabled = os.environ.get("FUTIAN_MEMPROFILE", "") not in ("", "0")
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+# 测量期间独占 tracemalloc 的峰值计数；RLock 让同一线程的嵌套阶段可以重入
+_measure_lock = threading.RLock()
+_local = threading.local()
+
+
+def enable(frames=1):
+    global _enabled
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _enabled
+
+
+def current_rss():
+    """进程常驻内存（字节）；拿不到时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def stage(name):
+    """with stage("load_workbook"): ...；未开启时是空操作"""
+    if not _enabled:
+        return nullcontext()
+    return _measure(name)
+
+
+@contextmanager
+def _measure(name):
+    with _measure_lock:
+        with _measure_locked(name):
+            yield
+
+
+@contextmanager
+def _measure_locked(name):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    start_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    frame = {"child_peak": 0}
+    stack.append(frame)
+    rss_before = current_rss()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        end_current, peak = tracemalloc.get_traced_memory()
+        stack.pop()
+        # 嵌套阶段会重置峰值，这里把子阶段见到的峰值也算进来
+        peak = max(peak, frame["child_peak"])
+        if stack:
+            stack[-1]["child_peak"] = max(stack[-1]["child_peak"], peak)
+        record = {
+            "stage": name,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(seconds, 4),
+            "peak_bytes": max(0, peak - start_current),
+            "retained_bytes": end_current - start_current,
+            "rss_before": rss_before,
+            "rss_after": current_rss(),
+        }
+        with _lock:
+            _records.append(record)
+
+
+def profiled(name):
+    """装饰器版本的 stage()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def summary():
+    """按阶段汇总：次数、最大峰值、平均留存、最近一次 RSS"""
+    stats = {}
+    for r in records():
+        s = stats.setdefault(r["stage"], {"stage": r["stage"], "count": 0, "max_peak_bytes": 0,
+                                          "total_retained_bytes": 0, "last_rss_after": None,
+                                          "total_seconds": 0.0})
+        s["count"] += 1
+        s["max_peak_bytes"] = max(s["max_peak_bytes"], r["peak_bytes"])
+        s["total_retained_bytes"] += r["retained_bytes"]
+        s["last_rss_after"] = r["rss_after"]
+        s["total_seconds"] += r["seconds"]
+    for s in stats.values():
+        s["avg_retained_bytes"] = s.pop("total_retained_bytes") // s["count"]
+        s["total_seconds"] = round(s["total_seconds"], 4)
+    return list(stats.values())
+
+
+def dump(path):
+    """把明细和汇总写成 JSON，便于不同版本 / 不同文件之间离线对比"""
+    data = {
+        "python": sys.version.split()[0],
+        "pid": os.getpid(),
+        "dumped_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "summary": summary(),
+        "records": records(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def format_bytes(n):
+    if n is None:
+        return "-"
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{sign}{n:.1f} {unit}" if unit != "B" else f"{sign}{n} B"
+        n /= 1024
+
+
+if _enabled:
+    enable()
@@ -0,0 +1,158 @@
+"""把各团队交回的统计表合并成一个总表（流式读取 + 去重 + 重新编号）
+
+用法:
+    python merge_workbooks.py 总表.xlsx 团队1.xlsx 团队2.xlsx ... --mode 福田统计
+    python merge_workbooks.py 总表.xlsx 回收文件夹/ --mode 爱心流动
+
+- 每个输入文件以只读模式逐行读取，不整表载入内存；
+- 列按表头名称对齐（支持 "手机号"/"电话号码" 这类写法差异，见 header_index）；
+- 按 modes.json 的 dedup_keys 去重（福田：电话号码相同，或姓名相同且其中一条没有电话；
+  两条都有电话但电话不同的同名记录视为两个人，见 ModeSpec.dedup_keys_for），
+  已见过的键放在有上限的集合里，超出时溢出到磁盘；
+- 序号重新从 1 连续编号，总表一次性流式写出。
+"""
+import argparse
+import glob
+import os
+
+from futian_core import load_workbook
+from header_index import build_header_index
+from dedup_set import DedupSet
+from mode_specs import get_mode, load_modes
+
+
+class MergeReport:
+    def __init__(self):
+        self.files = []        # [(文件, 读到行数, 写入行数, 重复行数, 未对齐的列)]
+        self.no_key = 0        # 没有可用去重键、直接保留的行
+
+    @property
+    def written(self):
+        return sum(f[2] for f in self.files)
+
+    @property
+    def duplicates(self):
+        return sum(f[3] for f in self.files)
+
+    def summary(self):
+        lines = []
+        for path, read, written, dups, unmapped in self.files:
+            line = f"  {os.path.basename(path)}: 读取 {read} 行，写入 {written} 行，重复 {dups} 行"
+            if unmapped:
+                line += f"，忽略列: {'、'.join(unmapped)}"
+            lines.append(line)
+        lines.append(f"合计写入 {self.written} 行，去掉重复 {self.duplicates} 行")
+        if self.no_key:
+            lines.append(f"其中 {self.no_key} 行缺少电话/姓名等去重字段，未参与去重")
+        return "\n".join(lines)
+
+
+def expand_inputs(inputs, output_path):
+    """文件夹展开为其中的 .xlsx；跳过输出文件本身和 Excel 临时文件 (~$开头)"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.xlsx"))))
+        else:
+            paths.append(item)
+    out = os.path.abspath(output_path)
+    return [p for p in paths if os.path.abspath(p) != out and not os.path.basename(p).startswith("~$")]
+
+
+def iter_aligned_rows(path, headers):
+    """逐行产出按 headers 对齐的 tuple；第一次产出前先返回未对齐的列名列表"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        it = wb.active.iter_rows(values_only=True)
+        source_headers = [str(v).strip() if v is not None else "" for v in next(it, ())]
+        index = build_header_index({h: i for i, h in enumerate(headers)})
+
+        layout = [None] * len(headers)
+        exact = [False] * len(headers)
+        unmapped = []
+        for src_idx, name in enumerate(source_headers):
+            if not name:
+                continue
+            col, how = index.resolve(name)
+            if col is None:
+                unmapped.append(name)
+            elif layout[col] is None or (how == "精确" and not exact[col]):
+                layout[col] = src_idx
+                exact[col] = how == "精确"
+            else:
+                unmapped.append(name)
+        yield unmapped
+
+        for row in it:
+            if not row or all(v is None or v == "" for v in row):
+                continue
+            yield tuple(row[i] if i is not None and i < len(row) else None for i in layout)
+    finally:
+        wb.close()
+
+
+def merge_workbooks(output_path, inputs, mode, max_memory_keys=500_000):
+    """合并并返回 MergeReport"""
+    import openpyxl
+
+    spec = get_mode(mode)
+    if spec.custom_headers:
+        raise Exception("合并只支持有固定表头的模式（福田统计 / 爱心流动）")
+    headers = spec.headers
+    seq_idx = headers.index("序号") if "序号" in headers else None
+
+    out_wb = openpyxl.Workbook(write_only=True)
+    out_ws = out_wb.create_sheet("Sheet1")
+    for col, header in enumerate(headers, 1):
+        out_ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = spec.column_width(header)
+    out_ws.append(headers)
+
+    report = MergeReport()
+    seq = 0
+    with DedupSet(max_memory_keys, spill_dir=os.path.dirname(os.path.abspath(output_path))) as seen:
+        for path in expand_inputs(inputs, output_path):
+            rows = iter_aligned_rows(path, headers)
+            unmapped = next(rows)
+            read = written = dups = 0
+            for row in rows:
+                read += 1
+                lookup, register = spec.dedup_keys_for({h: v for h, v in zip(headers, row) if h != "序号"})
+                if not register:
+                    report.no_key += 1
+                elif any(key in seen for key in lookup):
+                    dups += 1
+                    continue
+                for key in register:
+                    seen.add(key)
+                seq += 1
+                if seq_idx is not None:
+                    row = row[:seq_idx] + (seq,) + row[seq_idx + 1:]
+                out_ws.append(row)
+                written += 1
+            report.files.append((path, read, written, dups, unmapped))
+
+    tmp = output_path + ".tmp.xlsx"
+    out_wb.save(tmp)
+    os.replace(tmp, output_path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="合并多个团队统计表",
+        epilog="福田统计去重：电话相同，或姓名相同且其中一条没写电话，算同一个人；"
+               "两条都有电话但电话不同的同名记录都保留。先读到的记录保留，后面的重复行跳过。")
+    parser.add_argument("output", help="输出的总表")
+    parser.add_argument("inputs", nargs="+", help="输入的 .xlsx 文件或文件夹")
+    parser.add_argument("--mode", default="福田统计",
+                        choices=[s.name for s in load_modes() if not s.custom_headers])
+    parser.add_argument("--max-memory-keys", type=int, default=500_000,
+                        help="内存中最多保存多少个去重键，超出后溢出到磁盘")
+    args = parser.parse_args()
+
+    report = merge_workbooks(args.output, args.inputs, args.mode, args.max_memory_keys)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""填表模式定义：从 modes.json 读取，启动时编译一次并缓存
+
+每个模式的表头、字段别名、后处理、历史列都在 modes.json 里声明，
+新增模式只需要改 JSON，不用改代码。
+"""
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from itertools import combinations
+
+SPEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modes.json")
+
+# ================= 1. 后处理 =================
+
+_DATE_NUMS = re.compile(r"\d+")
+_DATE_SEPARATORS = str.maketrans({"/": "-", ".": "-", "年": "-", "月": "-", "日": None})
+# 键和值之间的分隔符：只按第一个冒号（全角或半角）切开，值里的冒号（10:30、网址）原样保留
+_KEY_SEPARATOR = re.compile(r"[:：]")
+
+def normalize_date(value):
+    """通用日期清洗"""
+    if not value: return ""
+    value = str(value).translate(_DATE_SEPARATORS)
+    nums = _DATE_NUMS.findall(value)
+    if len(nums) >= 3:
+        year, month, day = nums[:3]
+        if len(year) == 2: year = "20" + year
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return value
+
+def _post_normalize_date(rule):
+    field = rule["field"]
+    def apply(result):
+        result[field] = normalize_date(result.get(field, ""))
+    return apply
+
+def _post_split_amount(rule):
+    """"爱心(1份)" -> 类型=爱心, 份数=1"""
+    field, type_field, amount_field = rule["field"], rule["type_field"], rule["amount_field"]
+    unit = rule.get("unit", "")
+    pattern = re.compile(r"(.*?)[\(（](.*?)[\)）]")
+    def apply(result):
+        raw = result.get(field, "")
+        result[type_field] = raw
+        result[amount_field] = ""
+        if raw:
+            match = pattern.match(raw)
+            if match:
+                result[type_field] = match.group(1).strip()
+                amount = match.group(2).strip()
+                result[amount_field] = (amount.replace(unit, "") if unit else amount).strip()
+    return apply
+
+def normalize_phone(value):
+    """只保留数字；带国家码的手机号取后 11 位"""
+    digits = "".join(ch for ch in str(value or "") if ch.isdigit())
+    if len(digits) > 11 and digits.startswith("86"):
+        digits = digits[-11:]
+    return digits
+
+def normalize_text(value):
+    """全半角统一、去空白、英文转小写，用于比较姓名等文本"""
+    text = unicodedata.normalize("NFKC", str(value or "")).lower()
+    return "".join(text.split())
+
+KEY_NORMALIZERS = {
+    "phone": normalize_phone,
+    "text": normalize_text,
+}
+
+POST_PROCESSORS = {
+    "normalize_date": _post_normalize_date,
+    "split_amount": _post_split_amount,
+}
+
+# ================= 2. 编译后的模式 =================
+
+def clean_key(key, strip_numbering=True):
+    """去掉序号前缀、括号注释和空格：'1. 姓名（必填）' -> '姓名'
+
+    自定义模式的键原样作为列名（如 '2024目标'），传 strip_numbering=False 保留开头的数字。
+    """
+    key = key.split("（")[0].split("(")[0].replace(" ", "").replace("　", "")
+    return key.lstrip("0123456789.、") if strip_numbering else key
+
+class ModeSpec:
+    """一个模式编译后的解析器 + 表头布局"""
+
+    def __init__(self, raw, banners):
+        self.id = raw["id"]
+        self.name = raw["name"]
+        self.label = raw.get("label", self.name)
+        self.file_name = raw.get("file_name", f"{self.name}表.xlsx")
+        self.custom_headers = raw.get("custom_headers", False)
+        self.headers = list(raw.get("headers", []))
+        self.default_width = raw.get("default_width", 15)
+        self.column_widths = dict(raw.get("column_widths", {}))
+        # 个别程序自己的列宽布局（如 FuTianFilling 新建文件时的列宽）
+        self.layouts = {
+            name: (dict(layout.get("column_widths", {})), layout.get("default_width", self.default_width))
+            for name, layout in raw.get("layouts", {}).items()
+        }
+        self.fields = {k: list(v) for k, v in raw.get("fields", {}).items()}
+        self.key_field = raw.get("key_field")
+        self.display = [tuple(d) for d in raw.get("display", [])]
+        self.placeholder = raw.get("placeholder", "")
+        self.validate_rules = [dict(r) for r in raw.get("validate", [])]
+        self.banners = tuple(banners)
+
+        # 预先展开别名 -> 标准字段
+        self.reverse_map = {}
+        for field, aliases in self.fields.items():
+            for alias in aliases:
+                self.reverse_map[alias] = field
+
+        # 新记录的开始字段（用于拆分多条记录的文本）
+        self.record_start_keys = set()
+        for field in raw.get("record_start", []):
+            self.record_start_keys.update(self.fields.get(field, [field]))
+
+        # 去重键：按顺序取第一组字段都不为空的作为键
+        self.dedup_keys = []
+        for rule in raw.get("dedup_keys", []):
+            normalizer = KEY_NORMALIZERS[rule.get("normalize", "text")]
+            self.dedup_keys.append((tuple(rule["fields"]), normalizer))
+
+        self._post = []
+        for rule in raw.get("post", []):
+            if rule["op"] not in POST_PROCESSORS:
+                raise ValueError(f"模式 {self.name}: 未知后处理 {rule['op']}")
+            self._post.append(POST_PROCESSORS[rule["op"]](rule))
+
+    def parse(self, text, joiner=" "):
+        """解析一条记录的文本；joiner 为续行拼接符"""
+        text = text.replace("\r\n", "\n")
+        if not self.fields:
+            return self._parse_free(text, joiner)
+
+        reverse_map = self.reverse_map
+        result = {k: "" for k in self.fields}
+        current_field = None
+        for raw_line in text.split("\n"):
+            line = raw_line.strip()
+            if not line: continue
+            for banner in self.banners:
+                line = line.replace(banner, "")
+            line = line.strip()
+            if not line: continue
+            if "：" in line or ":" in line:
+                parts = _KEY_SEPARATOR.split(line, 1)
+                key = clean_key(parts[0])
+                if key in reverse_map:
+                    current_field = reverse_map[key]
+                    val = parts[1].strip()
+                    if val: result[current_field] = val
+                    continue
+            if current_field and result[current_field]:
+                result[current_field] += joiner + line
+            elif current_field:
+                result[current_field] = line
+
+        for apply in self._post:
+            apply(result)
+        return result
+
+    def _parse_free(self, text, joiner):
+        """自定义模式：行首 '键：值' 原样作为列名"""
+        result = {}
+        current_key = None
+        for raw_line in text.split("\n"):
+            line = raw_line.strip()
+            if not line: continue
+            if line.startswith("【") and line.endswith("】"): continue
+
+            if "：" in line or ":" in line:
+                # 按第一个冒号（全角半角都算）拆分，值里的冒号保留：'时间: 10：30' -> 时间 = 10：30
+                key, val = _KEY_SEPARATOR.split(line, 1)
+                current_key = clean_key(key, strip_numbering=False)
+                result[current_key] = val.strip()
+            elif current_key:
+                result[current_key] += joiner + line
+        return result
+
+    def dedup_keys_for(self, record):
+        """记录（字段 -> 值）去重用的 (要查询的键, 要登记的键)；没有可用字段时都为空
+
+        同一个人可能这次带电话、下次只写姓名，所以每一组可用的键都要查：
+        两条记录某组键相同，且没有共同拥有更靠前的组（例如两边都有电话但电话不同，
+        就是同名的两个人）时视为重复。为此登记第 i 组的键时带上本记录拥有的更靠前的组，
+        查询时只查与本记录缺少的组相符的组合。
+        没有声明 dedup_keys 的模式（自定义）用全部非空值作为唯一的键。
+        """
+        if not self.dedup_keys:
+            values = [normalize_text(v) for v in record.values() if v not in (None, "")]
+            key = "*\x1f" + "\x1f".join(values) if values else None
+            return ([key], [key]) if key else ([], [])
+        present = []
+        for i, (fields, normalizer) in enumerate(self.dedup_keys):
+            values = [normalizer(record.get(f)) for f in fields]
+            if all(values):
+                present.append((i, "\x1f".join(values)))
+        groups = {i for i, _ in present}
+        lookup, register = [], []
+        for i, value in present:
+            stronger = [g for g in range(i) if g in groups]
+            register.append(f"{i}\x1f{value}\x1f{stronger}")
+            missing = [g for g in range(i) if g not in groups]
+            for n in range(len(missing) + 1):
+                lookup.extend(f"{i}\x1f{value}\x1f{list(c)}" for c in combinations(missing, n))
+        return lookup, register
+
+    def is_record_start(self, line):
+        if not self.record_start_keys or not ("：" in line or ":" in line):
+            return False
+        return clean_key(_KEY_SEPARATOR.split(line, 1)[0].strip()) in self.record_start_keys
+
+    def key_name(self, info):
+        """成功消息 / 历史里展示的关键字段"""
+        if self.key_field: return info.get(self.key_field, "未知")
+        return list(info.values())[0] if info else "数据"
+
+    def display_values(self, info, count=4):
+        """Tk 历史表格的前 count 列"""
+        if self.display:
+            vals = [info.get(field, "-") for field, _ in self.display[:count]]
+        else:
+            vals = list(info.values())[:count]
+        return vals + ["-"] * (count - len(vals))
+
+    def display_labels(self, count=4):
+        labels = [label for _, label in self.display[:count]]
+        return labels + [f"列{i + 1}" for i in range(len(labels), count)]
+
+    def column_width(self, header, layout=None):
+        if layout in self.layouts:
+            widths, default = self.layouts[layout]
+            return widths.get(header, default)
+        return self.column_widths.get(header, self.default_width)
+
+# ================= 3. 加载与缓存 =================
+
+@lru_cache(maxsize=None)
+def _load_spec_file(spec_path=SPEC_PATH):
+    with open(spec_path, encoding="utf-8") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def load_modes(spec_path=SPEC_PATH):
+    """读取并编译全部模式（每个进程只做一次）"""
+    raw = _load_spec_file(spec_path)
+    banners = raw.get("strip_banners", [])
+    return tuple(ModeSpec(m, banners) for m in raw["modes"])
+
+@lru_cache(maxsize=None)
+def header_synonym_groups(spec_path=SPEC_PATH):
+    """表头同义词组：各模式字段的别名 + modes.json 的 header_synonyms"""
+    groups = []
+    for spec in load_modes(spec_path):
+        for field, aliases in spec.fields.items():
+            groups.append(frozenset([field, *aliases]))
+    for group in _load_spec_file(spec_path).get("header_synonyms", []):
+        groups.append(frozenset(group))
+    return tuple(groups)
+
+@lru_cache(maxsize=None)
+def _mode_index():
+    index = {}
+    for spec in load_modes():
+        index[spec.name] = spec
+        index[spec.id] = spec
+    return index
+
+def get_mode(mode):
+    """按名称（'福田统计'）或编号（1）取模式；未知模式按自定义处理"""
+    index = _mode_index()
+    if mode in index:
+        return index[mode]
+    for spec in load_modes():
+        if spec.custom_headers:
+            return spec
+    raise KeyError(f"未知模式: {mode}")
+
+def mode_names():
+    return [spec.name for spec in load_modes()]
@@ -1,200 +1,42 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from tkinter import ttk
-import openpyxl
-import re
 from datetime import datetime
 import os
 
-# ================= 1. 配置区 =================
-
-# --- 模式1：福田统计表头 ---
-HEADERS_FUTIAN = [
-    "团队", "福田数量", "序号", "真实姓名", "推荐人", 
-    "居住地", "职业", "出身年月日", "电话号码", 
-    "现在生活事业家庭情况", "想收获什么梦想", "有无宗教信仰"
-]
-
-# --- 模式2：爱心流动表头 ---
-HEADERS_LOVE = [
-    "被流动人", "类型", "份数", "日期", "流动人", 
-    "回流人", "归属", "源头", "备注"
-]
-
-# ================= 2. 核心逻辑区 =================
-
-def normalize_date(value):
-    """通用日期清洗"""
-    if not value: return ""
-    value = value.replace("/", "-").replace(".", "-").replace("年", "-").replace("月", "-").replace("日", "")
-    nums = re.findall(r"\d+", value)
-    if len(nums) >= 3:
-        year, month, day = nums[:3]
-        if len(year) == 2: year = "20" + year
-        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    return value
-
-def extract_futian_info(text):
-    """【模式1】福田解析"""
-    field_alias = {
-        "真实姓名": ["真实姓名", "姓名"],
-        "推荐人": ["推荐人", "分享人"],
-        "居住地": ["居住地", "地址"],
-        "职业": ["职业"],
-        "出身年月日": ["出身年月日", "出生年月日", "生日"],
-        "电话号码": ["电话号码", "手机号码", "电话", "手机"],
-        "现在生活事业家庭情况": ["现在生活事业家庭情况"],
-        "想收获什么梦想": ["想收获什么梦想"],
-        "有无宗教信仰": ["有无宗教信仰"]
-    }
-    result = parse_key_value_text(text, field_alias)
-    result["出身年月日"] = normalize_date(result.get("出身年月日", ""))
-    return result
-
-def extract_love_info(text):
-    """【模式2】爱心解析 (修正版)"""
-    field_alias = {
-        "被流动人": ["被流动人", "被流动学员"],
-        "原始类型": ["类型"], # 临时字段，用于后续拆分
-        "日期": ["日期", "时间"],
-        "流动人": ["流动人"],
-        "回流人": ["回流人"],
-        "归属": ["归属"],
-        "源头": ["源头"],
-        "备注": ["备注"]
-    }
-    result = parse_key_value_text(text, field_alias)
-    
-    # --- 修正：拆分类型和份数，并去除'份'字 ---
-    raw_type = result.get("原始类型", "")
-    result["类型"] = raw_type # 默认值
-    result["份数"] = ""       # 默认值
-    
-    if raw_type:
-        # 匹配中文括号或英文括号
-        match = re.match(r"(.*?)[\(（](.*?)[\)）]", raw_type)
-        if match:
-            # 提取类型名称（如：爱心）
-            result["类型"] = match.group(1).strip()
-            
-            # 提取括号内的内容（如：1份），并去掉“份”字
-            raw_amount = match.group(2).strip()
-            result["份数"] = raw_amount.replace("份", "").strip()
-            
-    result["日期"] = normalize_date(result.get("日期", ""))
-    return result
-
-def extract_custom_info(text):
-    """【模式3】自定义解析"""
-    text = text.replace("\r\n", "\n")
-    result = {}
-    current_key = None
-    
-    for raw_line in text.split("\n"):
-        line = raw_line.strip()
-        if not line: continue
-        if line.startswith("【") and line.endswith("】"): continue
-
-        if "：" in line or ":" in line:
-            split_char = "：" if "：" in line else ":"
-            parts = line.split(split_char, 1)
-            key = parts[0].strip()
-            val = parts[1].strip() if len(parts) > 1 else ""
-            
-            key_clean = key.split("（")[0].split("(")[0].strip().replace(" ", "").replace("　", "")
-            current_key = key_clean
-            result[current_key] = val
-        elif current_key:
-            result[current_key] += " " + line
-    return result
-
-def parse_key_value_text(text, field_alias):
-    """通用解析内核"""
-    reverse_map = {}
-    for k, v in field_alias.items():
-        for name in v:
-            reverse_map[name] = k
-
-    result = {k: "" for k in field_alias}
-    current_field = None
-
-    for raw_line in text.replace("\r\n", "\n").split("\n"):
-        line = raw_line.strip()
-        if not line: continue
-        line = line.replace("【🔔流动明细表】", "").strip()
-        if not line: continue
-
-        if "：" in line or ":" in line:
-            split_char = "：" if "：" in line else ":"
-            parts = line.split(split_char, 1)
-            key = parts[0].split("（")[0].split("(")[0].strip().replace(" ", "")
-            val = parts[1].strip() if len(parts) > 1 else ""
-            
-            if key in reverse_map:
-                current_field = reverse_map[key]
-                if val: result[current_field] = val
-                continue
-        
-        if current_field:
-            if result[current_field]:
-                result[current_field] += " " + line
-            else:
-                result[current_field] = line
-    return result
-
-def create_new_excel_file(file_path, headers):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Sheet1"
-    ws.append(headers)
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
-    wb.save(file_path)
-
-def append_to_excel_safe(excel_path, text, mode):
-    if mode == 1:
-        info = extract_futian_info(text)
-    elif mode == 2:
-        info = extract_love_info(text)
-    else:
-        info = extract_custom_info(text)
-
-    try:
-        wb = openpyxl.load_workbook(excel_path)
-        sheet = wb.active
-    except Exception as e:
-        raise Exception(f"打开 Excel 失败: {str(e)}")
-
-    header_map = {}
-    for col_idx, cell in enumerate(sheet[1], 1):
-        if cell.value:
-            header_map[str(cell.value).strip()] = col_idx
-
-    if not header_map:
-        raise Exception("Excel 文件没有表头，无法匹配数据。")
-
-    next_row = sheet.max_row + 1
-    
-    for field, value in info.items():
-        if field in header_map:
-            sheet.cell(row=next_row, column=header_map[field]).value = value
-        else:
-            if mode == 3: # 简单模糊匹配
-                for h_name, h_idx in header_map.items():
-                     if field == h_name: # 精确匹配优先
-                         sheet.cell(row=next_row, column=h_idx).value = value
-
-    if "序号" in header_map:
-        sheet.cell(row=next_row, column=header_map["序号"]).value = next_row - 1
-    
-    try:
-        wb.save(excel_path)
-    except PermissionError:
-        raise Exception("无法保存！请先关闭该 Excel 文件后再试。")
-    
-    return info
-
-# ================= 3. GUI 界面区 =================
+from futian_core import (
+    extract_info_by_mode, create_blank_workbook, parse_custom_headers,
+    format_fuzzy, format_unplaced, warm_up_in_background,
+)
+from history_store import HistoryPanel
+from lineage_graph import LOVE_MODE, LineageGraph, format_amount
+from mode_specs import get_mode, load_modes
+from parse_cache import describe_location, parse_cache
+from sharding import append_records, is_sharded, table_mtime
+from sort_workbook import default_output_path, sort_workbook
+from validation import ValidationError, validate_batch
+
+# ================= 1. 核心逻辑区 =================
+# 模式定义（表头、别名、历史列）统一在 modes.json，解析器由 mode_specs 预编译
+
+def append_to_excel_safe(excel_path, text, mode, force=False, shard_by=None):
+    """解析并追加一条记录，返回 (解析结果, 未能放入任何列的字段, 按近似列名写入的字段, (文件名, 行号))
+
+    写入前先校验；有错误且 force 为 False 时抛出 ValidationError，不打开文件。
+    表已分片（或 shard_by 要求开始分片）时写进对应的分片文件，见 sharding.append_records。
+    """
+    info = extract_info_by_mode(text, mode)
+    report = validate_batch([info], mode)
+    if not force and not report.ok:
+        raise ValidationError(report)
+
+    unplaced, fuzzy = [], []
+    (location,) = append_records(excel_path, [info], mode, shard_by, unplaced, fuzzy)
+
+    parse_cache.mark_written(text, mode, os.path.abspath(excel_path), location)
+    return info, unplaced[0], fuzzy[0], location
+
+# ================= 2. GUI 界面区 =================
 
 class AutoFillerApp:
     def __init__(self, root):
@@ -205,6 +47,9 @@ class AutoFillerApp:
         self.excel_path_var = tk.StringVar()
         self.mode_var = tk.IntVar(value=1)
         self.custom_headers_var = tk.StringVar()
+        self.shard_var = tk.BooleanVar(value=False)
+        # 爱心流动的流向图缓存：(文件路径, 修改时间, LineageGraph)
+        self.lineage = None
         
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -218,12 +63,12 @@ class AutoFillerApp:
         mode_frame = ttk.LabelFrame(self.root, text="第一步：选择填表模式", padding=10)
         mode_frame.pack(fill="x", padx=10, pady=5)
         
-        ttk.Radiobutton(mode_frame, text="类型一：福田统计", variable=self.mode_var, value=1, command=self.on_mode_change).grid(row=0, column=0, padx=20, sticky="w")
-        ttk.Radiobutton(mode_frame, text="类型二：爱心流动", variable=self.mode_var, value=2, command=self.on_mode_change).grid(row=0, column=1, padx=20, sticky="w")
-        ttk.Radiobutton(mode_frame, text="类型三：自定义", variable=self.mode_var, value=3, command=self.on_mode_change).grid(row=0, column=2, padx=20, sticky="w")
+        modes = load_modes()
+        for col, spec in enumerate(modes):
+            ttk.Radiobutton(mode_frame, text=spec.label, variable=self.mode_var, value=spec.id, command=self.on_mode_change).grid(row=0, column=col, padx=20, sticky="w")
         
         self.custom_frame = ttk.Frame(mode_frame)
-        self.custom_frame.grid(row=1, column=0, columnspan=3, sticky="we", pady=(10,0))
+        self.custom_frame.grid(row=1, column=0, columnspan=len(modes), sticky="we", pady=(10,0))
         ttk.Label(self.custom_frame, text="新建列名 (空格隔开):", foreground="blue").pack(side="left")
         ttk.Entry(self.custom_frame, textvariable=self.custom_headers_var, width=60).pack(side="left", padx=5)
         self.custom_frame.grid_remove()
@@ -236,6 +81,13 @@ class AutoFillerApp:
         ttk.Button(file_frame, text="📂 选择", command=self.choose_excel).pack(side="left")
         ttk.Label(file_frame, text=" | ").pack(side="left")
         ttk.Button(file_frame, text="✨ 新建", command=self.create_excel).pack(side="left")
+        ttk.Label(file_frame, text=" | ").pack(side="left")
+        # 排序依赖固定模式的 团队 / 日期 / 序号 列，自定义模式下不可用
+        self.sort_button = ttk.Button(file_frame, text="↕ 排序并重新编号", command=self.sort_excel)
+        self.sort_button.pack(side="left")
+        ttk.Label(file_frame, text=" | ").pack(side="left")
+        self.shard_check = ttk.Checkbutton(file_frame, text="按月分片", variable=self.shard_var)
+        self.shard_check.pack(side="left")
 
         # --- 主操作区 ---
         paned = ttk.PanedWindow(self.root, orient="horizontal")
@@ -252,15 +104,17 @@ class AutoFillerApp:
         btn_frame.pack(fill="x", pady=10)
         ttk.Button(btn_frame, text="⚡ 写入 Excel", style="Big.TButton", command=self.run_append).pack(fill="x", ipady=5)
         ttk.Button(btn_frame, text="清空输入", command=lambda: self.text_input.delete("1.0", tk.END)).pack(fill="x", pady=5)
+        ttk.Button(btn_frame, text="🔗 流动关系查询（爱心流动）", command=self.open_lineage_query).pack(fill="x")
 
         # 右侧 (历史)
         right_frame = ttk.Frame(paned)
         paned.add(right_frame, weight=5)
         ttk.Label(right_frame, text="操作历史:", style="Header.TLabel").pack(anchor="w", padx=5)
         
-        # 增加一列 c4，用于显示份数
+        # 增加一列 c4，用于显示份数；只渲染可见的 20 行，当天历史从本地日志恢复
         self.cols = ("c1", "c2", "c3", "c4", "time")
-        self.tree = ttk.Treeview(right_frame, columns=self.cols, show="headings", height=20)
+        self.history = HistoryPanel(right_frame, "my_TianFilling", self.cols, visible_rows=20)
+        self.tree = self.history.tree
         
         # 设置列宽
         self.tree.column("c1", width=80)
@@ -271,106 +125,181 @@ class AutoFillerApp:
         
         self.update_history_header()
         
-        scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        self.tree.pack(side="left", fill="both", expand=True, padx=5)
-        scrollbar.pack(side="right", fill="y")
+        self.history.pack(padx=5)
         
         ttk.Button(right_frame, text="🗑️ 清空历史", command=self.clear_history).pack(fill="x", padx=5, pady=10)
 
     # --- 逻辑 ---
     def on_mode_change(self):
-        if self.mode_var.get() == 3: self.custom_frame.grid()
-        else: self.custom_frame.grid_remove()
+        if get_mode(self.mode_var.get()).custom_headers:
+            self.custom_frame.grid()
+            self.sort_button.state(["disabled"])
+        else:
+            self.custom_frame.grid_remove()
+            self.sort_button.state(["!disabled"])
         self.update_history_header()
 
     def update_history_header(self):
         """根据模式动态调整表头显示"""
-        mode = self.mode_var.get()
-        if mode == 1:
-            self.tree.heading("c1", text="姓名")
-            self.tree.heading("c2", text="居住地")
-            self.tree.heading("c3", text="电话")
-            self.tree.heading("c4", text="职业")
-        elif mode == 2:
-            self.tree.heading("c1", text="被流动人")
-            self.tree.heading("c2", text="类型")
-            self.tree.heading("c3", text="份数") # 新增
-            self.tree.heading("c4", text="流动人")
-        else:
-            self.tree.heading("c1", text="列1")
-            self.tree.heading("c2", text="列2")
-            self.tree.heading("c3", text="列3")
-            self.tree.heading("c4", text="列4")
+        labels = get_mode(self.mode_var.get()).display_labels(4)
+        for col, label in zip(self.cols[:4], labels):
+            self.tree.heading(col, text=label)
         self.tree.heading("time", text="时间")
 
     def choose_excel(self):
         path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx")])
-        if path: self.excel_path_var.set(path)
+        if path:
+            self.excel_path_var.set(path)
+            self.refresh_shard_state(path)
+
+    def refresh_shard_state(self, path):
+        """已分片的表总是写进分片，勾选框只作显示"""
+        sharded = is_sharded(path)
+        if sharded:
+            self.shard_var.set(True)
+        self.shard_check.state(["disabled"] if sharded else ["!disabled"])
 
     def create_excel(self):
-        mode = self.mode_var.get()
-        if mode == 1:
-            headers, name = HEADERS_FUTIAN, "福田统计表.xlsx"
-        elif mode == 2:
-            headers, name = HEADERS_LOVE, "爱心流动表.xlsx"
-        else:
-            raw = self.custom_headers_var.get().strip()
-            if not raw: return messagebox.showwarning("提示", "请输入列名！")
-            headers = [h for h in re.split(r'[，, \s]+', raw) if h]
-            name = "自定义表.xlsx"
+        spec = get_mode(self.mode_var.get())
+        raw = self.custom_headers_var.get().strip()
+        if spec.custom_headers and not parse_custom_headers(raw):
+            return messagebox.showwarning("提示", "请输入列名！")
 
-        path = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=name)
+        path = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=spec.file_name)
         if path:
-            create_new_excel_file(path, headers)
+            create_blank_workbook(spec.name, raw).save(path)
             self.excel_path_var.set(path)
+            self.refresh_shard_state(path)
             messagebox.showinfo("成功", "文件创建成功！")
 
+    def sort_excel(self):
+        path = self.excel_path_var.get()
+        if not path or not os.path.exists(path): return messagebox.showerror("错误", "文件不存在！")
+        if is_sharded(path): return messagebox.showwarning("提示", "分片表格不支持整表排序。")
+        # 默认另存为 <原文件名>_排序.xlsx；选回原文件时由保存对话框确认覆盖
+        output = filedialog.asksaveasfilename(
+            title="排序结果保存为", defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")],
+            initialdir=os.path.dirname(path), initialfile=os.path.basename(default_output_path(path)))
+        if not output:
+            return
+        try:
+            count, _ = sort_workbook(path, output)
+            messagebox.showinfo("成功", f"已排序 {count} 行，序号已重新编号。\n已保存到：{output}")
+        except Exception as e:
+            messagebox.showerror("错误", str(e))
+
     def run_append(self):
         path, text = self.excel_path_var.get(), self.text_input.get("1.0", tk.END).strip()
         mode = self.mode_var.get()
         if not path or not os.path.exists(path): return messagebox.showerror("错误", "文件不存在！")
         if not text: return
 
+        # 同一段文字刚写入过这个文件时，不打开 Excel 先提示
+        written = parse_cache.written_at(text, mode, os.path.abspath(path))
+        if written and not messagebox.askyesno(
+                "重复记录", f"这条记录已经写入过（{describe_location(written)}）。\n\n仍然再写一次吗？"):
+            return
+
+        # 勾选"按月分片"后第一次写入时建立分片清单，原文件作为只读的第一个分片
+        shard_by = "month" if self.shard_var.get() and not is_sharded(path) else None
         try:
-            info = append_to_excel_safe(path, text, mode)
+            try:
+                info, unplaced, fuzzy, location = append_to_excel_safe(path, text, mode, shard_by=shard_by)
+            except ValidationError as e:
+                if not messagebox.askyesno("数据可能有误", f"{e}\n\n仍然写入吗？"):
+                    return
+                info, unplaced, fuzzy, location = append_to_excel_safe(path, text, mode, force=True, shard_by=shard_by)
+            self.refresh_shard_state(path)
             self.add_to_history(info, mode)
+            if get_mode(mode).name == LOVE_MODE:
+                self.update_lineage(path, info, location)
             
-            name = "未知"
-            if mode == 1: name = info.get("真实姓名")
-            elif mode == 2: name = info.get("被流动人")
-            else: name = list(info.values())[0] if info else "记录"
-            
-            messagebox.showinfo("成功", f"已添加：{name}")
+            name = get_mode(mode).key_name(info)
+            if unplaced or fuzzy:
+                notes = "\n".join(n for n in (format_unplaced(unplaced), format_fuzzy(fuzzy)) if n)
+                messagebox.showwarning("请核对字段", f"已添加：{name}\n{notes}")
+            else:
+                messagebox.showinfo("成功", f"已添加：{name}")
             self.text_input.delete("1.0", tk.END)
         except Exception as e:
             messagebox.showerror("错误", str(e))
 
     def add_to_history(self, info, mode):
         t = datetime.now().strftime("%H:%M:%S")
-        vals = ["-", "-", "-", "-", t] # 默认为5个占位
-        
-        if mode == 1:
-            vals[0] = info.get("真实姓名", "-")
-            vals[1] = info.get("居住地", "-")
-            vals[2] = info.get("电话号码", "-")
-            vals[3] = info.get("职业", "-")
-        elif mode == 2:
-            vals[0] = info.get("被流动人", "-")
-            vals[1] = info.get("类型", "-")
-            vals[2] = info.get("份数", "-") # 对应界面上的“份数”列
-            vals[3] = info.get("流动人", "-")
-        else:
-            v = list(info.values())
-            for i in range(min(4, len(v))):
-                vals[i] = v[i]
-            
-        self.tree.insert("", 0, values=vals)
+        vals = get_mode(mode).display_values(info, 4) + [t]
+        self.history.add(vals)
 
     def clear_history(self):
-        for item in self.tree.get_children(): self.tree.delete(item)
+        self.history.clear()
+
+    # --- 爱心流动：流向图 ---
+    def get_lineage(self, path):
+        """当前文件的流向图；文件换了或在外部被改过时重新扫描一遍（分片表看清单的修改时间）"""
+        mtime = table_mtime(path)
+        if self.lineage is None or self.lineage[:2] != (path, mtime):
+            self.lineage = (path, mtime, LineageGraph.from_file(path))
+        return self.lineage[2]
+
+    def update_lineage(self, path, info, location):
+        """本程序刚追加的记录直接加进已有的图，不用重新读文件"""
+        if self.lineage and self.lineage[0] == path:
+            graph = self.lineage[2]
+            # 分片表的图按各分片连起来的顺序号编号，接在最后一条之后即可
+            graph.add_record(info, None if is_sharded(path) else location[1])
+            self.lineage = (path, table_mtime(path), graph)
+
+    def open_lineage_query(self):
+        path = self.excel_path_var.get()
+        if not path or not os.path.exists(path): return messagebox.showerror("错误", "请先选择爱心流动表！")
+        try:
+            graph = self.get_lineage(path)
+        except Exception as e:
+            return messagebox.showerror("错误", f"读取失败: {e}")
+
+        win = tk.Toplevel(self.root)
+        win.title("流动关系查询")
+        win.geometry("620x480")
+        bar = ttk.Frame(win, padding=10)
+        bar.pack(fill="x")
+        name_var, dir_var = tk.StringVar(), tk.StringVar(value="下游")
+        ttk.Label(bar, text="姓名:").pack(side="left")
+        entry = ttk.Entry(bar, textvariable=name_var, width=20)
+        entry.pack(side="left", padx=5)
+        for label in ("下游", "上游"):
+            ttk.Radiobutton(bar, text=label, variable=dir_var, value=label).pack(side="left")
+        output = scrolledtext.ScrolledText(win, font=("Consolas", 10))
+        output.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        output.insert(tk.END, f"已索引 {len(graph.names)} 人、{len(graph)} 条记录。\n")
+
+        def query(event=None):
+            name = name_var.get().strip()
+            output.delete("1.0", tk.END)
+            if name not in graph:
+                output.insert(tk.END, f"表中没有找到：{name}\n")
+                return
+            stats = graph.node_stats(name)
+            result = graph.summary(name, "down" if dir_var.get() == "下游" else "up")
+            lines = [
+                f"{stats['姓名']}：作为源头 {stats['作为源头的记录']} 条，流出 {format_amount(stats['流出份数'])} 份，"
+                f"收到 {format_amount(stats['收到份数'])} 份，回流到此人 {format_amount(stats['回流到此人份数'])} 份",
+                f"{dir_var.get()}共 {len(result['people'])} 人，相关记录 {result['record_count']} 条，"
+                f"共 {format_amount(result['total_amount'])} 份",
+                "",
+                "、".join(f"{n}({d})" for n, d in result["people"]),
+                "",
+                "行号  被流动人  类型  份数  日期  流动人  回流人  源头",
+            ]
+            for rec in result["records"]:
+                lines.append("  ".join(format_amount(v) if i == 3 else str(v) for i, v in enumerate(rec)))
+            output.insert(tk.END, "\n".join(lines))
+
+        ttk.Button(bar, text="查询", command=query).pack(side="left", padx=5)
+        entry.bind("<Return>", query)
+        entry.focus_set()
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = AutoFillerApp(root)
+    # 窗口先显示，openpyxl 在后台预热
+    root.after_idle(warm_up_in_background)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import streamlit as st
+import json
+import os
+import sys
+
+# pages/ 下的页面需要能导入项目根目录的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memprofile
+
+st.set_page_config(page_title="内存诊断", page_icon="🩺", layout="wide")
+st.title("🩺 内存诊断")
+st.caption("记录载入 Excel、追加数据、生成预览表、导出文件各阶段的内存占用（进程内所有会话共用）。"
+           "开启期间各会话的这些阶段会排队执行，以免互相干扰峰值统计。")
+
+# --- 开关 ---
+enabled = st.toggle("开启内存记录（会让操作变慢，排查完请关闭）", value=memprofile.is_enabled())
+if enabled and not memprofile.is_enabled():
+    memprofile.enable()
+elif not enabled and memprofile.is_enabled():
+    memprofile.disable()
+
+rss = memprofile.current_rss()
+st.metric("当前进程常驻内存 (RSS)", memprofile.format_bytes(rss))
+
+records = memprofile.records()
+if not records:
+    st.info("还没有记录。开启后回到主页面上传 / 录入 / 导出，再回来查看。")
+else:
+    import pandas as pd
+
+    st.subheader("按阶段汇总")
+    summary_columns = {
+        "stage": "阶段", "count": "次数", "max_peak_bytes": "最大峰值", "avg_retained_bytes": "平均留存",
+        "last_rss_after": "最近 RSS", "total_seconds": "总耗时(秒)",
+    }
+    summary = pd.DataFrame(memprofile.summary(), columns=list(summary_columns))
+    for col in ["max_peak_bytes", "avg_retained_bytes", "last_rss_after"]:
+        summary[col] = summary[col].map(memprofile.format_bytes)
+    summary = summary.rename(columns=summary_columns)
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    st.subheader("最近明细")
+    detail = pd.DataFrame(records[::-1][:200])
+    for col in ["peak_bytes", "retained_bytes", "rss_before", "rss_after"]:
+        detail[col] = detail[col].map(memprofile.format_bytes)
+    st.dataframe(detail, use_container_width=True, hide_index=True, height=300)
+
+    # --- 导出 ---
+    # 只提供下载：网页上不能让用户指定服务器上的路径（否则可以覆盖任意文件）
+    col1, col2 = st.columns(2)
+    with col1:
+        payload = json.dumps({"summary": memprofile.summary(), "records": records}, ensure_ascii=False, indent=1)
+        st.download_button("📥 下载 JSON", data=payload.encode("utf-8"),
+                           file_name="memprofile.json", mime="application/json", use_container_width=True)
+    with col2:
+        if st.button("🗑️ 清空记录", use_container_width=True):
+            memprofile.clear()
+            st.rerun()
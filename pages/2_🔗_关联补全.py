@@ -0,0 +1,55 @@
+import streamlit as st
+import os
+import sys
+import tempfile
+
+# pages/ 下的页面需要能导入项目根目录的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrich_join import AMBIGUOUS, MATCHED, UNMATCHED, enrich_love_workbook
+
+st.set_page_config(page_title="关联补全", page_icon="🔗", layout="wide")
+st.title("🔗 用福田统计表补全爱心流动表")
+st.caption("按被流动人（带手机号时按手机号）到福田统计表里查找，补上 团队 / 推荐人 / 电话号码。"
+           "代替几万行的 VLOOKUP，结果里另附“匹配问题”工作表。")
+
+col1, col2 = st.columns(2)
+with col1:
+    love_file = st.file_uploader("爱心流动表 (.xlsx)", type=["xlsx"], key="love_file")
+with col2:
+    futian_file = st.file_uploader("福田统计表 (.xlsx)", type=["xlsx"], key="futian_file")
+
+if love_file and futian_file and st.button("🔗 开始补全", type="primary"):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for name, upload in (("love", love_file), ("futian", futian_file)):
+            paths[name] = os.path.join(tmp, f"{name}.xlsx")
+            with open(paths[name], "wb") as f:
+                f.write(upload.getbuffer())
+        output = os.path.join(tmp, "output.xlsx")
+        try:
+            with st.spinner("正在补全..."):
+                report = enrich_love_workbook(paths["love"], paths["futian"], output)
+            with open(output, "rb") as f:
+                st.session_state.enrich_result = (f.read(), report)
+        except Exception as e:
+            st.session_state.enrich_result = None
+            st.error(f"补全失败: {e}")
+
+result = st.session_state.get("enrich_result")
+if result:
+    data, report = result
+    m1, m2, m3 = st.columns(3)
+    m1.metric("已匹配", report.counts[MATCHED])
+    m2.metric("未匹配", report.counts[UNMATCHED])
+    m3.metric("多条匹配", report.counts[AMBIGUOUS])
+    if report.extra_columns:
+        st.caption("已保留原表的其他列：" + "、".join(report.extra_columns))
+    if report.dropped_columns:
+        st.warning("以下列没能带到结果里（如重复的列名）：" + "、".join(report.dropped_columns))
+    if report.problems:
+        st.dataframe([{"被流动人": n, "情况": s, "行数": c} for n, (s, c) in report.problems.items()],
+                     use_container_width=True, hide_index=True, height=250)
+    st.download_button("📥 下载补全结果", data=data, file_name="爱心流动表_补全.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       type="primary")
@@ -0,0 +1,110 @@
+"""解析结果缓存 + 已写入记录的登记（按规范化后的记录文本）
+
+志愿者经常把同一段文字重复粘贴，批量导入时同一条记录也会出现在好几份聊天记录里。
+这里按"全半角统一、去掉空白"后的文本哈希做有上限的 LRU 缓存：
+  - 同一段文字再次解析时直接返回上次的结果（返回副本，调用方可以随意修改）；
+  - 写入成功后登记 (目标表, 位置)，下次粘贴同一段文字时，
+    在打开 Excel 之前就能提示"这条记录已经在第 N 行写入过"。
+    位置是行号，或分片表的 (分片文件, 行号)，用 describe_location 转成提示文字。
+缓存只在当前进程内有效；上限由环境变量 FUTIAN_PARSE_CACHE_SIZE 指定（默认 4096 条）。
+"""
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from mode_specs import get_mode
+
+MAX_ENTRIES = int(os.environ.get("FUTIAN_PARSE_CACHE_SIZE", "4096"))
+
+
+def normalize_record_text(text):
+    """全半角统一、每行去掉所有空白、丢掉空行（保留行结构，解析依赖换行）"""
+    text = unicodedata.normalize("NFKC", text or "")
+    lines = ("".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def text_key(text, mode, joiner=" "):
+    """(模式, 续行拼接符, 规范化文本的摘要)"""
+    digest = hashlib.blake2b(normalize_record_text(text).encode("utf-8"), digest_size=16).digest()
+    return get_mode(mode).name, joiner, digest
+
+
+class _Entry:
+    __slots__ = ("info", "written")
+
+    def __init__(self, info):
+        self.info = info
+        self.written = {}   # 目标表 -> 位置
+
+
+class ParseCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def parse(self, text, mode, joiner=" "):
+        """解析一条记录；同样的文本第二次起直接返回缓存结果的副本"""
+        key = text_key(text, mode, joiner)
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                return dict(entry.info)
+        info = get_mode(mode).parse(text, joiner=joiner)
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._put(key, _Entry(info))
+        return dict(info)
+
+    def written_at(self, text, mode, target, joiner=" "):
+        """这段文字之前写入 target 的位置；没有写过返回 None（不解析、不读文件）"""
+        with self._lock:
+            entry = self._get(text_key(text, mode, joiner))
+            return entry.written.get(target) if entry is not None else None
+
+    def mark_written(self, text, mode, target, row, joiner=" "):
+        """登记这段文字已写入 target 的 row 位置（行号或 (文件, 行号)）"""
+        key = text_key(text, mode, joiner)
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                entry = _Entry(get_mode(mode).parse(text, joiner=joiner))
+                self._put(key, entry)
+            entry.written[target] = row
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def describe_location(where):
+    """行号 -> 第 N 行；(文件, 行号) -> 文件 第 N 行"""
+    if isinstance(where, (tuple, list)):
+        file, row = where
+        return f"{file} 第 {row} 行"
+    return f"第 {where} 行"
+
+
+parse_cache = ParseCache()
@@ -0,0 +1,316 @@
+"""工作簿分片：按月份（日期列）或行数上限把写入滚动到新的分片文件
+
+长期使用的表（如爱心流动表）越写越大，每次 "打开-追加-保存" 都要重写整个文件。
+分片后每次只打开当月 / 当前的小文件；读取通过 ShardReadView 统一访问所有分片，
+且只打开查询真正需要的分片。
+
+分片清单保存在 <表名>.shards.json：
+    {"mode": "爱心流动", "by": "month", "max_rows": 0, "headers": [...], "next_seq": 1,
+     "shards": [{"file": "爱心流动表_2024-03.xlsx", "key": "2024-03", "rows": 120,
+                 "min_date": "2024-03-01", "max_date": "2024-03-31"}, ...]}
+原有的未分片大文件（<表名>.xlsx）会作为第一个只读分片并入视图。
+表一旦分片，分片方式和行数上限以清单为准；调用方给出不同的值时报错，不会悄悄改掉。
+桌面程序、网页和导入服务都通过 append_records 写入，有清单就自动走分片。
+
+用法:
+    python sharding.py stats 爱心流动表.xlsx
+    python sharding.py preview 爱心流动表.xlsx --month 2024-03 -n 20
+"""
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+
+from futian_core import append_batch_to_file, load_workbook, parse_custom_headers
+from mode_specs import get_mode
+
+SHARD_BY_OPTIONS = ["month", "rows"]
+DEFAULT_SHARD_ROWS = 5000
+DATE_FIELD = "日期"
+_MONTH = re.compile(r"^(\d{4})-(\d{2})")
+# 网页端可以打开的服务器表格所在目录（导入服务 / 监视目录写入的表放在这里，网页就能查看和继续录入）
+TABLE_DIR = os.environ.get(
+    "FUTIAN_TABLE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+)
+
+
+def manifest_path(base_path):
+    return os.path.splitext(base_path)[0] + ".shards.json"
+
+
+def record_month(info, date_field=DATE_FIELD):
+    """记录所属月份 'YYYY-MM'；没有可用日期时归到当前月"""
+    match = _MONTH.match(str(info.get(date_field, "") or ""))
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    return datetime.now().strftime("%Y-%m")
+
+
+def _read_headers(path):
+    wb = load_workbook(path, read_only=True)
+    try:
+        first = next(wb.active.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        return [str(v).strip() for v in first if v]
+    finally:
+        wb.close()
+
+
+def _count_rows(path):
+    wb = load_workbook(path, read_only=True)
+    try:
+        return max(0, sum(1 for row in wb.active.iter_rows(min_row=2, values_only=True) if any(row)))
+    finally:
+        wb.close()
+
+
+def list_tables(folder):
+    """目录里的表（<表名>.xlsx）：分片表只列表名，不列各个分片文件"""
+    if not os.path.isdir(folder):
+        return []
+    files = os.listdir(folder)
+    tables, shard_files = set(), set()
+    for f in files:
+        if f.endswith(".shards.json"):
+            tables.add(f[:-len(".shards.json")] + ".xlsx")
+            with open(os.path.join(folder, f), encoding="utf-8") as fh:
+                shard_files.update(s["file"] for s in json.load(fh)["shards"])
+    tables.update(f for f in files
+                  if f.endswith(".xlsx") and not f.endswith(".tmp.xlsx") and f not in shard_files)
+    return sorted(tables)
+
+
+def is_sharded(base_path):
+    return os.path.exists(manifest_path(base_path))
+
+
+class ShardedWorkbook:
+    """写入端：把一批记录分到对应分片，每个分片一次打开 / 一次保存
+
+    by / max_rows 为 None 时：已有清单用清单里的设置，新建时默认按月、5000 行。
+    """
+
+    def __init__(self, base_path, mode, by=None, max_rows=None, custom_headers_str=""):
+        if by is not None and by not in SHARD_BY_OPTIONS:
+            raise ValueError(f"未知分片方式: {by}")
+        self.base_path = base_path
+        self.mode = mode
+        self.spec = get_mode(mode)
+        self.manifest_path = manifest_path(base_path)
+        self.manifest = self._load_manifest(by, max_rows, custom_headers_str)
+        self.by = self.manifest["by"]
+        self.max_rows = self.manifest["max_rows"]
+
+    def _load_manifest(self, by, max_rows, custom_headers_str):
+        name = os.path.basename(self.base_path)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["mode"] != self.spec.name:
+                raise Exception(f"{name} 是「{manifest['mode']}」模式的分片表，不能按「{self.spec.name}」写入")
+            if by is not None and by != manifest["by"]:
+                raise Exception(f"{name} 已按「{manifest['by']}」分片，不能改为「{by}」")
+            if manifest["by"] == "rows" and max_rows is not None and max_rows != manifest["max_rows"]:
+                raise Exception(f"{name} 的分片行数上限是 {manifest['max_rows']}，不能改为 {max_rows}")
+            return manifest
+
+        manifest = {"mode": self.spec.name, "by": by or "month",
+                    "max_rows": max_rows or DEFAULT_SHARD_ROWS,
+                    "headers": [], "next_seq": 1, "shards": []}
+        if os.path.exists(self.base_path):
+            # 已有的未分片文件：作为只读的第一个分片
+            rows = _count_rows(self.base_path)
+            manifest["headers"] = _read_headers(self.base_path)
+            manifest["next_seq"] = rows + 1
+            manifest["shards"].append({
+                "file": os.path.basename(self.base_path), "key": "legacy",
+                "rows": rows, "min_date": "", "max_date": "", "frozen": True,
+            })
+        elif self.spec.custom_headers:
+            manifest["headers"] = parse_custom_headers(custom_headers_str)
+            if not manifest["headers"]:
+                raise Exception("自定义模式分片需要先给出列名！")
+        else:
+            manifest["headers"] = list(self.spec.headers)
+        return manifest
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _shard_file(self, key):
+        stem = os.path.splitext(os.path.basename(self.base_path))[0]
+        return f"{stem}_{key}.xlsx"
+
+    def _new_shard(self, key):
+        shard = {"file": self._shard_file(key), "key": key, "rows": 0, "min_date": "", "max_date": ""}
+        self.manifest["shards"].append(shard)
+        return shard
+
+    def _route(self, info_list):
+        """[(分片, [记录...]), ...]，保持记录原有顺序"""
+        shards = [s for s in self.manifest["shards"] if not s.get("frozen")]
+        groups = []
+        if self.by == "month":
+            by_key = {s["key"]: s for s in shards}
+            for info in info_list:
+                key = record_month(info)
+                shard = by_key.get(key) or by_key.setdefault(key, self._new_shard(key))
+                if groups and groups[-1][0] is shard:
+                    groups[-1][1].append(info)
+                else:
+                    groups.append((shard, [info]))
+        else:
+            shard = shards[-1] if shards else None
+            pending = 0
+            for info in info_list:
+                if shard is None or shard["rows"] + pending >= self.max_rows:
+                    shard = self._new_shard(f"part{len(shards) + 1:03d}")
+                    shards.append(shard)
+                    pending = 0
+                if groups and groups[-1][0] is shard:
+                    groups[-1][1].append(info)
+                else:
+                    groups.append((shard, [info]))
+                pending += 1
+        return groups
+
+    def append_batch(self, info_list, unplaced=None, fuzzy=None):
+        """写入一批记录，返回 [(分片文件, 行号), ...]；unplaced / fuzzy 见 append_batch_to_file"""
+        folder = os.path.dirname(os.path.abspath(self.base_path))
+        placed = []
+        for shard, infos in self._route(info_list):
+            path = os.path.join(folder, shard["file"])
+            rows = append_batch_to_file(path, infos, self.mode, self.manifest["next_seq"],
+                                        self.manifest["headers"], unplaced, fuzzy)
+            self.manifest["next_seq"] += len(infos)
+            shard["rows"] += len(infos)
+            dates = [str(i.get(DATE_FIELD, "")) for i in infos if _MONTH.match(str(i.get(DATE_FIELD, "") or ""))]
+            if dates:
+                shard["min_date"] = min([d for d in (shard["min_date"], *dates) if d])
+                shard["max_date"] = max(shard["max_date"], *dates)
+            placed.extend((shard["file"], r) for r in rows)
+            # 每个分片写完就记账，中途失败时清单与已落盘的数据一致
+            self._save_manifest()
+        return placed
+
+
+def append_records(base_path, info_list, mode, shard_by=None, unplaced=None, fuzzy=None):
+    """写入一张表，返回 [(文件名, 行号), ...]
+
+    已分片（有清单）或要求分片（shard_by）时写进对应分片，否则直接追加到原文件。
+    """
+    if shard_by or is_sharded(base_path):
+        return ShardedWorkbook(base_path, mode, shard_by).append_batch(info_list, unplaced, fuzzy)
+    rows = append_batch_to_file(base_path, info_list, mode, unplaced=unplaced, fuzzy=fuzzy)
+    return [(os.path.basename(base_path), row) for row in rows]
+
+
+def table_mtime(base_path):
+    """表最近一次写入的时间：分片表看清单（每次写入都会更新），否则看文件本身"""
+    path = manifest_path(base_path)
+    return os.path.getmtime(path if os.path.exists(path) else base_path)
+
+
+class ShardReadView:
+    """读取端：统一访问所有分片；计数走清单，读行时才按需打开分片"""
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.folder = os.path.dirname(os.path.abspath(base_path))
+        path = manifest_path(base_path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            # 还没分片：把原文件当作唯一分片
+            self.manifest = {
+                "headers": _read_headers(base_path),
+                "shards": [{"file": os.path.basename(base_path), "key": "legacy",
+                            "rows": _count_rows(base_path), "min_date": "", "max_date": ""}],
+            }
+
+    @property
+    def headers(self):
+        return list(self.manifest["headers"])
+
+    def shards_for(self, month=None):
+        """只返回可能包含该月数据的分片（legacy 和没有日期范围的分片总是包含）"""
+        result = []
+        for shard in self.manifest["shards"]:
+            if month is None or shard["key"] == month:
+                result.append(shard)
+            elif _MONTH.match(shard["key"]):
+                continue
+            elif not shard["min_date"] or shard["min_date"][:7] <= month <= shard["max_date"][:7]:
+                result.append(shard)
+        return result
+
+    def months(self):
+        """按月分片的表里已有的月份（升序）；其他分片不计"""
+        return sorted(s["key"] for s in self.manifest["shards"] if _MONTH.match(s["key"]))
+
+    def count(self, month=None):
+        """按月计数时，只有 legacy / 行数分片才需要真正打开读取"""
+        total = 0
+        for shard in self.shards_for(month):
+            if month is None or shard["key"] == month:
+                total += shard["rows"]
+            else:
+                total += sum(1 for _ in self.iter_rows(month, shards=[shard]))
+        return total
+
+    def iter_rows(self, month=None, shards=None):
+        """按表头对齐逐行产出 tuple；列顺序与 headers 一致"""
+        headers = self.headers
+        for shard in shards if shards is not None else self.shards_for(month):
+            path = os.path.join(self.folder, shard["file"])
+            wb = load_workbook(path, read_only=True)
+            try:
+                it = wb.active.iter_rows(values_only=True)
+                shard_headers = [str(v).strip() if v else "" for v in next(it, ())]
+                pos = {h: i for i, h in enumerate(shard_headers) if h}
+                layout = [pos.get(h) for h in headers]
+                date_idx = pos.get(DATE_FIELD)
+                for row in it:
+                    if not any(row):
+                        continue
+                    if month is not None and date_idx is not None and shard["key"] != month:
+                        if not str(row[date_idx] or "").startswith(month):
+                            continue
+                    yield tuple(row[i] if i is not None and i < len(row) else None for i in layout)
+            finally:
+                wb.close()
+
+    def to_dataframe(self, month=None, limit=None):
+        import pandas as pd
+        rows = []
+        for row in self.iter_rows(month):
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+        return pd.DataFrame(rows, columns=self.headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片工作簿查看")
+    parser.add_argument("command", choices=["stats", "preview"])
+    parser.add_argument("base", help="表名（如 爱心流动表.xlsx）")
+    parser.add_argument("--month", help="只看某个月 YYYY-MM")
+    parser.add_argument("-n", type=int, default=20, help="preview 显示的行数")
+    args = parser.parse_args()
+
+    view = ShardReadView(args.base)
+    if args.command == "stats":
+        for shard in view.shards_for(args.month):
+            span = f"{shard['min_date']} ~ {shard['max_date']}" if shard["min_date"] else ""
+            print(f"  {shard['file']:<30} {shard['rows']:>8} 行  {span}")
+        print(f"合计: {view.count(args.month)} 行")
+    else:
+        print(view.to_dataframe(args.month, args.n).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""多人共用一张表：每张命名表由一个后台写线程独占，网页会话只提交、只读快照
+
+多个志愿者同时往同一张福田表录入时，各会话把解析好的记录提交到写线程的队列；
+写线程按批追加、连续分配序号，每批写完立即落盘，落盘成功后才通知提交者"已添加"。
+落盘失败（文件被占用、磁盘满）时这一批从内存表里撤回，提交者收到异常，写线程继续工作。
+读取拿的是带版本号的快照（只追加的行列表 + 行数），读永远不会阻塞写。
+"""
+import atexit
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future
+
+from futian_core import (
+    create_blank_workbook, format_fuzzy, format_unplaced, load_workbook, read_header_map, record_key_name,
+    write_record_row,
+)
+from mode_specs import get_mode, load_modes
+
+SHARED_DIR = os.environ.get(
+    "FUTIAN_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_tables")
+)
+
+
+class Snapshot:
+    """某一版本的只读视图；rows 列表只追加不修改，所以切片即可安全读取"""
+
+    def __init__(self, revision, headers, rows, row_numbers, count):
+        self.revision = revision
+        self.headers = headers
+        self._rows = rows
+        self._row_numbers = row_numbers
+        self.count = count
+
+    def rows(self, start=0):
+        return self._rows[start:self.count]
+
+    def numbered_rows(self):
+        """[(行号, 数据行)]；表里原有空行时行号不连续"""
+        return list(zip(self._row_numbers[:self.count], self._rows[:self.count]))
+
+
+def detect_table_mode(header_map):
+    """已有表按表头判断模式：包含某个固定模式的全部表头即为该模式，否则为自定义"""
+    for spec in load_modes():
+        if not spec.custom_headers and set(spec.headers) <= set(header_map):
+            return spec.name
+    return get_mode(None).name
+
+
+class SharedTableWriter:
+    """一张命名表的唯一写入者"""
+
+    def __init__(self, name, mode, custom_headers_str="", max_batch=200, poll_interval=2.0, max_queue=5000):
+        self.name = name
+        self.path = os.path.join(SHARED_DIR, f"{safe_table_name(name)}.xlsx")
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        os.makedirs(SHARED_DIR, exist_ok=True)
+        if os.path.exists(self.path):
+            self.wb = load_workbook(self.path)
+        else:
+            self.wb = create_blank_workbook(mode, custom_headers_str)
+            self.wb.save(self.path)
+
+        sheet = self.wb.active
+        self.header_map = read_header_map(sheet)
+        # 模式以表本身为准：已有的表按表头判断，不跟随后来打开它的会话
+        self.mode = detect_table_mode(self.header_map)
+        self.headers = [c.value for c in sheet[1]]
+        numbered = [(i, row) for i, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), 2) if any(row)]
+        self._rows = [row for _, row in numbered]
+        self._row_numbers = [i for i, _ in numbered]
+        seq_col = self.header_map.get("序号")
+        seqs = [r[seq_col - 1] for r in self._rows if seq_col and isinstance(r[seq_col - 1], int)]
+        self.next_seq = max(seqs, default=len(self._rows)) + 1
+        self._snapshot = Snapshot(0, self.headers, self._rows, self._row_numbers, len(self._rows))
+
+        self.last_error = None
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"shared-table-{name}", daemon=True)
+        self._thread.start()
+
+    # ---------- 会话端 ----------
+
+    def submit(self, info):
+        """提交一条解析结果，返回 Future -> (序号, 行号, 提示信息)；队列满时抛 queue.Full
+
+        Future 在这条记录已经保存到文件之后才完成；保存失败时 Future 带异常。
+        """
+        fut = Future()
+        self._queue.put_nowait((info, fut))
+        return fut
+
+    def snapshot(self):
+        return self._snapshot
+
+    # ---------- 写线程 ----------
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                first = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            except Exception as e:
+                # 兜底：任何意外都不能让写线程退出，否则 flush() 永远等不到 task_done
+                for _, fut in batch:
+                    if fut is not None and not fut.done():
+                        fut.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply(self, batch):
+        """写入一批并保存；保存成功后才完成各 Future，失败时撤回这一批"""
+        sheet = self.wb.active
+        first_row = next_row = sheet.max_row + 1
+        first_seq = self.next_seq
+        done, new_rows = [], []
+        for info, fut in batch:
+            if fut is None:  # flush 标记：每批都会保存，这里无需额外处理
+                continue
+            try:
+                seq, fuzzy = self.next_seq, []
+                unplaced = write_record_row(sheet, self.header_map, next_row, info, self.mode, seq, fuzzy)
+                new_rows.append(tuple(c.value for c in sheet[next_row]))
+                notes = "".join(f"；{n}" for n in (format_unplaced(unplaced), format_fuzzy(fuzzy)) if n)
+                done.append((fut, (seq, next_row, f"成功添加：{record_key_name(info, self.mode)}（序号 {seq}{notes}）")))
+                self.next_seq += 1
+                next_row += 1
+            except Exception as e:
+                fut.set_exception(e)
+        if not done:
+            return
+
+        try:
+            self._save()
+        except Exception as e:
+            sheet.delete_rows(first_row, next_row - first_row)
+            self.next_seq = first_seq
+            self.last_error = e
+            error = Exception(f"保存共享表格失败，本次提交未写入：{e}")
+            for fut, _ in done:
+                fut.set_exception(error)
+            return
+
+        self.last_error = None
+        self._rows.extend(new_rows)
+        self._row_numbers.extend(range(first_row, next_row))
+        # 发布新快照：对象替换是原子操作，读者要么看到旧版本要么看到新版本
+        self._snapshot = Snapshot(self._snapshot.revision + 1, self.headers, self._rows, self._row_numbers,
+                                  len(self._rows))
+        for fut, result in done:
+            fut.set_result(result)
+
+    def _save(self):
+        tmp = self.path + ".tmp.xlsx"
+        try:
+            self.wb.save(tmp)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def flush(self):
+        """等待队列里已提交的记录全部处理完（成功的都已落盘）"""
+        self._queue.put((None, None))
+        self._queue.join()
+
+    def close(self):
+        if not self._thread.is_alive():
+            return
+        self.flush()
+        self._stopping = True
+        self._queue.put((None, None))  # 唤醒等待中的写线程，让它立即看到 _stopping
+        self._thread.join()
+
+
+def safe_table_name(name):
+    """表名只保留中英文、数字、下划线和横线，作为文件名使用"""
+    cleaned = re.sub(r"[^\w\-]", "_", name.strip())
+    if not cleaned:
+        raise ValueError("表名不能为空")
+    return cleaned
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_shared_table(name, mode=None, custom_headers_str=""):
+    """进程内同名表只创建一个写线程
+
+    mode 给定时必须和表本身的模式一致，否则抛异常（避免字段写进别的模式的列）；
+    只读取快照时可以不传。custom_headers_str 只在新建表时使用。
+    """
+    key = safe_table_name(name)
+    with _registry_lock:
+        writer = _registry.get(key)
+        if writer is None:
+            path = os.path.join(SHARED_DIR, f"{key}.xlsx")
+            if mode is None and not os.path.exists(path):
+                raise Exception(f"共享表格不存在：{name}")
+            writer = _registry[key] = SharedTableWriter(name, mode, custom_headers_str)
+    if mode is not None and get_mode(mode).name != writer.mode:
+        raise Exception(f"共享表格「{name}」是「{writer.mode}」模式，"
+                        f"当前选择的是「{get_mode(mode).name}」，请切换模式后再录入。")
+    return writer
+
+
+@atexit.register
+def _close_all():
+    """进程退出前等所有写线程把队列里的记录处理完"""
+    with _registry_lock:
+        writers = list(_registry.values())
+    for writer in writers:
+        writer.close()
+
+
+def list_shared_tables():
+    if not os.path.isdir(SHARED_DIR):
+        return []
+    return sorted(f[:-5] for f in os.listdir(SHARED_DIR) if f.endswith(".xlsx") and not f.endswith(".tmp.xlsx"))
@@ -0,0 +1,252 @@
+"""按 团队 → 日期 → 序号 排序整张表并重新编号（数据量大时用外部归并排序）
+
+用法:
+    python sort_workbook.py 团队统计表.xlsx                  # 写到 团队统计表_排序.xlsx
+    python sort_workbook.py 爱心流动表.xlsx -o 排序后.xlsx --max-memory-rows 100000
+    python sort_workbook.py 团队统计表.xlsx --in-place       # 确认后覆盖原文件
+
+- 只读模式逐行读取；行数不超过 max_memory_rows 时直接在内存里排序，
+  超过时每 max_memory_rows 行排好序写入一个临时文件，最后 heapq.merge 归并；
+- 排序键依次为 团队、日期、原序号（表里没有的列跳过），都相同时保持原有顺序；
+  团队为空的行排在最后，日期统一成 YYYY-MM-DD 后比较；
+- 序号从 1 重新连续编号；
+- 结果一次性流式写出，保留工作表名、冻结窗格、列宽，以及表头行和每列的格式
+  （字体、填充、边框、对齐、数字格式，取自原表表头和第一行数据）；
+  原表没有设置列宽的列按模式的默认列宽（见 futian_core.create_blank_workbook）；
+- 默认写到单独的 <原文件名>_排序.xlsx，只有明确要求时才覆盖原文件。
+"""
+import argparse
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+import zipfile
+from copy import copy
+from datetime import date, datetime
+from xml.etree.ElementTree import iterparse
+
+from futian_core import load_workbook
+from mode_specs import load_modes, normalize_date
+
+SORT_FIELDS = ("团队", "日期", "序号")
+SEQ_FIELD = "序号"
+DEFAULT_WIDTH = 15
+OUTPUT_SUFFIX = "_排序"
+_STYLE_ATTRS = ("font", "fill", "border", "alignment", "number_format", "protection")
+
+
+def default_output_path(path):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}{OUTPUT_SUFFIX}{ext}"
+
+
+def detect_mode(headers):
+    """表头和哪个固定表头模式一致；都不一致时返回 None"""
+    for spec in load_modes():
+        if not spec.custom_headers and set(spec.headers) <= set(headers):
+            return spec
+    return None
+
+
+def _date_key(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return normalize_date(value) or "9999-99-99"
+
+
+def _seq_key(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def make_sort_key(headers):
+    """返回 key(序号, 行) 函数；序号（读入顺序）放在最后保证排序稳定"""
+    index = {h: i for i, h in enumerate(headers)}
+    parts = []
+    if "团队" in index:
+        i = index["团队"]
+        parts.append(lambda row, i=i: (row[i] is None or str(row[i]).strip() == "",
+                                       str(row[i] or "").strip()))
+    if "日期" in index:
+        i = index["日期"]
+        parts.append(lambda row, i=i: _date_key(row[i]))
+    if SEQ_FIELD in index:
+        i = index[SEQ_FIELD]
+        parts.append(lambda row, i=i: _seq_key(row[i]))
+
+    def key(item):
+        position, row = item
+        return tuple(p(row) for p in parts) + (position,)
+    return key
+
+
+class _Run:
+    """外部排序的一个已排序分块（pickle 逐行写入临时文件）"""
+
+    def __init__(self, directory, items):
+        fd, self.path = tempfile.mkstemp(prefix="sort_run_", suffix=".pkl", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            for item in items:
+                pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+
+def read_sheet_layout(path, worksheet_path):
+    """(冻结窗格, {列号: 列宽})：只读工作表 XML 里 <sheetData> 之前的部分，不载入数据"""
+    freeze, widths = None, {}
+    with zipfile.ZipFile(path) as zf, zf.open(worksheet_path) as f:
+        for _, elem in iterparse(f, events=("start",)):
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag == "sheetData":
+                break
+            if tag == "pane" and elem.get("state") in ("frozen", "frozenSplit"):
+                freeze = elem.get("topLeftCell")
+            elif tag == "col" and elem.get("width"):
+                for col in range(int(elem.get("min")), int(elem.get("max")) + 1):
+                    widths[col] = float(elem.get("width"))
+    return freeze, widths
+
+
+def read_column_styles(ws, width):
+    """[表头行各列样式, 第一行数据各列样式]；没有设置格式的列为 None"""
+    styles = [[None] * width, [None] * width]
+    for r, row in enumerate(ws.iter_rows(min_row=1, max_row=2)):
+        for c, cell in enumerate(row[:width]):
+            if getattr(cell, "has_style", False):
+                styles[r][c] = {attr: copy(getattr(cell, attr)) for attr in _STYLE_ATTRS}
+    return styles
+
+
+def styled_row(ws, values, styles):
+    """有格式的列用 WriteOnlyCell 带上原格式，其余直接写值"""
+    from openpyxl.cell import WriteOnlyCell
+    if not any(styles):
+        return values
+    out = []
+    for value, style in zip(values, styles):
+        if style is None:
+            out.append(value)
+            continue
+        cell = WriteOnlyCell(ws, value)
+        for attr, v in style.items():
+            setattr(cell, attr, v)
+        out.append(cell)
+    return out
+
+
+def sorted_rows(rows, key, max_memory_rows, temp_dir=None):
+    """对 (序号, 行) 流排序；超过 max_memory_rows 时分块落盘再归并。返回 (迭代器, 分块数)"""
+    buffer, runs = [], []
+    run_dir = None
+    for item in rows:
+        buffer.append(item)
+        if len(buffer) >= max_memory_rows:
+            if run_dir is None:
+                run_dir = tempfile.mkdtemp(prefix="futian_sort_", dir=temp_dir)
+            buffer.sort(key=key)
+            runs.append(_Run(run_dir, buffer))
+            buffer = []
+    buffer.sort(key=key)
+    if not runs:
+        return iter(buffer), 0
+
+    def merged():
+        try:
+            yield from heapq.merge(*runs, iter(buffer), key=key)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+    return merged(), len(runs)
+
+
+def sort_workbook(path, output_path=None, max_memory_rows=200_000, in_place=False):
+    """排序并重新编号，返回 (行数, 落盘分块数)
+
+    output_path 缺省时写到 <原文件名>_排序.xlsx；in_place 为 True 时覆盖原文件。
+    """
+    import openpyxl
+
+    output_path = path if in_place else (output_path or default_output_path(path))
+    wb = load_workbook(path, read_only=True)
+    try:
+        if len(wb.sheetnames) > 1:
+            raise Exception("工作簿里有多个工作表，排序只支持单个工作表的文件。")
+        ws = wb.active
+        it = ws.iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else "" for h in next(it, ())]
+        if not any(headers):
+            raise Exception("Excel 文件没有表头，无法排序。")
+        if not any(h in headers for h in SORT_FIELDS):
+            raise Exception("表里没有 团队 / 日期 / 序号 列，无法排序。")
+        width = len(headers)
+        freeze, widths = read_sheet_layout(path, ws._worksheet_path)
+        header_styles, column_styles = read_column_styles(ws, width)
+
+        rows = ((i, tuple(row[:width]) + (None,) * (width - len(row)))
+                for i, row in enumerate(it)
+                if row and any(v is not None and v != "" for v in row))
+        ordered, runs = sorted_rows(rows, make_sort_key(headers), max_memory_rows,
+                                    os.path.dirname(os.path.abspath(output_path)))
+
+        spec = detect_mode(headers)
+        out_wb = openpyxl.Workbook(write_only=True)
+        out_ws = out_wb.create_sheet(ws.title)
+        for col, header in enumerate(headers, 1):
+            out_ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = widths.get(
+                col, spec.column_width(header) if spec else DEFAULT_WIDTH)
+        if freeze:
+            out_ws.freeze_panes = freeze
+        out_ws.append(styled_row(out_ws, headers, header_styles))
+
+        seq_idx = headers.index(SEQ_FIELD) if SEQ_FIELD in headers else None
+        count = 0
+        for _, row in ordered:
+            count += 1
+            if seq_idx is not None:
+                row = row[:seq_idx] + (count,) + row[seq_idx + 1:]
+            out_ws.append(styled_row(out_ws, row, column_styles))
+    finally:
+        wb.close()
+
+    tmp = output_path + ".tmp.xlsx"
+    out_wb.save(tmp)
+    try:
+        os.replace(tmp, output_path)
+    except PermissionError:
+        os.remove(tmp)
+        raise Exception("无法保存！请先关闭该 Excel 文件后再试。")
+    return count, runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按 团队 / 日期 / 序号 排序并重新编号")
+    parser.add_argument("path", help="要排序的 .xlsx")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("-o", "--output", help=f"输出文件（默认 <原文件名>{OUTPUT_SUFFIX}.xlsx）")
+    target.add_argument("--in-place", action="store_true", help="覆盖原文件（会先要求确认）")
+    parser.add_argument("-y", "--yes", action="store_true", help="配合 --in-place，不再询问直接覆盖")
+    parser.add_argument("--max-memory-rows", type=int, default=200_000,
+                        help="内存中最多排序多少行，超出后分块落盘归并")
+    args = parser.parse_args()
+
+    if args.in_place and not args.yes:
+        if input(f"将覆盖 {args.path}，继续吗？[y/N] ").strip().lower() not in ("y", "yes"):
+            print("已取消")
+            return
+    output = args.path if args.in_place else (args.output or default_output_path(args.path))
+    count, runs = sort_workbook(args.path, output, args.max_memory_rows)
+    how = f"外部归并（{runs} 个分块）" if runs else "内存排序"
+    print(f"已排序 {count} 行（{how}），序号已重新编号，已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
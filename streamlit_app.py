@@ -1,217 +1,46 @@
 import streamlit as st
-import openpyxl
-from openpyxl.styles import Alignment
-import re
-import io
-import pandas as pd
+import hashlib
+import os
+import queue
+from itertools import islice
 from datetime import datetime
 
-# ================= 1. 配置与解析逻辑区 =================
-
-# --- 表头定义 ---
-HEADERS_FUTIAN = [
-    "团队", "福田数量", "序号", "真实姓名", "推荐人", 
-    "居住地", "职业", "出身年月日", "电话号码", 
-    "现在生活事业家庭情况", "想收获什么梦想", "有无宗教信仰"
-]
-
-HEADERS_LOVE = [
-    "被流动人", "类型", "份数", "日期", "流动人", 
-    "回流人", "归属", "源头", "备注"
-]
-
-# --- 解析函数 ---
-
-def normalize_date(value):
-    """通用日期清洗"""
-    if not value: return ""
-    value = str(value).replace("/", "-").replace(".", "-").replace("年", "-").replace("月", "-").replace("日", "")
-    nums = re.findall(r"\d+", value)
-    if len(nums) >= 3:
-        year, month, day = nums[:3]
-        if len(year) == 2: year = "20" + year
-        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    return value
-
-def extract_info_by_mode(text, mode):
-    """根据模式分发解析逻辑"""
-    text = text.replace("\r\n", "\n")
-    
-    if mode == "福田统计":
-        return extract_futian(text)
-    elif mode == "爱心流动":
-        return extract_love(text)
-    else:
-        return extract_custom(text)
-
-def extract_futian(text):
-    field_alias = {
-        "真实姓名": ["真实姓名", "姓名"],
-        "推荐人": ["推荐人", "分享人"],
-        "居住地": ["居住地", "地址"],
-        "职业": ["职业"],
-        "出身年月日": ["出身年月日", "出生年月日", "生日"],
-        "电话号码": ["电话号码", "手机号码", "电话", "手机"],
-        "现在生活事业家庭情况": ["现在生活事业家庭情况"],
-        "想收获什么梦想": ["想收获什么梦想"],
-        "有无宗教信仰": ["有无宗教信仰"]
-    }
-    result = parse_key_value(text, field_alias)
-    result["出身年月日"] = normalize_date(result.get("出身年月日", ""))
-    return result
-
-def extract_love(text):
-    field_alias = {
-        "被流动人": ["被流动人", "被流动学员"],
-        "原始类型": ["类型"], 
-        "日期": ["日期", "时间"],
-        "流动人": ["流动人"],
-        "回流人": ["回流人"],
-        "归属": ["归属"],
-        "源头": ["源头"],
-        "备注": ["备注"]
-    }
-    result = parse_key_value(text, field_alias)
-    
-    # 拆分类型与份数
-    raw_type = result.get("原始类型", "")
-    result["类型"] = raw_type 
-    result["份数"] = ""       
-    
-    if raw_type:
-        # 匹配 "爱心(1份)" -> group1=爱心, group2=1份
-        match = re.match(r"(.*?)[\(（](.*?)[\)）]", raw_type)
-        if match:
-            result["类型"] = match.group(1).strip()
-            # 去掉 '份' 字
-            result["份数"] = match.group(2).replace("份", "").strip()
-            
-    result["日期"] = normalize_date(result.get("日期", ""))
-    return result
-
-def extract_custom(text):
-    result = {}
-    current_key = None
-    for raw_line in text.split("\n"):
-        line = raw_line.strip()
-        if not line: continue
-        if line.startswith("【") and line.endswith("】"): continue
-
-        if "：" in line or ":" in line:
-            split_char = "：" if "：" in line else ":"
-            parts = line.split(split_char, 1)
-            key = parts[0].strip()
-            val = parts[1].strip() if len(parts) > 1 else ""
-            key_clean = key.split("（")[0].split("(")[0].strip().replace(" ", "")
-            current_key = key_clean
-            result[current_key] = val
-        elif current_key:
-            result[current_key] += " " + line
-    return result
-
-def parse_key_value(text, field_alias):
-    reverse_map = {}
-    for k, v in field_alias.items():
-        for name in v: reverse_map[name] = k
-    result = {k: "" for k in field_alias}
-    current_field = None
-    for raw_line in text.split("\n"):
-        line = raw_line.strip()
-        if not line: continue
-        line = line.replace("【🔔流动明细表】", "").strip() # 清理标题
-        if "：" in line or ":" in line:
-            parts = line.replace(":", "：").split("：", 1)
-            key = parts[0].split("（")[0].split("(")[0].strip().replace(" ", "")
-            val = parts[1].strip() if len(parts) > 1 else ""
-            if key in reverse_map:
-                current_field = reverse_map[key]
-                if val: result[current_field] = val
-                continue
-        if current_field and result[current_field]:
-            result[current_field] += " " + line
-        elif current_field:
-            result[current_field] = line
-    return result
-
-# ================= 2. Excel 核心操作 (Session State版) =================
-
-def create_blank_workbook(mode, custom_headers_str=""):
-    """创建空白 Workbook 并设置表头"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Sheet1"
-    
-    headers = []
-    if mode == "福田统计":
-        headers = HEADERS_FUTIAN
-    elif mode == "爱心流动":
-        headers = HEADERS_LOVE
-    else:
-        # 自定义模式
-        headers = [h for h in re.split(r'[，, \s]+', custom_headers_str) if h]
-        if not headers: headers = ["列名1", "列名2", "列名3"] # 默认保底
-
-    ws.append(headers)
-    
-    # 设置列宽
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
-        
-    return wb
-
-def append_data_to_workbook(wb, info_dict, mode):
-    """将字典数据追加到 Workbook"""
-    sheet = wb.active
-    header_map = {}
-    for col_idx, cell in enumerate(sheet[1], 1):
-        if cell.value: header_map[str(cell.value).strip()] = col_idx
-            
-    if not header_map: return False, "表格没有表头，无法识别列名"
-
-    next_row = sheet.max_row + 1
-    
-    for field, value in info_dict.items():
-        # 1. 精确匹配
-        if field in header_map:
-            cell = sheet.cell(row=next_row, column=header_map[field])
-            cell.value = value
-            cell.alignment = Alignment(wrap_text=True) # 自动换行
-        # 2. 模糊匹配 (仅自定义模式)
-        elif mode == "自定义":
-             for h_name, h_idx in header_map.items():
-                if field == h_name:
-                    sheet.cell(row=next_row, column=h_idx).value = value
-
-    # 序号自动生成
-    if "序号" in header_map:
-        sheet.cell(row=next_row, column=header_map["序号"]).value = next_row - 1
-
-    # 返回成功消息的关键字段
-    key_name = "未知"
-    if mode == "福田统计": key_name = info_dict.get("真实姓名", "未知")
-    elif mode == "爱心流动": key_name = info_dict.get("被流动人", "未知")
-    else: key_name = list(info_dict.values())[0] if info_dict else "数据"
-
-    return True, f"成功添加：{key_name}"
-
-def to_excel_bytes(wb):
-    """将 Workbook 转换为二进制流供下载"""
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
-
-# ================= 3. Streamlit 界面交互 =================
+# openpyxl / pandas 都在第一次用到时才导入，没有表格时页面不为它们付启动成本
+from futian_core import (
+    MODE_OPTIONS, extract_info_by_mode, create_blank_workbook,
+)
+from exporters import EXPORT_FORMATS, available_formats, export_rows_bytes
+from workbook_cache import WorkbookView
+from lineage_graph import LOVE_MODE, RECORD_FIELDS as RECORD_COLUMNS, LineageGraph, format_amount
+from shared_tables import get_shared_table, list_shared_tables
+from mode_specs import get_mode
+from validation import ERROR, validate_record
+from memprofile import stage
+from parse_cache import describe_location, parse_cache
+from sharding import TABLE_DIR, ShardReadView, append_records, list_tables, table_mtime
+
+# ================= 1. Streamlit 界面交互 =================
 
 st.set_page_config(page_title="Excel 智能填表助手 Pro", page_icon="📝", layout="wide")
 
 # --- 初始化 Session State ---
+# 当前会话的表格（WorkbookView：上传的文件在各会话间共享，首次追加时才复制一份私有副本）
 if 'workbook' not in st.session_state: st.session_state.workbook = None
 if 'file_name' not in st.session_state: st.session_state.file_name = "导出数据.xlsx"
 if 'last_loaded_key' not in st.session_state: st.session_state.last_loaded_key = None
+# 共享表格名（多人同时录入同一张表时使用，此时不使用 workbook）
+if 'shared_table' not in st.session_state: st.session_state.shared_table = None
+# 服务器上的表格路径（可能已分片，读写都经过 sharding，此时也不使用 workbook）
+if 'server_table' not in st.session_state: st.session_state.server_table = None
 if 'status_msg' not in st.session_state: st.session_state.status_msg = None
+# 上次导出时表格的数据行数，用于增量导出
+if 'last_export_rows' not in st.session_state: st.session_state.last_export_rows = 0
+# 服务器表格准备好的导出：(表格/修改时间/月份/格式/起点, 数据, 条数)；只在点击"准备导出"时生成
+if 'server_export' not in st.session_state: st.session_state.server_export = None
+# 爱心流动的流向图：(表格来源 key, LineageGraph)，载入时建一次，之后随追加增量更新
+if 'lineage' not in st.session_state: st.session_state.lineage = None
 # 默认模式
-if 'current_mode' not in st.session_state: st.session_state.current_mode = "福田统计"
+if 'current_mode' not in st.session_state: st.session_state.current_mode = MODE_OPTIONS[0]
 
 # --- 回调函数：处理提交 ---
 def submit_data():
@@ -222,24 +51,132 @@ def submit_data():
         st.session_state.status_msg = ("warning", "⚠️ 内容不能为空！")
         return
 
-    if st.session_state.workbook is None:
+    if st.session_state.workbook is None and not st.session_state.shared_table and not st.session_state.server_table:
         st.session_state.status_msg = ("error", "❌ 请先在左侧 [上传] 或 [初始化] 表格！")
         return
 
+    # 同一段文字已写入当前表格时，在解析和写入之前就提示
+    target = write_target()
+    written = parse_cache.written_at(text, mode, target)
+    if written and not st.session_state.get("allow_duplicate"):
+        st.session_state.status_msg = ("warning", f"⚠️ 这条记录已经写入过（{describe_location(written)}），未重复写入。"
+                                                  "确需再写一次请勾选「允许重复写入」。")
+        return
+
     # 执行解析和追加
     try:
         info = extract_info_by_mode(text, mode)
-        success, msg = append_data_to_workbook(st.session_state.workbook, info, mode)
-        
+        # 写入前校验：有错误时不写入，除非勾选了强制写入
+        level, problems = validate_record(info, mode)
+        if level == ERROR and not st.session_state.get("skip_validation"):
+            st.session_state.status_msg = ("error", "❌ 数据校验未通过，未写入：\n\n" + "\n\n".join(problems))
+            return
+        if st.session_state.shared_table:
+            # 共享表格：交给写线程排队写入，序号由写线程统一分配
+            writer = get_shared_table(st.session_state.shared_table, mode)
+            _, row, msg = writer.submit(info).result(timeout=30)
+            success = True
+        elif st.session_state.server_table:
+            # 服务器表格：已分片时写进对应月份的分片文件
+            (file, file_row), = append_records(st.session_state.server_table, [info], mode)
+            row = (file, file_row)
+            msg = f"成功添加：{get_mode(mode).key_name(info)}（{describe_location(row)}）"
+            success = True
+        else:
+            success, msg = st.session_state.workbook.append(info, mode)
+            row = st.session_state.workbook.workbook().active.max_row
         if success:
+            parse_cache.mark_written(text, mode, target, row)
+        if success and mode == LOVE_MODE and not st.session_state.server_table:
+            update_lineage(info, row)
+        
+        if success and problems:
+            st.session_state.status_msg = ("warning", f"⚠️ {msg}（请核对：{'；'.join(problems)}）")
+            st.session_state.user_input = "" # 清空输入框
+        elif success:
             st.session_state.status_msg = ("success", f"✅ {msg}")
             st.session_state.user_input = "" # 清空输入框
         else:
             st.session_state.status_msg = ("error", f"❌ {msg}")
+    except queue.Full:
+        st.session_state.status_msg = ("warning", "⚠️ 共享表格正忙，请稍后再提交。")
     except Exception as e:
         st.session_state.status_msg = ("error", f"❌ 程序错误: {str(e)}")
 
-# ================= 4. 页面布局 =================
+# 服务器表格可能有几十万行，预览只读前面这些
+SERVER_PREVIEW_ROWS = 2000
+
+FORMAT_LABELS = {
+    "xlsx": "Excel (.xlsx)",
+    "csv": "CSV (.csv，Excel 可直接打开)",
+    "jsonl": "JSON Lines (.jsonl)",
+    "parquet": "Parquet (.parquet)",
+}
+
+def write_target():
+    """重复记录登记用的目标表：共享表格所有人共用，私有表格按视图的 token 区分（不用 id()，对象回收后会被复用）"""
+    if st.session_state.shared_table:
+        return f"SHARED_{st.session_state.shared_table}"
+    if st.session_state.server_table:
+        return os.path.abspath(st.session_state.server_table)
+    return f"VIEW_{st.session_state.workbook.token}"
+
+def mark_exported(total_rows):
+    st.session_state.last_export_rows = total_rows
+
+def update_lineage(info, row=None):
+    """追加成功后把新记录加进当前表格的流向图（还没建图时什么都不做）"""
+    cached = st.session_state.lineage
+    if cached and cached[0] == st.session_state.last_loaded_key:
+        cached[1].add_record(info, row)
+
+def get_lineage(headers, count, numbered_rows):
+    """当前表格的流向图；换了表格或行数对不上（如共享表格有别人写入）时重新建图
+
+    numbered_rows() 返回 [(行号, 数据行)]，只在需要重新建图时才调用。
+    """
+    key = st.session_state.last_loaded_key
+    cached = st.session_state.lineage
+    if st.session_state.server_table:
+        # 服务器表格不在内存里：按清单 / 文件的修改时间判断是否要重新读全部分片建图
+        key = (key, table_mtime(st.session_state.server_table))
+        if cached is None or cached[0] != key:
+            cached = st.session_state.lineage = (key, LineageGraph.from_file(st.session_state.server_table))
+        return cached[1]
+    if cached is None or cached[0] != key or len(cached[1]) != count:
+        cached = st.session_state.lineage = (key, LineageGraph.from_rows(headers, numbered_rows()))
+    return cached[1]
+
+def show_lineage(headers, count=None, numbered_rows=None):
+    """爱心流动：按姓名查询下游 / 上游和回流份数"""
+    with st.expander("🔗 流动关系查询"):
+        graph = get_lineage(headers, count, numbered_rows)
+        col_q1, col_q2 = st.columns([2, 1])
+        with col_q1:
+            name = st.text_input("姓名（源头 / 流动人 / 被流动人 / 回流人）", key="lineage_name")
+        with col_q2:
+            direction = st.radio("方向", ["下游", "上游"], horizontal=True, key="lineage_dir")
+        if not name.strip():
+            st.caption(f"已索引 {len(graph.names)} 人、{len(graph)} 条记录。")
+            return
+        if name not in graph:
+            st.warning(f"表中没有找到：{name}")
+            return
+        stats = graph.node_stats(name)
+        result = graph.summary(name, "down" if direction == "下游" else "up")
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric(f"{direction}人数", len(result["people"]))
+        m2.metric("相关记录", result["record_count"])
+        m3.metric("相关份数", format_amount(result["total_amount"]))
+        m4.metric("回流到此人份数", format_amount(stats["回流到此人份数"]))
+        st.caption(f"作为源头 {stats['作为源头的记录']} 条，流出 {format_amount(stats['流出份数'])} 份，"
+                   f"收到 {format_amount(stats['收到份数'])} 份")
+        if result["records"]:
+            import pandas as pd
+            st.dataframe(pd.DataFrame(result["records"], columns=("行号",) + RECORD_COLUMNS),
+                         use_container_width=True, hide_index=True, height=250)
+
+# ================= 2. 页面布局 =================
 
 st.title("📝 Excel 智能填表助手 (Web持久版)")
 
@@ -248,41 +185,86 @@ with st.sidebar:
     st.header("1. 模式与文件")
     
     # 模式选择
-    mode_options = ["福田统计", "爱心流动", "自定义"]
-    selected_mode = st.radio("选择填表模式:", mode_options)
+    selected_mode = st.radio("选择填表模式:", MODE_OPTIONS)
     st.session_state.current_mode = selected_mode # 更新状态
 
     st.markdown("---")
     
     # 文件操作类型
-    file_op = st.radio("文件来源:", ["📂 上传现有 Excel", "✨ 新建空白表格"])
+    file_op = st.radio("文件来源:", ["📂 上传现有 Excel", "✨ 新建空白表格", "👥 共享表格（多人录入）",
+                                  "🗂️ 服务器表格（支持分片）"])
     
     if file_op == "📂 上传现有 Excel":
         uploaded_file = st.file_uploader("选择文件 (.xlsx)", type=["xlsx"])
         if uploaded_file:
-            # 避免重复加载
-            file_key = f"{uploaded_file.name}_{uploaded_file.size}"
+            # 避免重复加载；按内容哈希判断（与上传缓存的 digest 相同），
+            # 同名同大小但内容不同的文件也会重新加载
+            raw = uploaded_file.getvalue()
+            file_key = hashlib.sha256(raw).hexdigest()
             if st.session_state.last_loaded_key != file_key:
                 try:
-                    st.session_state.workbook = openpyxl.load_workbook(uploaded_file)
+                    # 按内容哈希命中进程级缓存时不再重复解析
+                    st.session_state.workbook = WorkbookView.from_upload(raw)
+                    st.session_state.shared_table = None
+                    st.session_state.server_table = None
                     st.session_state.file_name = uploaded_file.name
                     st.session_state.last_loaded_key = file_key
+                    st.session_state.last_export_rows = 0
                     st.success(f"已加载: {uploaded_file.name}")
                     st.rerun() # 重新运行以刷新预览
                 except Exception as e:
                     st.error(f"加载失败: {e}")
+    elif file_op == "👥 共享表格（多人录入）":
+        # 同名表在整个服务进程里只有一个写入者，所有人看到同一份数据
+        existing = list_shared_tables()
+        if existing:
+            st.caption("已有共享表格：" + "、".join(existing))
+        table_name = st.text_input("共享表格名称", value=st.session_state.shared_table or "")
+        shared_headers = ""
+        if get_mode(selected_mode).custom_headers:
+            shared_headers = st.text_input("新表的列名 (空格隔开)", value="姓名 电话 备注")
+        if st.button("👥 加入共享表格", type="primary") and table_name.strip():
+            try:
+                get_shared_table(table_name, selected_mode, shared_headers)
+                st.session_state.shared_table = table_name.strip()
+                st.session_state.server_table = None
+                st.session_state.workbook = None
+                st.session_state.file_name = f"{table_name.strip()}.xlsx"
+                st.session_state.last_loaded_key = f"SHARED_{table_name.strip()}"
+                st.session_state.last_export_rows = 0
+                st.rerun()
+            except Exception as e:
+                st.error(f"打开共享表格失败: {e}")
+    elif file_op == "🗂️ 服务器表格（支持分片）":
+        # 导入服务 / 监视目录写入的表；分片表按清单读取全部分片
+        tables = list_tables(TABLE_DIR)
+        if tables:
+            table_file = st.selectbox("选择表格", tables)
+            if st.button("🗂️ 打开表格", type="primary"):
+                st.session_state.server_table = os.path.join(TABLE_DIR, table_file)
+                st.session_state.shared_table = None
+                st.session_state.workbook = None
+                st.session_state.file_name = table_file
+                st.session_state.last_loaded_key = f"SERVER_{table_file}"
+                st.session_state.last_export_rows = 0
+                st.rerun()
+        else:
+            st.info(f"服务器目录 {TABLE_DIR} 里还没有表格。")
     else:
         # 新建文件逻辑
         custom_headers = ""
-        if selected_mode == "自定义":
+        if get_mode(selected_mode).custom_headers:
             st.info("自定义模式下新建文件需指定列名")
             custom_headers = st.text_input("输入列名 (空格隔开)", value="姓名 电话 备注")
             
         if st.button("🚀 初始化新表格", type="primary"):
-            st.session_state.workbook = create_blank_workbook(selected_mode, custom_headers)
-            prefix = {"福田统计": "福田表", "爱心流动": "爱心表", "自定义": "自定义表"}
-            st.session_state.file_name = f"{prefix[selected_mode]}_{datetime.now().strftime('%H%M')}.xlsx"
+            st.session_state.workbook = WorkbookView.from_workbook(create_blank_workbook(selected_mode, custom_headers))
+            st.session_state.shared_table = None
+            st.session_state.server_table = None
+            prefix = get_mode(selected_mode).file_name.rsplit(".", 1)[0]
+            st.session_state.file_name = f"{prefix}_{datetime.now().strftime('%H%M')}.xlsx"
             st.session_state.last_loaded_key = f"NEW_{datetime.now().timestamp()}"
+            st.session_state.last_export_rows = 0
             st.success("新表格已创建！请在右侧开始录入。")
             st.rerun()
 
@@ -297,10 +279,8 @@ col_input, col_preview = st.columns([1, 1.2])
 with col_input:
     st.subheader(f"2. 数据录入 ({st.session_state.current_mode})")
     
-    placeholder_text = "姓名：张三\n电话：138000..."
-    if st.session_state.current_mode == "爱心流动":
-        placeholder_text = "被流动人：李四\n类型：爱心(1份)\n流动人：王五..."
-        
+    placeholder_text = get_mode(st.session_state.current_mode).placeholder
+
     st.text_area(
         "在此粘贴文本:",
         height=300,
@@ -308,6 +288,9 @@ with col_input:
         placeholder=placeholder_text
     )
     
+    st.checkbox("忽略校验错误，强制写入", key="skip_validation")
+    st.checkbox("允许重复写入（同一段文字再写一次）", key="allow_duplicate")
+
     # 提交按钮
     st.button("⚡ 解析并追加", type="primary", on_click=submit_data, use_container_width=True)
     
@@ -322,36 +305,124 @@ with col_input:
 with col_preview:
     st.subheader("3. 结果预览")
     
-    if st.session_state.workbook:
+    if st.session_state.server_table:
         try:
-            # 将 Workbook 转为 DataFrame 用于展示
-            ws = st.session_state.workbook.active
-            data = list(ws.values)
+            view = ShardReadView(st.session_state.server_table)
+            headers = view.headers
+            month = st.selectbox("月份:", ["全部"] + view.months())
+            month = None if month == "全部" else month
+            total = view.count(month)
+            st.info(f"表格 **{st.session_state.file_name}** 共有 **{total}** 条数据"
+                    f"（{len(view.shards_for(month))} 个分片文件）")
+            st.button("🔄 刷新", help="查看导入服务刚写入的数据")
+            with st.expander("📊 分片统计"):
+                st.dataframe([{"文件": s["file"], "行数": s["rows"],
+                               "日期范围": f"{s['min_date']} ~ {s['max_date']}" if s["min_date"] else ""}
+                              for s in view.shards_for(month)],
+                             use_container_width=True, hide_index=True)
+            with stage("preview_dataframe"):
+                df = view.to_dataframe(month, SERVER_PREVIEW_ROWS)
+            if total > SERVER_PREVIEW_ROWS:
+                st.caption(f"只显示前 {SERVER_PREVIEW_ROWS} 条，完整数据请导出。")
+            st.dataframe(df, use_container_width=True, height=350, hide_index=True)
+
+            if st.session_state.current_mode == LOVE_MODE and "被流动人" in headers:
+                show_lineage(headers)
+
+            st.markdown("### 📥 导出文件")
+            fmt = st.selectbox("导出格式:", available_formats(), format_func=lambda f: FORMAT_LABELS[f])
+            since = 0
+            if month is None and st.checkbox(
+                    f"只导出上次导出后新增的行（上次导出到第 {st.session_state.last_export_rows} 条）",
+                    disabled=st.session_state.last_export_rows == 0):
+                since = min(st.session_state.last_export_rows, total)
+            # 读全部分片生成导出文件很慢，不能每次页面刷新都做：点击后才生成，表格被改过或选项变了要重新准备
+            export_key = (st.session_state.server_table, table_mtime(st.session_state.server_table), month, fmt, since)
+            if st.button("📦 准备导出", use_container_width=True):
+                with stage("server_export"):
+                    export_data, export_count = export_rows_bytes(
+                        headers, islice(view.iter_rows(month), since, None), fmt)
+                st.session_state.server_export = (export_key, export_data, export_count)
+            prepared = st.session_state.server_export
+            if prepared and prepared[0] == export_key:
+                _, export_data, export_count = prepared
+                ext, mime = EXPORT_FORMATS[fmt]
+                base_name = st.session_state.file_name.rsplit(".", 1)[0] + (f"_{month}" if month else "")
+                col_d1, col_d2 = st.columns([3, 1])
+                with col_d1:
+                    new_name = st.text_input("文件名:", value=base_name + ext, label_visibility="collapsed")
+                with col_d2:
+                    st.download_button(
+                        label=f"下载 ({export_count} 条)",
+                        data=export_data,
+                        file_name=new_name,
+                        mime=mime,
+                        on_click=mark_exported,
+                        args=(total if month is None else st.session_state.last_export_rows,),
+                        use_container_width=True
+                    )
+        except Exception as e:
+            st.error(f"预览生成错误: {e}")
+    elif st.session_state.workbook or st.session_state.shared_table:
+        try:
+            snap = None
+            if st.session_state.shared_table:
+                # 共享表格：读带版本号的快照，不阻塞写线程
+                writer = get_shared_table(st.session_state.shared_table)
+                if writer.mode != st.session_state.current_mode:
+                    st.warning(f"共享表格是「{writer.mode}」模式，录入前请在左侧切换到该模式。")
+                if writer.last_error is not None:
+                    st.error(f"最近一次保存共享表格失败：{writer.last_error}")
+                snap = writer.snapshot()
+                headers, rows = snap.headers, snap.rows()
+            else:
+                # 将表格转为 DataFrame 用于展示（未修改的上传文件直接读共享缓存）
+                headers, rows = st.session_state.workbook.table()
             
-            if data:
-                headers = data[0]
-                rows = data[1:] if len(data) > 1 else []
-                df = pd.DataFrame(rows, columns=headers)
+            if headers:
+                import pandas as pd
+                with stage("preview_dataframe"):
+                    df = pd.DataFrame(rows, columns=headers)
                 
                 # 展示统计
-                st.info(f"当前表格共有 **{len(rows)}** 条数据")
+                if snap:
+                    st.info(f"共享表格 **{st.session_state.shared_table}** 共有 **{len(rows)}** 条数据（版本 {snap.revision}）")
+                    st.button("🔄 刷新", help="查看其他人刚录入的数据")
+                else:
+                    st.info(f"当前表格共有 **{len(rows)}** 条数据")
                 
                 # 可交互表格
                 st.dataframe(df, use_container_width=True, height=350, hide_index=True)
+
+                if st.session_state.current_mode == LOVE_MODE and "被流动人" in headers:
+                    numbered_rows = snap.numbered_rows if snap else st.session_state.workbook.numbered_rows
+                    show_lineage(headers, len(rows), numbered_rows)
                 
-                # 下载区
+                # 下载区：只生成当前选中的格式
                 st.markdown("### 📥 导出文件")
-                excel_data = to_excel_bytes(st.session_state.workbook)
+                fmt = st.selectbox("导出格式:", available_formats(), format_func=lambda f: FORMAT_LABELS[f])
+                since = 0
+                if st.checkbox(f"只导出上次导出后新增的行（上次导出到第 {st.session_state.last_export_rows} 条）",
+                               disabled=st.session_state.last_export_rows == 0):
+                    since = min(st.session_state.last_export_rows, len(rows))
+                if snap:
+                    export_data, export_count = export_rows_bytes(snap.headers, iter(snap.rows(since)), fmt)
+                else:
+                    export_data, export_count = st.session_state.workbook.export(fmt, since)
+                ext, mime = EXPORT_FORMATS[fmt]
                 
                 col_d1, col_d2 = st.columns([3, 1])
                 with col_d1:
-                    new_name = st.text_input("文件名:", value=st.session_state.file_name, label_visibility="collapsed")
+                    base_name = st.session_state.file_name.rsplit(".", 1)[0]
+                    new_name = st.text_input("文件名:", value=base_name + ext, label_visibility="collapsed")
                 with col_d2:
                     st.download_button(
-                        label="下载",
-                        data=excel_data,
+                        label=f"下载 ({export_count} 条)",
+                        data=export_data,
                         file_name=new_name,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        mime=mime,
+                        on_click=mark_exported,
+                        args=(len(rows),),
                         use_container_width=True
                     )
             else:
@@ -0,0 +1,23 @@
+from dedup_set import DedupSet
+
+
+def test_spills_to_disk_and_still_detects_duplicates(tmp_path):
+    with DedupSet(max_memory_keys=3, spill_dir=str(tmp_path)) as seen:
+        assert all(seen.add(f"k{i}") for i in range(10))
+        assert seen.spilled == 9
+        assert len(seen) == 10
+        assert list(tmp_path.glob("dedup_*.sqlite"))
+        # 溢出到磁盘的和还在内存里的都能查到
+        assert not seen.add("k0")
+        assert not seen.add("k9")
+        assert "k4" in seen
+        assert "k10" not in seen
+        assert seen.add("k10")
+    assert not list(tmp_path.glob("dedup_*.sqlite"))
+
+
+def test_memory_only_when_under_limit(tmp_path):
+    with DedupSet(max_memory_keys=100, spill_dir=str(tmp_path)) as seen:
+        assert seen.add("a") and not seen.add("a")
+        assert seen.spilled == 0
+    assert not list(tmp_path.iterdir())
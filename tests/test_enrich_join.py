@@ -0,0 +1,64 @@
+import openpyxl
+import pytest
+
+from enrich_join import AMBIGUOUS, MATCHED, UNMATCHED, enrich_love_workbook
+
+
+def _save(path, headers, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _futian(path, rows):
+    # 福田统计表只需要 真实姓名 / 电话号码 / 团队 / 推荐人，其余列按表头对齐时留空
+    _save(path, ["真实姓名", "电话号码", "团队", "推荐人"], rows)
+
+
+def _result(path):
+    ws = openpyxl.load_workbook(path)["补全结果"]
+    rows = list(ws.iter_rows(values_only=True))
+    return list(rows[0]), [dict(zip(rows[0], r)) for r in rows[1:]]
+
+
+@pytest.mark.parametrize("padding, build_side", [(0, "福田统计表"), (10, "爱心流动表")])
+def test_match_by_phone_then_name_and_flag_ambiguous(tmp_path, padding, build_side):
+    futian, love, out = (str(tmp_path / n) for n in ("福田.xlsx", "爱心.xlsx", "结果.xlsx"))
+    _futian(futian, [
+        ["张三", "13800138000", "一队", "老王"],
+        ["李四", "", "二队", "老李"],
+        ["王五", "", "一队", "甲"],
+        ["王五", "", "三队", "乙"],
+    ] + [[f"路人{i}", "", "四队", ""] for i in range(padding)])
+    _save(love, ["被流动人", "类型", "份数"], [
+        ["张 三 138-0013-8000", "爱心", 1],
+        ["李四", "爱心", 2],
+        ["王五", "爱心", 1],
+        ["赵六", "爱心", 1],
+    ])
+
+    report = enrich_love_workbook(love, futian, out)
+    assert report.build_side == build_side
+    assert report.counts == {MATCHED: 2, UNMATCHED: 1, AMBIGUOUS: 1}
+    _, rows = _result(out)
+    assert [(r["团队"], r["推荐人"], r["匹配情况"]) for r in rows] == [
+        ("一队", "老王", MATCHED), ("二队", "老李", MATCHED), (None, None, AMBIGUOUS), (None, None, UNMATCHED)]
+    assert rows[0]["电话号码"] == "13800138000"
+    assert report.problems == {"王五": [AMBIGUOUS, 1], "赵六": [UNMATCHED, 1]}
+
+
+def test_extra_love_columns_are_kept(tmp_path):
+    futian, love, out = (str(tmp_path / n) for n in ("福田.xlsx", "爱心.xlsx", "结果.xlsx"))
+    _futian(futian, [["李四", "", "二队", "老李"]])
+    _save(love, ["被流动人", "类型", "微信号", "团队", "微信号"], [["李四", "爱心", "wx_li", "旧队", "重复"]])
+
+    report = enrich_love_workbook(love, futian, out)
+    headers, rows = _result(out)
+    assert report.extra_columns == ["微信号", "团队(原表)"]
+    assert report.dropped_columns == ["微信号"]
+    assert headers[-6:] == ["微信号", "团队(原表)", "团队", "推荐人", "电话号码", "匹配情况"]
+    assert (rows[0]["微信号"], rows[0]["团队(原表)"], rows[0]["团队"]) == ("wx_li", "旧队", "二队")
+    assert "未能保留的列: 微信号" in report.summary()
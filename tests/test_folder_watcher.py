@@ -0,0 +1,97 @@
+import openpyxl
+
+import pytest
+
+import folder_watcher
+from folder_watcher import REJECTED_FILE_NAME, FolderWatcher
+from futian_core import split_records
+
+
+def _names(path):
+    ws = openpyxl.load_workbook(path).active
+    col = [c.value for c in ws[1]].index("真实姓名")
+    return [r[col] for r in ws.iter_rows(min_row=2, values_only=True)]
+
+
+def test_split_records_reports_text_outside_records():
+    leftover = []
+    text = "大家好，今天的名单\n【3月5日】\n姓名：张三\n姓名：李四\n\n【备注】\n明天继续"
+    assert split_records(text, "福田统计", leftover) == ["【3月5日】\n姓名：张三", "姓名：李四"]
+    assert leftover == ["大家好，今天的名单", "【备注】\n明天继续"]
+
+
+def test_split_records_reports_where_the_last_segment_starts():
+    tail = []
+    split_records("开场白\n姓名：张三\n电话：1\n\n【3月6日】\n姓名：李四\n电话：2", "福田统计", tail=tail)
+    assert tail == [4]
+    tail = []
+    split_records("姓名：张三\n【备注】\n明天继续", "福田统计", tail=tail)
+    assert tail == [1]
+
+
+def test_once_imports_in_single_pass_and_logs_stray_text(tmp_path):
+    inbox = tmp_path / "收件夹"
+    inbox.mkdir()
+    excel = str(tmp_path / "福田统计表.xlsx")
+    (inbox / "a.txt").write_text("开场白\n姓名：张三\n电话：13800138000\n姓名：\n", encoding="utf-8")
+
+    watcher = FolderWatcher(str(inbox), excel, "福田统计")
+    assert watcher.poll_once(settle=0, flush=True) == 1
+    assert _names(excel) == ["张三"]
+    log = (inbox / REJECTED_FILE_NAME).read_text(encoding="utf-8")
+    assert "开场白" in log and "不属于任何记录" in log
+    assert "不能为空" in log
+
+    # 追加的内容只读新增部分
+    with open(inbox / "a.txt", "a", encoding="utf-8") as f:
+        f.write("姓名：李四\n")
+    assert watcher.poll_once(settle=0, flush=True) == 1
+    assert _names(excel) == ["张三", "李四"]
+    assert watcher.poll_once(settle=0, flush=True) == 0
+
+
+def test_last_record_waits_for_next_record_or_idle(tmp_path):
+    inbox = tmp_path / "收件夹"
+    inbox.mkdir()
+    excel = str(tmp_path / "福田统计表.xlsx")
+    (inbox / "a.txt").write_text("姓名：张三\n电话：13800138000\n姓名：李四\n", encoding="utf-8")
+
+    watcher = FolderWatcher(str(inbox), excel, "福田统计")
+    assert watcher.poll_once(settle=0) == 1
+    assert _names(excel) == ["张三"]
+
+    # 李四的续行后来才写进去，不能当成不属于任何记录的文字
+    with open(inbox / "a.txt", "a", encoding="utf-8") as f:
+        f.write("电话：13900139000\n")
+    assert watcher.poll_once(settle=0) == 0
+    with open(inbox / "a.txt", "a", encoding="utf-8") as f:
+        f.write("姓名：王五\n")
+    assert watcher.poll_once(settle=0) == 1
+    assert _names(excel) == ["张三", "李四"]
+    assert not (inbox / REJECTED_FILE_NAME).exists()
+
+    # 文件空闲够久后最后一条也导入
+    watcher.idle = 0
+    assert watcher.poll_once(settle=0) == 1
+    assert _names(excel) == ["张三", "李四", "王五"]
+    assert watcher.poll_once(settle=0) == 0
+
+
+def test_rejected_text_is_logged_only_after_write(tmp_path, monkeypatch):
+    inbox = tmp_path / "收件夹"
+    inbox.mkdir()
+    excel = str(tmp_path / "福田统计表.xlsx")
+    (inbox / "a.txt").write_text("开场白\n姓名：张三\n", encoding="utf-8")
+
+    def fail(*args, **kwargs):
+        raise Exception("无法保存")
+
+    watcher = FolderWatcher(str(inbox), excel, "福田统计")
+    monkeypatch.setattr(folder_watcher, "append_batch_to_file", fail)
+    with pytest.raises(Exception, match="无法保存"):
+        watcher.poll_once(settle=0, flush=True)
+    assert not (inbox / REJECTED_FILE_NAME).exists()
+
+    monkeypatch.undo()
+    assert watcher.poll_once(settle=0, flush=True) == 1
+    assert (inbox / REJECTED_FILE_NAME).read_text(encoding="utf-8").count("开场白") == 1
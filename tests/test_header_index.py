@@ -0,0 +1,62 @@
+import pytest
+
+from header_index import build_header_index, normalize_header
+
+HEADERS = {"序号": 1, "姓名": 2, "电话号码": 3, "居住地址": 4, "备注（选填）": 5}
+
+
+@pytest.mark.parametrize("key, col, how", [
+    ("姓名", 2, "精确"),
+    ("姓 名", 2, "规范化"),
+    ("备注", 5, "规范化"),          # 去掉括号里的注释
+    ("手机号", 3, "同义词"),
+    ("居住地", 4, "包含"),          # 键是表头的一段
+    ("联系电话号码", 3, "包含"),    # 表头是键的一段
+    ("居往地址", 4, "近似"),        # 错一个字
+])
+def test_resolve_match_kinds(key, col, how):
+    assert build_header_index(HEADERS).resolve(key) == (col, how)
+
+
+def test_unknown_empty_and_ambiguous_keys():
+    index = build_header_index({"紧急联系人一": 1, "紧急联系人二": 2, "姓名": 3})
+    assert index.resolve("职业") == (None, "未找到")
+    assert index.resolve("（）") == (None, "空键")
+    assert index.resolve("紧急联系人") == (None, "歧义")
+
+
+def test_short_keys_are_not_fuzzy_matched():
+    assert build_header_index({"地址": 1}).resolve("址")[0] is None
+
+
+def test_normalize_header():
+    assert normalize_header("手机 号码（必填）：") == "手机号码必填"
+    assert normalize_header("ＡＢ c") == "abc"
+
+
+@pytest.mark.parametrize("key", ["电邮", "名称", "地区", "备用"])
+def test_two_char_keys_sharing_one_char_stay_unplaced(key):
+    index = build_header_index({"姓名": 1, "电话": 2, "地址": 3, "备注": 4})
+    assert index.resolve(key)[0] is None
+
+
+@pytest.mark.parametrize("key", ["来源", "归档", "团购", "职务", "份额"])
+def test_fixed_layout_rejects_foreign_two_char_columns(key):
+    headers = ["被流动人", "类型", "份数", "日期", "流动人", "回流人", "归属", "源头", "团队", "职业"]
+    assert build_header_index({h: i for i, h in enumerate(headers)}).resolve(key)[0] is None
+
+
+def test_write_reports_unplaced_and_fuzzy_placements():
+    import openpyxl
+    from futian_core import write_record_row
+
+    ws = openpyxl.Workbook().active
+    header_map = {"姓名": 1, "电话": 2, "居住地址": 3}
+    fuzzy = []
+    info = {"姓名": "张三", "电邮": "a@b.c", "来源": "群聊", "居住": "福田"}
+    unplaced = write_record_row(ws, header_map, 2, info, "自定义", fuzzy=fuzzy)
+    assert sorted(k for k, _ in unplaced) == ["居住", "来源", "电邮"]
+    assert ws.cell(2, 2).value is None
+    assert fuzzy == []      # 两个字的 居住 不再模糊匹配
+    write_record_row(ws, header_map, 3, {"居住地": "福田"}, "自定义", fuzzy=fuzzy)
+    assert fuzzy == [("居住地", "居住地址", "包含")]
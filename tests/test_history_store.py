@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import history_store
+from history_store import HistoryLog, HistoryRecord, HistoryRing
+
+
+class _Clock:
+    now_value = datetime(2024, 3, 5, 23, 59)
+
+    @classmethod
+    def now(cls):
+        return cls.now_value
+
+
+def test_log_rolls_over_at_midnight(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "datetime", _Clock)
+    log = HistoryLog("app", str(tmp_path))
+    log.append(HistoryRecord(["张三"]))
+    _Clock.now_value = datetime(2024, 3, 6, 0, 1)
+    log.append(HistoryRecord(["李四"]))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["app-2024-03-05.jsonl", "app-2024-03-06.jsonl"]
+
+    ring = HistoryRing(10)
+    log.load(ring)
+    assert [r.values for r in ring.window(0, 10)] == [("李四",)]
+
+    # 清空只删当天的日志
+    log.clear()
+    assert [p.name for p in tmp_path.iterdir()] == ["app-2024-03-05.jsonl"]
+
+
+def test_ring_keeps_newest_first_within_capacity():
+    ring = HistoryRing(3)
+    for i in range(5):
+        ring.append(HistoryRecord([i]))
+    assert [r.values[0] for r in ring.window(0, 10)] == ["4", "3", "2"]
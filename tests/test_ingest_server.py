@@ -0,0 +1,108 @@
+import asyncio
+import json
+import threading
+
+import openpyxl
+
+from ingest_server import IngestServer
+
+
+async def _post(port, payload, query=""):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((f"POST /ingest{query} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(data.decode("utf-8"))
+
+
+def _names(path):
+    ws = openpyxl.load_workbook(path).active
+    col = [c.value for c in ws[1]].index("真实姓名")
+    return [r[col] for r in ws.iter_rows(min_row=2, values_only=True)]
+
+
+def test_concurrent_posts_are_written_in_one_batch(tmp_path):
+    excel = str(tmp_path / "福田统计表.xlsx")
+
+    async def scenario():
+        server = IngestServer(excel, "福田统计", window=0.3)
+        await server.start(port=0)
+        try:
+            results = await asyncio.gather(*[_post(server.port, {"text": f"姓名：{n}"}) for n in "甲乙丙"])
+        finally:
+            await server.close()
+        return server, results
+
+    server, results = asyncio.run(scenario())
+    assert [status for status, _ in results] == [200, 200, 200]
+    assert server.batches_written == 1
+    assert server.records_written == 3
+    rows = sorted(body["records"][0]["row"] for _, body in results)
+    assert rows == [2, 3, 4]
+    assert sorted(_names(excel)) == sorted("甲乙丙")
+
+
+def test_invalid_batch_is_rejected_unless_forced(tmp_path):
+    excel = str(tmp_path / "福田统计表.xlsx")
+
+    async def scenario():
+        server = IngestServer(excel, "福田统计", window=0.01)
+        await server.start(port=0)
+        try:
+            rejected = await _post(server.port, {"texts": ["姓名：张三", "电话：1380013800"]})
+            forced = await _post(server.port, {"texts": ["姓名：张三", "电话：1380013800"]}, "?force=1")
+        finally:
+            await server.close()
+        return server, rejected, forced
+
+    server, (status, body), (forced_status, forced_body) = asyncio.run(scenario())
+    assert status == 422
+    assert not body["ok"] and "错误 1" in body["error"]
+    assert len(body["validation"]) == 2
+    assert forced_status == 200
+    assert [r["row"] for r in forced_body["records"]] == [2, 3]
+    assert server.records_written == 2
+
+
+def test_full_queue_answers_503_and_oversized_batch_413(tmp_path):
+    excel = str(tmp_path / "福田统计表.xlsx")
+    entered, release = threading.Event(), threading.Event()
+
+    async def scenario():
+        server = IngestServer(excel, "福田统计", window=0.01, max_queue=1)
+        write = server._write
+
+        def blocked_write(infos):
+            # 第一批写盘时卡住，让后面的提交留在队列里
+            entered.set()
+            release.wait(5)
+            return write(infos)
+
+        server._write = blocked_write
+        await server.start(port=0)
+        try:
+            first = asyncio.create_task(_post(server.port, {"text": "姓名：甲"}))
+            while not entered.is_set():
+                await asyncio.sleep(0.01)
+            second = asyncio.create_task(_post(server.port, {"text": "姓名：乙"}))
+            while server.queue.qsize() < 1:
+                await asyncio.sleep(0.01)
+            full = await _post(server.port, {"text": "姓名：丙"})
+            oversized = await _post(server.port, {"texts": ["姓名：丁", "姓名：戊"]})
+            release.set()
+            done = await asyncio.gather(first, second)
+        finally:
+            release.set()
+            await server.close()
+        return full, oversized, done
+
+    (status, body), (big_status, big_body), done = asyncio.run(scenario())
+    assert status == 503 and "队列已满" in body["error"]
+    assert big_status == 413 and "最多提交 1 条" in big_body["error"]
+    assert [s for s, _ in done] == [200, 200]
+    assert _names(excel) == ["甲", "乙"]
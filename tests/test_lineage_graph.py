@@ -0,0 +1,68 @@
+import openpyxl
+
+from lineage_graph import RECORD_FIELDS, LineageGraph
+
+
+def _love(person, amount, giver="", returned="", source=""):
+    return {"被流动人": person, "类型": "爱心", "份数": amount, "日期": "2024-03-01",
+            "流动人": giver, "回流人": returned, "源头": source}
+
+
+def _graph():
+    graph = LineageGraph()
+    graph.add_record(_love("乙", "2", giver="甲", source="总部"), 2)
+    graph.add_record(_love("丙", "1", giver="乙", returned="甲"), 3)
+    graph.add_record(_love("丁", "3", giver="乙", returned="甲"), 4)
+    return graph
+
+
+def test_downstream_and_upstream_traversal():
+    graph = _graph()
+    result = graph.summary("甲", "down")
+    assert result["people"] == [("乙", 1), ("丙", 2), ("丁", 2)]
+    assert [r[0] for r in result["records"]] == [2, 3, 4]
+    assert result["total_amount"] == 6
+
+    # 回流边让丁也成了甲的上游
+    assert [n for n, _ in graph.upstream("丙")[0]] == ["乙", "甲", "总部", "丁"]
+    assert graph.summary("丙", "down")["people"] == [("甲", 1), ("乙", 2), ("丁", 3)]
+    assert graph.downstream("甲", max_depth=1)[0] == [("乙", 1)]
+
+
+def test_returned_to_and_node_stats():
+    graph = _graph()
+    assert graph.returned_to("甲") == 4
+    assert graph.returned_to("路人") == 0
+    stats = graph.node_stats("乙")
+    assert stats["流出份数"] == 4
+    assert stats["收到份数"] == 2
+    assert stats["作为源头的记录"] == 0
+    assert graph.node_stats("总部")["作为源头的记录"] == 1
+    assert graph.node_stats("路人") is None
+
+
+def test_add_record_updates_incrementally():
+    graph = _graph()
+    graph.add_record(_love("戊", "5", giver="丁", returned="甲"))
+    assert graph.records[-1][0] == 5
+    assert len(graph) == 4
+    assert "戊" in graph
+    assert graph.returned_to("甲") == 9
+    assert ("戊", 3) in graph.summary("甲", "down")["people"]
+
+
+def test_from_file_keeps_real_row_numbers_across_blank_rows(tmp_path):
+    path = str(tmp_path / "爱心流动表.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(list(RECORD_FIELDS))
+    ws.append(["乙", "爱心", 2, "2024-03-01", "甲", None, None])
+    ws.append([None] * len(RECORD_FIELDS))   # 中间的空行
+    ws.append(["丙", "爱心", 1, "2024-03-02", "乙", "甲", None])
+    wb.save(path)
+
+    graph = LineageGraph.from_file(path)
+    assert [r[0] for r in graph.records] == [2, 4]
+    assert [r[0] for r in graph.summary("甲", "down")["records"]] == [2, 4]
+    graph.add_record(_love("丁", "1", giver="丙"))
+    assert graph.records[-1][0] == 5
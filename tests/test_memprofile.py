@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+import memprofile
+
+
+@pytest.fixture
+def profiling():
+    memprofile.enable()
+    memprofile.clear()
+    yield
+    memprofile.disable()
+    memprofile.clear()
+
+
+def test_concurrent_stages_do_not_share_peak(profiling):
+    inside, release, entered = threading.Event(), threading.Event(), threading.Event()
+
+    def big():
+        with memprofile.stage("big"):
+            inside.set()
+            release.wait(5)
+            data = bytearray(5_000_000)
+            del data
+
+    def small():
+        with memprofile.stage("small"):
+            entered.set()
+
+    t1 = threading.Thread(target=big)
+    t1.start()
+    assert inside.wait(5)
+    t2 = threading.Thread(target=small)
+    t2.start()
+    # 另一个会话的阶段要等前一个测完才开始
+    assert not entered.wait(0.2)
+    release.set()
+    t1.join()
+    t2.join()
+
+    peaks = {r["stage"]: r["peak_bytes"] for r in memprofile.records()}
+    assert peaks["big"] >= 5_000_000
+    assert peaks["small"] < 1_000_000
+
+
+def test_nested_stages_reenter_and_keep_child_peak(profiling):
+    with memprofile.stage("outer"):
+        with memprofile.stage("inner"):
+            data = bytearray(2_000_000)
+            del data
+    peaks = {r["stage"]: r["peak_bytes"] for r in memprofile.records()}
+    assert peaks["outer"] >= peaks["inner"] >= 2_000_000
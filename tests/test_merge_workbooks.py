@@ -0,0 +1,34 @@
+import openpyxl
+import pytest
+
+from merge_workbooks import merge_workbooks
+
+
+def _team(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["序号", "真实姓名", "手机号"])   # 手机号 -> 电话号码 按表头别名对齐
+    for i, row in enumerate(rows, 1):
+        ws.append([i] + row)
+    wb.save(path)
+
+
+@pytest.mark.parametrize("max_memory_keys", [500_000, 2])
+def test_phone_and_name_keys(tmp_path, max_memory_keys):
+    a, b, out = (str(tmp_path / n) for n in ("一队.xlsx", "二队.xlsx", "总表.xlsx"))
+    _team(a, [["张三", "13800138000"], ["李四", ""], ["王五", "13900139000"]])
+    _team(b, [
+        ["张 三", ""],                # 姓名相同、这条没写电话 -> 重复
+        ["李四", "13700137000"],      # 之前的李四没写电话 -> 重复
+        ["王五", "13600136000"],      # 同名但电话不同 -> 另一个人
+        ["某某", "138 0013 8000"],    # 电话相同 -> 重复
+        ["赵六", ""],
+    ])
+
+    report = merge_workbooks(out, [a, b], "福田统计", max_memory_keys)
+    ws = openpyxl.load_workbook(out).active
+    headers = [c.value for c in ws[1]]
+    rows = [dict(zip(headers, r)) for r in ws.iter_rows(min_row=2, values_only=True)]
+    assert [r["真实姓名"] for r in rows] == ["张三", "李四", "王五", "王五", "赵六"]
+    assert [r["序号"] for r in rows] == [1, 2, 3, 4, 5]
+    assert (report.written, report.duplicates) == (5, 3)
@@ -0,0 +1,56 @@
+from mode_specs import clean_key, get_mode, normalize_phone
+
+
+def test_futian_parse_aliases_and_date():
+    info = get_mode("福田统计").parse("姓名：张三\n手机：13800138000\n生日：1990年3月5日\n职业：老师")
+    assert info["真实姓名"] == "张三"
+    assert info["电话号码"] == "13800138000"
+    assert info["出身年月日"] == "1990-03-05"
+    assert info["职业"] == "老师"
+
+
+def test_parse_keeps_colons_inside_values():
+    info = get_mode("爱心流动").parse("被流动人：李四\n备注: 10:30 见 https://a.b/c：d")
+    assert info["备注"] == "10:30 见 https://a.b/c：d"
+
+
+def test_parse_half_width_separator_and_numbered_keys():
+    info = get_mode("福田统计").parse("1. 姓名（必填）: 王五\n2、电话: 139 0013 9000")
+    assert info["真实姓名"] == "王五"
+    assert info["电话号码"] == "139 0013 9000"
+
+
+def test_parse_continuation_lines_use_joiner():
+    text = "姓名：张三\n现在生活事业家庭情况：第一行\n第二行"
+    assert get_mode("福田统计").parse(text)["现在生活事业家庭情况"] == "第一行 第二行"
+    assert get_mode("福田统计").parse(text, joiner="\n")["现在生活事业家庭情况"] == "第一行\n第二行"
+
+
+def test_love_parse_splits_amount():
+    info = get_mode(2).parse("被流动人：李四\n类型：爱心(2份)\n日期：2024/3/1")
+    assert (info["类型"], info["份数"], info["日期"]) == ("爱心", "2", "2024-03-01")
+
+
+def test_custom_mode_keeps_free_keys():
+    info = get_mode("自定义").parse("【标题】\n姓名：张三\n2024目标：读书\n更多")
+    assert info == {"姓名": "张三", "2024目标": "读书 更多"}
+
+
+def test_custom_mode_splits_on_first_colon():
+    info = get_mode("自定义").parse("时间: 10：30\n地点（备注）：会议室:3楼")
+    assert info == {"时间": "10：30", "地点": "会议室:3楼"}
+
+
+def test_unknown_mode_falls_back_to_custom():
+    assert get_mode("不存在").custom_headers
+
+
+def test_record_start_ignores_value_colons():
+    spec = get_mode("爱心流动")
+    assert spec.is_record_start("被流动人: 10:30")
+    assert not spec.is_record_start("备注：被流动人")
+
+
+def test_helpers():
+    assert clean_key("1. 姓名（必填）") == "姓名"
+    assert normalize_phone("+86 138-0013-8000") == "13800138000"
@@ -0,0 +1,54 @@
+from parse_cache import ParseCache, describe_location, normalize_record_text
+from workbook_cache import WorkbookView
+
+TEXT = "姓名：张三\n电话：13800138000"
+
+
+def test_parse_hits_cache_and_returns_copies():
+    cache = ParseCache()
+    first = cache.parse(TEXT, "福田统计")
+    first["真实姓名"] = "改过"
+    # 全角冒号 / 多余空白 / 空行不影响命中
+    second = cache.parse("姓名: 张三\n\n 电话：138 0013 8000 ", "福田统计")
+    assert second["真实姓名"] == "张三"
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_normalize_keeps_line_structure():
+    assert normalize_record_text("ａ ｂ\n\n c ") == "ab\nc"
+
+
+def test_cache_key_includes_mode_and_joiner():
+    cache = ParseCache()
+    cache.parse(TEXT, "福田统计")
+    cache.parse(TEXT, "爱心流动")
+    cache.parse(TEXT, "福田统计", joiner="\n")
+    assert cache.stats()["misses"] == 3
+
+
+def test_written_at_is_per_target():
+    cache = ParseCache()
+    assert cache.written_at(TEXT, "福田统计", "表一") is None
+    cache.mark_written(TEXT, "福田统计", "表一", 5)
+    cache.mark_written(TEXT, "福田统计", "表二", ("表二_2024-03.xlsx", 7))
+    assert cache.written_at(TEXT, "福田统计", "表一") == 5
+    assert cache.written_at(TEXT + "\n", "福田统计", "表二") == ("表二_2024-03.xlsx", 7)
+    assert cache.written_at(TEXT, "福田统计", "表三") is None
+    assert describe_location(5) == "第 5 行"
+    assert describe_location(("表二_2024-03.xlsx", 7)) == "表二_2024-03.xlsx 第 7 行"
+
+
+def test_lru_eviction():
+    cache = ParseCache(max_entries=2)
+    for name in ("甲", "乙"):
+        cache.mark_written(f"姓名：{name}", "福田统计", "表", 2)
+    cache.written_at("姓名：甲", "福田统计", "表")   # 甲变成最近使用
+    cache.parse("姓名：丙", "福田统计")
+    assert cache.written_at("姓名：甲", "福田统计", "表") == 2
+    assert cache.written_at("姓名：乙", "福田统计", "表") is None
+
+
+def test_view_tokens_are_never_shared():
+    import openpyxl
+    a, b = WorkbookView.from_workbook(openpyxl.Workbook()), WorkbookView.from_workbook(openpyxl.Workbook())
+    assert a.token != b.token
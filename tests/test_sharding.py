@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from futian_core import append_batch_to_file
+from sharding import ShardReadView, ShardedWorkbook, append_records, list_tables, manifest_path
+
+
+def _love(name, day):
+    return {"被流动人": name, "日期": day}
+
+
+def test_month_shards_and_read_view(tmp_path):
+    base = str(tmp_path / "爱心流动表.xlsx")
+    placed = ShardedWorkbook(base, "爱心流动").append_batch(
+        [_love("甲", "2024-03-01"), _love("乙", "2024-04-02"), _love("丙", "2024-03-20")])
+    assert placed == [("爱心流动表_2024-03.xlsx", 2), ("爱心流动表_2024-04.xlsx", 2),
+                      ("爱心流动表_2024-03.xlsx", 3)]
+
+    view = ShardReadView(base)
+    assert view.months() == ["2024-03", "2024-04"]
+    assert view.count() == 3
+    assert view.count("2024-03") == 2
+    names = [row[view.headers.index("被流动人")] for row in view.iter_rows("2024-04")]
+    assert names == ["乙"]
+
+
+def test_row_shards_roll_over(tmp_path):
+    base = str(tmp_path / "福田统计表.xlsx")
+    sharded = ShardedWorkbook(base, "福田统计", by="rows", max_rows=2)
+    files = [f for f, _ in sharded.append_batch([{"真实姓名": n} for n in "甲乙丙"])]
+    assert files == ["福田统计表_part001.xlsx"] * 2 + ["福田统计表_part002.xlsx"]
+    # 续写时接着往未满的分片里写
+    more = ShardedWorkbook(base, "福田统计").append_batch([{"真实姓名": "丁"}, {"真实姓名": "戊"}])
+    assert more == [("福田统计表_part002.xlsx", 3), ("福田统计表_part003.xlsx", 2)]
+    assert ShardReadView(base).count() == 5
+
+
+def test_existing_manifest_settings_are_enforced(tmp_path):
+    base = str(tmp_path / "福田统计表.xlsx")
+    ShardedWorkbook(base, "福田统计", by="rows", max_rows=2).append_batch([{"真实姓名": "甲"}])
+    with pytest.raises(Exception, match="已按「rows」分片"):
+        ShardedWorkbook(base, "福田统计", by="month")
+    with pytest.raises(Exception, match="行数上限是 2"):
+        ShardedWorkbook(base, "福田统计", max_rows=100)
+    with pytest.raises(Exception, match="模式的分片表"):
+        ShardedWorkbook(base, "爱心流动")
+    assert ShardedWorkbook(base, "福田统计", by="rows", max_rows=2).max_rows == 2
+
+
+def test_legacy_file_is_frozen_first_shard(tmp_path):
+    base = str(tmp_path / "爱心流动表.xlsx")
+    append_batch_to_file(base, [_love("旧", "2024-01-05")], "爱心流动")
+    assert append_records(base, [_love("新", "2024-02-01")], "爱心流动") == [("爱心流动表.xlsx", 3)]
+
+    placed = append_records(base, [_love("分", "2024-02-01")], "爱心流动", shard_by="month")
+    assert placed == [("爱心流动表_2024-02.xlsx", 2)]
+    with open(manifest_path(base), encoding="utf-8") as f:
+        legacy = json.load(f)["shards"][0]
+    assert (legacy["key"], legacy["rows"], legacy["frozen"]) == ("legacy", 2, True)
+    # 有清单之后不用再指定分片方式，也会写进分片
+    assert append_records(base, [_love("后", "2024-02-03")], "爱心流动") == [("爱心流动表_2024-02.xlsx", 3)]
+
+    view = ShardReadView(base)
+    assert view.count() == 4
+    # legacy 分片没有日期范围，按月查询时逐行过滤
+    assert view.count("2024-01") == 1
+    assert list_tables(str(tmp_path)) == ["爱心流动表.xlsx"]
@@ -0,0 +1,68 @@
+import openpyxl
+import pytest
+
+import shared_tables
+from shared_tables import get_shared_table
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_tables, "SHARED_DIR", str(tmp_path))
+    monkeypatch.setattr(shared_tables, "_registry", {})
+    yield tmp_path
+    for writer in shared_tables._registry.values():
+        writer.close()
+
+
+def _saved_names(path):
+    ws = openpyxl.load_workbook(path).active
+    return [row[3] for row in ws.iter_rows(min_row=2, values_only=True)]
+
+
+def test_result_only_after_save(shared_dir):
+    writer = get_shared_table("队一", "福田统计")
+    seq, row, msg = writer.submit({"真实姓名": "张三"}).result(timeout=10)
+    assert (seq, row) == (1, 2)
+    # Future 完成时文件里已经有这一行
+    assert _saved_names(writer.path) == ["张三"]
+
+
+def test_save_failure_rolls_back_and_writer_survives(shared_dir, monkeypatch):
+    writer = get_shared_table("队二", "福田统计")
+    real_save = writer.wb.save
+
+    def broken_save(path):
+        raise PermissionError("文件被占用")
+    monkeypatch.setattr(writer.wb, "save", broken_save)
+    with pytest.raises(Exception, match="保存共享表格失败"):
+        writer.submit({"真实姓名": "张三"}).result(timeout=10)
+    writer.flush()  # 不能卡住
+    assert writer.snapshot().count == 0
+    assert writer.last_error is not None
+
+    monkeypatch.setattr(writer.wb, "save", real_save)
+    seq, row, _ = writer.submit({"真实姓名": "李四"}).result(timeout=10)
+    assert (seq, row) == (1, 2)
+    assert _saved_names(writer.path) == ["李四"]
+    assert writer.last_error is None
+
+
+def test_mode_mismatch_raises(shared_dir):
+    get_shared_table("流动", "爱心流动")
+    with pytest.raises(Exception, match="爱心流动"):
+        get_shared_table("流动", "福田统计")
+    assert get_shared_table("流动").mode == "爱心流动"
+
+
+def test_existing_file_mode_is_detected(shared_dir):
+    writer = get_shared_table("旧表", "爱心流动")
+    writer.close()
+    shared_tables._registry.clear()
+    assert get_shared_table("旧表").mode == "爱心流动"
+    with pytest.raises(Exception):
+        get_shared_table("旧表", "福田统计")
+
+
+def test_missing_table_without_mode(shared_dir):
+    with pytest.raises(Exception, match="不存在"):
+        get_shared_table("没有这张表")
@@ -0,0 +1,74 @@
+import random
+from datetime import datetime
+
+import openpyxl
+from openpyxl.styles import Font
+
+from sort_workbook import default_output_path, sort_workbook
+
+
+def _make(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "三月"
+    ws.append(["序号", "团队", "日期", "金额"])
+    ws["A1"].font = Font(bold=True)
+    for row in rows:
+        ws.append(row)
+    for r in range(2, ws.max_row + 1):
+        ws.cell(r, 4).number_format = "0.00"
+    ws.freeze_panes = "A2"
+    ws.column_dimensions["B"].width = 33
+    wb.save(path)
+
+
+def _values(path):
+    return [list(r) for r in openpyxl.load_workbook(path).active.iter_rows(min_row=2, values_only=True)]
+
+
+def test_external_merge_matches_in_memory_sort(tmp_path):
+    rng = random.Random(7)
+    rows = [[i, rng.choice(["A队", "B队", None]), f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}", i]
+            for i in range(1, 61)]
+    src = str(tmp_path / "表.xlsx")
+    _make(src, rows)
+
+    count, runs = sort_workbook(src, str(tmp_path / "外部.xlsx"), max_memory_rows=7)
+    assert (count, runs) == (60, 8)
+    sort_workbook(src, str(tmp_path / "内存.xlsx"))
+    merged = _values(str(tmp_path / "外部.xlsx"))
+    assert merged == _values(str(tmp_path / "内存.xlsx"))
+
+    assert [r[0] for r in merged] == list(range(1, 61))
+    teams = [r[1] for r in merged]
+    # 团队为空的排在最后；同团队内日期升序，日期相同时保持原顺序（金额列是原序号）
+    assert teams == sorted(teams, key=lambda t: (t is None, t or ""))
+    for a, b in zip(merged, merged[1:]):
+        if a[1] == b[1]:
+            assert (a[2], a[3]) <= (b[2], b[3])
+
+
+def test_writes_separate_file_and_keeps_layout(tmp_path):
+    src = str(tmp_path / "团队统计表.xlsx")
+    _make(src, [[1, "B队", datetime(2024, 3, 1), 1.5], [2, "A队", datetime(2024, 1, 1), 2]])
+
+    assert sort_workbook(src) == (2, 0)
+    out = default_output_path(src)
+    assert out.endswith("团队统计表_排序.xlsx")
+    assert [r[1] for r in _values(src)] == ["B队", "A队"]   # 原文件不动
+
+    ws = openpyxl.load_workbook(out).active
+    assert ws.title == "三月"
+    assert ws.freeze_panes == "A2"
+    assert ws.column_dimensions["B"].width == 33
+    assert ws["A1"].font.b
+    assert ws["D2"].number_format == "0.00"
+    assert [c.value for c in ws[2]] == [1, "A队", datetime(2024, 1, 1), 2]
+
+
+def test_in_place_overwrites(tmp_path):
+    src = str(tmp_path / "表.xlsx")
+    _make(src, [[1, "B队", "2024-03-01", 1], [2, "A队", "2024-01-01", 2]])
+    sort_workbook(src, in_place=True)
+    assert [r[1] for r in _values(src)] == ["A队", "B队"]
+    assert not (tmp_path / "表_排序.xlsx").exists()
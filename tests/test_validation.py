@@ -0,0 +1,37 @@
+from mode_specs import get_mode
+from validation import ERROR, OK, WARN, ValidationError, validate_batch, validate_record
+
+
+def test_batch_statuses_per_row():
+    records = [
+        {"真实姓名": "张三", "电话号码": "13800138000", "出身年月日": "1990-03-05"},
+        {"真实姓名": "李四", "电话号码": "0755-1234567"},
+        {"真实姓名": "", "电话号码": "1380013800"},
+    ]
+    report = validate_batch(records, "福田统计")
+    assert [level for level, _ in report.statuses] == [OK, WARN, ERROR]
+    assert report.error_rows == [2]
+    assert not report.ok
+    assert "真实姓名: 不能为空" in report.issues(2)
+    assert "手机号" in report.issues(2)
+    assert report.summary() == "共 3 条：通过 1，警告 1，错误 1"
+    assert "第 3 条" in str(ValidationError(report))
+
+
+def test_partial_date_is_warning_not_error():
+    info = get_mode("爱心流动").parse("被流动人：李四\n类型：爱心(1份)\n日期：3月5日")
+    level, problems = validate_record(info, "爱心流动")
+    assert level == WARN
+    assert "日期不完整" in problems[0]
+
+
+def test_impossible_and_future_dates_are_errors():
+    assert validate_record({"被流动人": "李四", "日期": "2024-02-30"}, "爱心流动")[0] == ERROR
+    assert validate_record({"被流动人": "李四", "日期": "2999-01-01"}, "爱心流动")[0] == ERROR
+    assert validate_record({"真实姓名": "张三", "出身年月日": "1850-01-01"}, "福田统计")[0] == ERROR
+
+
+def test_amount_must_be_non_negative_number():
+    assert validate_record({"被流动人": "李四", "份数": "两"}, "爱心流动")[0] == ERROR
+    assert validate_record({"被流动人": "李四", "份数": "-1"}, "爱心流动")[0] == ERROR
+    assert validate_record({"被流动人": "李四", "份数": "2"}, "爱心流动")[0] == OK
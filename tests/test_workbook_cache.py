@@ -0,0 +1,50 @@
+import io
+import json
+
+import openpyxl
+
+from workbook_cache import WorkbookView
+
+
+def _upload_bytes():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["序号", "真实姓名"])
+    ws.append([1, "张三"])
+    ws.append([None, None])   # 中间的空行
+    ws.append([2, "李四"])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _jsonl_names(data):
+    return [json.loads(line)["真实姓名"] for line in data.getvalue().decode("utf-8").splitlines()]
+
+
+def test_blank_rows_skipped_before_and_after_copy():
+    view = WorkbookView.from_upload(_upload_bytes())
+    _, shared_rows = view.table()
+    assert [r[1] for r in shared_rows] == ["张三", "李四"]
+
+    view.append({"真实姓名": "王五"}, "福田统计")
+    assert view.is_private
+    _, rows = view.table()
+    assert [r[1] for r in rows] == ["张三", "李四", "王五"]
+
+
+def test_numbered_rows_keep_sheet_row_numbers():
+    view = WorkbookView.from_upload(_upload_bytes())
+    assert [(i, r[1]) for i, r in view.numbered_rows()] == [(2, "张三"), (4, "李四")]
+    view.append({"真实姓名": "王五"}, "福田统计")
+    assert [(i, r[1]) for i, r in view.numbered_rows()] == [(2, "张三"), (4, "李四"), (5, "王五")]
+
+
+def test_delta_export_starts_after_previewed_rows():
+    view = WorkbookView.from_upload(_upload_bytes())
+    exported = len(view.table()[1])
+    view.append({"真实姓名": "王五"}, "福田统计")
+    data, count = view.export("jsonl", exported)
+    assert count == 1
+    assert _jsonl_names(data) == ["王五"]
+    assert view.export("xlsx")[1] == 3
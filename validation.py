@@ -0,0 +1,169 @@
+"""批量校验：每个模式的规则（modes.json 的 validate）编译一次，按列批量检查
+
+在写入任何工作簿之前对整批解析结果运行，返回逐行状态表：
+    ok    没有问题
+    warn  可疑但允许写入（如疑似座机号、缺年份等不完整或认不出的日期）
+    error 明显错误（手机号位数不对、日期不存在、份数不是数字、缺少姓名）
+规则按列执行：每条规则只取一次字段值列表，然后在同一个循环里检查整列，
+单条记录开销在几微秒量级，批量导入时可以忽略。
+"""
+import re
+from datetime import date
+from functools import lru_cache
+
+from mode_specs import get_mode, normalize_phone
+
+OK, WARN, ERROR = "ok", "warn", "error"
+_SEVERITY_ORDER = {OK: 0, WARN: 1, ERROR: 2}
+
+_DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_MOBILE_RE = re.compile(r"^1[3-9]\d{9}$")
+
+
+# ================= 1. 规则 =================
+# 每个规则工厂接收规则配置，返回 check(value) -> None | (级别, 说明)
+
+def _rule_required(rule):
+    def check(value):
+        if value is None or str(value).strip() == "":
+            return ERROR, "不能为空"
+    return check
+
+def _rule_phone(rule):
+    def check(value):
+        if not value:
+            return None
+        digits = normalize_phone(value)
+        if _MOBILE_RE.match(digits):
+            return None
+        if 7 <= len(digits) <= 12 and (len(digits) <= 8 or digits.startswith("0")):
+            return WARN, f"疑似座机号：{value}"
+        return ERROR, f"手机号应为 1 开头的 11 位数字：{value}"
+    return check
+
+def _rule_date(rule):
+    min_year = rule.get("min_year", 1900)
+    not_future = rule.get("not_future", False)
+    def check(value):
+        if not value:
+            return None
+        match = _DATE_RE.match(str(value))
+        if not match:
+            # "3月5日" 这类缺年份的写法很常见，原样写入后再人工核对，不拦截整批
+            return WARN, f"日期不完整或无法识别，请核对：{value}"
+        year, month, day = (int(g) for g in match.groups())
+        try:
+            parsed = date(year, month, day)
+        except ValueError:
+            return ERROR, f"不存在的日期：{value}"
+        if year < min_year:
+            return ERROR, f"年份过早：{value}"
+        if not_future and parsed > date.today():
+            return ERROR, f"日期在未来：{value}"
+    return check
+
+def _rule_number(rule):
+    minimum = rule.get("min")
+    def check(value):
+        if value is None or str(value).strip() == "":
+            return None
+        try:
+            number = float(str(value).strip())
+        except ValueError:
+            return ERROR, f"应为数字：{value}"
+        if minimum is not None and number < minimum:
+            return ERROR, f"不能小于 {minimum}：{value}"
+    return check
+
+RULES = {
+    "required": _rule_required,
+    "phone": _rule_phone,
+    "date": _rule_date,
+    "number": _rule_number,
+}
+
+
+@lru_cache(maxsize=None)
+def compile_rules(mode):
+    """[(字段, check), ...]；每个模式只编译一次"""
+    spec = get_mode(mode)
+    compiled = []
+    for rule in spec.validate_rules:
+        if rule["rule"] not in RULES:
+            raise ValueError(f"模式 {spec.name}: 未知校验规则 {rule['rule']}")
+        compiled.append((rule["field"], RULES[rule["rule"]](rule)))
+    return tuple(compiled)
+
+
+# ================= 2. 批量执行 =================
+
+class ValidationReport:
+    """逐行结果：statuses[i] = (级别, ["字段: 说明", ...])"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    def __len__(self):
+        return len(self.statuses)
+
+    @property
+    def error_rows(self):
+        return [i for i, (level, _) in enumerate(self.statuses) if level == ERROR]
+
+    @property
+    def ok(self):
+        return not self.error_rows
+
+    def counts(self):
+        result = {OK: 0, WARN: 0, ERROR: 0}
+        for level, _ in self.statuses:
+            result[level] += 1
+        return result
+
+    def issues(self, i):
+        return "；".join(self.statuses[i][1])
+
+    def table(self, records=None, mode=None):
+        """供界面展示的紧凑表格：[{#, 状态, 问题, 记录}]"""
+        spec = get_mode(mode) if mode is not None else None
+        rows = []
+        for i, (level, problems) in enumerate(self.statuses):
+            row = {"#": i + 1, "状态": level, "问题": "；".join(problems)}
+            if records is not None and spec is not None:
+                row["记录"] = spec.key_name(records[i])
+            rows.append(row)
+        return rows
+
+    def summary(self):
+        c = self.counts()
+        return f"共 {len(self)} 条：通过 {c[OK]}，警告 {c[WARN]}，错误 {c[ERROR]}"
+
+
+def validate_batch(records, mode):
+    """校验一整批解析结果（字段 -> 值 的字典列表）"""
+    levels = [OK] * len(records)
+    problems = [[] for _ in records]
+    for field, check in compile_rules(mode):
+        column = [r.get(field) for r in records]
+        for i, value in enumerate(column):
+            result = check(value)
+            if result is not None:
+                level, message = result
+                problems[i].append(f"{field}: {message}")
+                if _SEVERITY_ORDER[level] > _SEVERITY_ORDER[levels[i]]:
+                    levels[i] = level
+    return ValidationReport(list(zip(levels, problems)))
+
+
+def validate_record(record, mode):
+    """单条校验，返回 (级别, [问题...])"""
+    return validate_batch([record], mode).statuses[0]
+
+
+class ValidationError(Exception):
+    """写入前校验未通过；report 为完整的逐行结果"""
+
+    def __init__(self, report):
+        self.report = report
+        problems = [f"第 {i + 1} 条 {report.issues(i)}" for i in report.error_rows]
+        super().__init__("数据校验未通过：\n" + "\n".join(problems))
@@ -0,0 +1,149 @@
+"""上传工作簿的进程级缓存：按内容哈希共享解析结果，会话拿写时复制的视图
+
+全队每天早上打开同一个总表时，只有第一个会话真正解析文件；
+其他会话拿到同一份行数据 / 表头映射，预览和导出都直接读共享数据。
+某个会话第一次追加时才从原始字节载入一份私有 Workbook（写时复制）。
+缓存总大小有上限（环境变量 FUTIAN_UPLOAD_CACHE_MB，默认 256），按最近使用淘汰。
+"""
+import hashlib
+import io
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from exporters import is_blank_row
+from futian_core import load_workbook, append_data_to_workbook
+
+MAX_CACHE_BYTES = int(os.environ.get("FUTIAN_UPLOAD_CACHE_MB", "256")) * 1024 * 1024
+
+
+class CachedWorkbook:
+    """一个上传文件解析后的只读数据，被多个会话共享"""
+
+    def __init__(self, digest, raw):
+        self.digest = digest
+        self.raw = raw
+        wb = load_workbook(io.BytesIO(raw), read_only=True)
+        try:
+            it = wb.active.iter_rows(values_only=True)
+            self.headers = tuple(next(it, ()))
+            numbered = [(i, tuple(r)) for i, r in enumerate(it, 2) if not is_blank_row(r)]
+        finally:
+            wb.close()
+        self.rows = tuple(r for _, r in numbered)
+        # 每条数据在表中的行号（跳过了空行，不能按下标推算）
+        self.row_numbers = tuple(i for i, _ in numbered)
+        # 估算占用：原始字节 + 单元格文本长度 + 每行/每格的对象开销
+        cells = sum(len(r) for r in self.rows)
+        text = sum(len(str(v)) for r in self.rows for v in r if v is not None)
+        self.size = len(raw) + text * 2 + cells * 16 + len(self.rows) * 64
+
+
+class UploadCache:
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}   # 正在解析的 digest -> Lock，避免同一文件被并发解析多次
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, raw):
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+            parse_lock = self._inflight.setdefault(digest, threading.Lock())
+
+        with parse_lock:
+            with self._lock:
+                entry = self._entries.get(digest)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+            entry = CachedWorkbook(digest, raw)
+            with self._lock:
+                self.misses += 1
+                self._inflight.pop(digest, None)
+                if entry.size <= self.max_bytes:
+                    self._entries[digest] = entry
+                    self._bytes += entry.size
+                    while self._bytes > self.max_bytes:
+                        _, old = self._entries.popitem(last=False)
+                        self._bytes -= old.size
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+upload_cache = UploadCache()
+
+
+class WorkbookView:
+    """会话持有的写时复制视图
+
+    未修改前所有读取都走共享的 CachedWorkbook；第一次追加时载入私有 Workbook。
+    token 在视图的整个生命周期内不变、也不会被别的视图复用，用来登记"写入过哪张表"；
+    同一文件被不同会话（或重新）上传时各自是不同的表，所以不能只用内容哈希。
+    """
+
+    def __init__(self, cached=None, workbook=None):
+        self.cached = cached
+        self._wb = workbook
+        self.token = uuid.uuid4().hex
+
+    @classmethod
+    def from_upload(cls, raw):
+        return cls(cached=upload_cache.get(raw))
+
+    @classmethod
+    def from_workbook(cls, wb):
+        return cls(workbook=wb)
+
+    @property
+    def is_private(self):
+        return self._wb is not None
+
+    def workbook(self):
+        """取可写的私有 Workbook（必要时从原始字节载入）"""
+        if self._wb is None:
+            self._wb = load_workbook(io.BytesIO(self.cached.raw))
+        return self._wb
+
+    def append(self, info, mode):
+        return append_data_to_workbook(self.workbook(), info, mode)
+
+    def table(self):
+        """(表头, 数据行列表) 用于预览；和缓存、导出一样跳过空行，行数才能对上增量导出的起点"""
+        if self._wb is None:
+            return list(self.cached.headers), list(self.cached.rows)
+        it = self._wb.active.iter_rows(values_only=True)
+        headers = next(it, None)
+        if headers is None:
+            return [], []
+        return list(headers), [row for row in it if not is_blank_row(row)]
+
+    def numbered_rows(self):
+        """[(行号, 数据行)]，与 table() 的行一一对应；流向图等需要真实行号的地方用"""
+        if self._wb is None:
+            return list(zip(self.cached.row_numbers, self.cached.rows))
+        rows = self._wb.active.iter_rows(min_row=2, values_only=True)
+        return [(i, row) for i, row in enumerate(rows, 2) if not is_blank_row(row)]
+
+    def export(self, fmt, start=0):
+        """导出为指定格式，返回 (BytesIO, 行数)；未修改的 xlsx 直接返回原文件"""
+        from exporters import export_bytes, export_rows_bytes
+        if self._wb is not None:
+            return export_bytes(self._wb, fmt, start)
+        if fmt == "xlsx" and start == 0:
+            return io.BytesIO(self.cached.raw), len(self.cached.rows)
+        return export_rows_bytes([str(h) if h is not None else "" for h in self.cached.headers],
+                                 iter(self.cached.rows[start:]), fmt)